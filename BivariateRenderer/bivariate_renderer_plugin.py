@@ -22,13 +22,17 @@
  ***************************************************************************/
 """
 
-from qgis.core import QgsApplication
-from qgis.gui import QgsGui
+from qgis.core import QgsApplication, QgsScopedRuntimeProfile
 
-from .bivariate_renderer_provider import BivariateRendererProvider
-from .layoutitems.layout_item import BivariateRendererLayoutItemMetadata
-from .layoutitems.layout_item_widget import BivariateRendererLayoutItemGuiMetadata
-from .renderer.bivariate_renderer_metadata import BivariateRendererMetadata
+from .text_constants import Texts
+
+# startup costs of the plugin are reported by QGIS profiler under own group, modules pulling in GUI classes or numpy
+# are imported only when they are needed
+with QgsScopedRuntimeProfile("Import renderer metadata", Texts.profiler_group):
+    from .renderer.bivariate_renderer_metadata import BivariateRendererMetadata
+
+with QgsScopedRuntimeProfile("Import layout item metadata", Texts.profiler_group):
+    from .layoutitems.layout_item_metadata import BivariateRendererLayoutItemMetadata
 
 
 class BivariateRendererPlugin:
@@ -37,22 +41,32 @@ class BivariateRendererPlugin:
     def __init__(self, iface):
 
         self.iface = iface
-        self.bivariate_renderer_metadata = BivariateRendererMetadata()
 
-        self.bivariate_renderer_layout_item_gui_metadata = BivariateRendererLayoutItemGuiMetadata()
+        with QgsScopedRuntimeProfile("Create renderer metadata", Texts.profiler_group):
+            self.bivariate_renderer_metadata = BivariateRendererMetadata()
 
-        self.bivariate_renderer_layout_item_metadata = BivariateRendererLayoutItemMetadata()
+        with QgsScopedRuntimeProfile("Register layout item", Texts.profiler_group):
+            self.bivariate_renderer_layout_item_metadata = BivariateRendererLayoutItemMetadata()
 
-        # TODO disconnect
-        QgsApplication.layoutItemRegistry().addLayoutItemType(self.bivariate_renderer_layout_item_metadata)
+            # TODO disconnect
+            QgsApplication.layoutItemRegistry().addLayoutItemType(self.bivariate_renderer_layout_item_metadata)
 
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
 
-        QgsApplication.rendererRegistry().addRenderer(self.bivariate_renderer_metadata)
+        with QgsScopedRuntimeProfile("Register renderer", Texts.profiler_group):
+            QgsApplication.rendererRegistry().addRenderer(self.bivariate_renderer_metadata)
+
+        with QgsScopedRuntimeProfile("Import layout item GUI", Texts.profiler_group):
+            from qgis.gui import QgsGui
 
-        # TODO disconnect
-        QgsGui.layoutItemGuiRegistry().addLayoutItemGuiMetadata(self.bivariate_renderer_layout_item_gui_metadata)
+            from .layoutitems.layout_item_gui_metadata import BivariateRendererLayoutItemGuiMetadata
+
+        with QgsScopedRuntimeProfile("Register layout item GUI", Texts.profiler_group):
+            self.bivariate_renderer_layout_item_gui_metadata = BivariateRendererLayoutItemGuiMetadata()
+
+            # TODO disconnect
+            QgsGui.layoutItemGuiRegistry().addLayoutItemGuiMetadata(self.bivariate_renderer_layout_item_gui_metadata)
 
         self.initProcessing()
 
@@ -67,5 +81,9 @@ class BivariateRendererPlugin:
         pass
 
     def initProcessing(self):
-        self.provider = BivariateRendererProvider()
-        QgsApplication.processingRegistry().addProvider(self.provider)
+        with QgsScopedRuntimeProfile("Import processing provider", Texts.profiler_group):
+            from .bivariate_renderer_provider import BivariateRendererProvider
+
+        with QgsScopedRuntimeProfile("Register processing provider", Texts.profiler_group):
+            self.provider = BivariateRendererProvider()
+            QgsApplication.processingRegistry().addProvider(self.provider)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
 from qgis.PyQt.QtGui import QColor
 
 
@@ -13,6 +14,30 @@ class ColorMixingMethod(ABC):
     def mix_colors(self, color1: QColor, color2: QColor) -> QColor:
         pass
 
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        """Mix arrays of colors with shape `(..., 3)` and RGB values in range 0-255, arrays are broadcasted against each
+        other. Result is `uint8` array.
+
+        Default implementation mixes colors one by one with `mix_colors`.
+        """
+        rgb1, rgb2 = np.broadcast_arrays(np.asarray(rgb1), np.asarray(rgb2))
+
+        result = np.empty(rgb1.shape, dtype=np.uint8)
+
+        for index in np.ndindex(rgb1.shape[:-1]):
+            color = self.mix_colors(QColor(*rgb1[index].tolist()), QColor(*rgb2[index].tolist()))
+            result[index] = (color.red(), color.green(), color.blue())
+
+        return result
+
+    def _mix_colors_as_arrays(self, color1: QColor, color2: QColor) -> QColor:
+        rgb = self.mix_arrays(
+            np.array([color1.red(), color1.green(), color1.blue()]),
+            np.array([color2.red(), color2.green(), color2.blue()]),
+        )
+
+        return QColor(*rgb.tolist())
+
 
 class ColorMixingMethodDirect(ColorMixingMethod):
 
@@ -30,6 +55,9 @@ class ColorMixingMethodDirect(ColorMixingMethod):
             int((color1.blue() + color2.blue()) / 2),
         )
 
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        return ((np.asarray(rgb1, dtype=np.int64) + np.asarray(rgb2, dtype=np.int64)) // 2).astype(np.uint8)
+
 
 class ColorMixingMethodDarken(ColorMixingMethod):
 
@@ -45,6 +73,9 @@ class ColorMixingMethodDarken(ColorMixingMethod):
             min(color1.red(), color2.red()), min(color1.green(), color2.green()), min(color1.blue(), color2.blue())
         )
 
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        return np.minimum(np.asarray(rgb1), np.asarray(rgb2)).astype(np.uint8)
+
 
 class ColorMixingMethodMultiply(ColorMixingMethod):
 
@@ -61,3 +92,98 @@ class ColorMixingMethodMultiply(ColorMixingMethod):
             int((color1.greenF() * color2.greenF()) * 255),
             int((color1.blueF() * color2.blueF()) * 255),
         )
+
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        # same float values as QColor.redF() that stores components in 16 bits
+        rgb1 = (np.asarray(rgb1, dtype=np.int64) * 257) / 65535.0
+        rgb2 = (np.asarray(rgb2, dtype=np.int64) * 257) / 65535.0
+
+        return np.trunc((rgb1 * rgb2) * 255).astype(np.uint8)
+
+
+class ColorMixingMethodScreen(ColorMixingMethod):
+
+    def __init__(self):
+        pass
+
+    def name(self) -> str:
+        return "Blend Screen"
+
+    def mix_colors(self, color1: QColor, color2: QColor) -> QColor:
+        return self._mix_colors_as_arrays(color1, color2)
+
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        rgb1 = np.asarray(rgb1, dtype=float) / 255
+        rgb2 = np.asarray(rgb2, dtype=float) / 255
+
+        return np.rint((1 - (1 - rgb1) * (1 - rgb2)) * 255).astype(np.uint8)
+
+
+class ColorMixingMethodOverlay(ColorMixingMethod):
+
+    def __init__(self):
+        pass
+
+    def name(self) -> str:
+        return "Blend Overlay"
+
+    def mix_colors(self, color1: QColor, color2: QColor) -> QColor:
+        return self._mix_colors_as_arrays(color1, color2)
+
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        # first color is the base layer
+        rgb1 = np.asarray(rgb1, dtype=float) / 255
+        rgb2 = np.asarray(rgb2, dtype=float) / 255
+
+        result = np.where(rgb1 < 0.5, 2 * rgb1 * rgb2, 1 - 2 * (1 - rgb1) * (1 - rgb2))
+
+        return np.rint(result * 255).astype(np.uint8)
+
+
+class ColorMixingMethodLab(ColorMixingMethod):
+    """Average of colors in CIELAB color space (D65 white point), which is closer to perceived color difference."""
+
+    _white_point = np.array([0.95047, 1.0, 1.08883])
+
+    _rgb_to_xyz = np.array(
+        [
+            [0.4124564, 0.3575761, 0.1804375],
+            [0.2126729, 0.7151522, 0.0721750],
+            [0.0193339, 0.1191920, 0.9503041],
+        ]
+    )
+
+    def __init__(self):
+        pass
+
+    def name(self) -> str:
+        return "CIELAB Mixing"
+
+    def mix_colors(self, color1: QColor, color2: QColor) -> QColor:
+        return self._mix_colors_as_arrays(color1, color2)
+
+    def mix_arrays(self, rgb1: np.ndarray, rgb2: np.ndarray) -> np.ndarray:
+        lab = (self._rgb_to_lab(rgb1) + self._rgb_to_lab(rgb2)) / 2
+
+        return self._lab_to_rgb(lab)
+
+    def _rgb_to_lab(self, rgb: np.ndarray) -> np.ndarray:
+        rgb = np.asarray(rgb, dtype=float) / 255
+        linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+        xyz = (linear @ self._rgb_to_xyz.T) / self._white_point
+
+        f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+
+        return np.stack((116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+    def _lab_to_rgb(self, lab: np.ndarray) -> np.ndarray:
+        fy = (lab[..., 0] + 16) / 116
+        f = np.stack((fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200), axis=-1)
+
+        xyz = np.where(f > 6 / 29, f**3, 3 * (6 / 29) ** 2 * (f - 4 / 29)) * self._white_point
+
+        linear = np.clip(xyz @ np.linalg.inv(self._rgb_to_xyz).T, 0, 1)
+        rgb = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+        return np.rint(np.clip(rgb, 0, 1) * 255).astype(np.uint8)
@@ -1,28 +1,48 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from ..utils import Singleton
+from ..utils import RegisterDescriptor, Singleton
 from .color_mixing_method import (
     ColorMixingMethod,
     ColorMixingMethodDarken,
     ColorMixingMethodDirect,
+    ColorMixingMethodLab,
     ColorMixingMethodMultiply,
+    ColorMixingMethodOverlay,
+    ColorMixingMethodScreen,
 )
 
 
 class ColorMixingMethodsRegister(metaclass=Singleton):
+    """Register of color mixing methods, each method is created when it is requested for the first time."""
 
-    methods = [ColorMixingMethodDirect(), ColorMixingMethodDarken(), ColorMixingMethodMultiply()]
+    descriptors = [
+        RegisterDescriptor("Direct Mixing", ColorMixingMethodDirect),
+        RegisterDescriptor("Blend Darken", ColorMixingMethodDarken),
+        RegisterDescriptor("Blend Multiply", ColorMixingMethodMultiply),
+        RegisterDescriptor("Blend Screen", ColorMixingMethodScreen),
+        RegisterDescriptor("Blend Overlay", ColorMixingMethodOverlay),
+        RegisterDescriptor("CIELAB Mixing", ColorMixingMethodLab),
+    ]
+
+    def __init__(self) -> None:
+        self._methods: Dict[str, ColorMixingMethod] = {}
+
+    @property
+    def methods(self) -> List[ColorMixingMethod]:
+        return [self.get_by_name(x.name) for x in self.descriptors]
 
     @property
     def names(self) -> List[str]:
-        return [x.name() for x in self.methods]
+        return [x.name for x in self.descriptors]
 
     def get_by_name(self, name: str) -> Optional[ColorMixingMethod]:
 
-        mixing_method = None
-
-        for method in self.methods:
-            if method.name() == name:
-                mixing_method = method
+        if name not in self._methods:
+            for descriptor in self.descriptors:
+                if descriptor.name == name:
+                    self._methods[name] = descriptor.factory()
+                    break
+            else:
+                return None
 
-        return mixing_method
+        return self._methods[name]
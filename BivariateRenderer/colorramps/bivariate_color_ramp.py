@@ -2,27 +2,34 @@ from __future__ import annotations
 
 import math
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 
+import numpy as np
 from qgis.core import QgsColorRamp, QgsGradientColorRamp, QgsSymbolLayerUtils
-from qgis.PyQt.QtGui import QColor, QIcon
+from qgis.PyQt.QtGui import QColor, QIcon, QImage
 from qgis.PyQt.QtXml import QDomDocument, QDomElement
 
 from BivariateRenderer.colormixing.color_mixing_method import ColorMixingMethod, ColorMixingMethodMultiply
 from BivariateRenderer.colormixing.color_mixing_methods_register import ColorMixingMethodsRegister
 
-from ..utils import get_icon_path
+from ..utils import RegisterDescriptor, get_icon_path
 
 
 class BivariateColorRamp(ABC):
 
+    # name and icon of prepared color ramps, known without creating them
+    ramp_name = "Default Bivariate Color Ramp"
+    ramp_icon_file = ""
+
     def __init__(self, number_classes: int = 9) -> None:
         self._number_of_classes = number_classes
-        self._name: str = "Default Bivariate Color Ramp"
-        self._icon: str = ""
+        self._name: str = self.ramp_name
+        self._icon: str = self._ramp_icon_path()
         self._color_ramp_1: QgsGradientColorRamp = QgsGradientColorRamp()
         self._color_ramp_2: QgsGradientColorRamp = QgsGradientColorRamp()
         self._colors: List[List[QColor]] = []
+        self._color_matrix: Optional[np.ndarray] = None
+        self._color_matrix_image: Optional[QImage] = None
 
     @property
     def name(self) -> str:
@@ -34,6 +41,15 @@ class BivariateColorRamp(ABC):
         """Icon of the color ramp."""
         return QIcon(self._icon)
 
+    @classmethod
+    def register_descriptor(cls) -> RegisterDescriptor:
+        """Descriptor of the color ramp for registers, the ramp itself is not created."""
+        return RegisterDescriptor(cls.ramp_name, cls, cls._ramp_icon_path())
+
+    @classmethod
+    def _ramp_icon_path(cls) -> str:
+        return get_icon_path(cls.ramp_icon_file) if cls.ramp_icon_file else ""
+
     @property
     def number_of_classes(self) -> int:
         """Number of classes in the color ramp."""
@@ -43,8 +59,55 @@ class BivariateColorRamp(ABC):
         """Set the name of the color ramp."""
         self._name = name
 
+    @property
+    def color_matrix(self) -> np.ndarray:
+        """Colors of all cells as RGBA `uint8` array of shape `(n, n, 4)`.
+
+        The array is indexed by `[position_value1, position_value2]`. It is calculated once and kept until the ramp
+        changes, it should not be modified.
+        """
+        if self._color_matrix is None:
+            self._color_matrix = np.ascontiguousarray(self._calculate_color_matrix(), dtype=np.uint8)
+
+        return self._color_matrix
+
+    def color_matrix_image(self) -> QImage:
+        """Color matrix as image sharing memory with the array, pixel `(x, y)` has color of cell `[y, x]`.
+
+        The image is kept next to the array until the ramp changes, the array is also referenced by the image
+        wrapper, so that the memory stays valid as long as the returned image is used.
+        """
+        if self._color_matrix_image is None:
+            matrix = self.color_matrix
+
+            image = QImage(
+                matrix.data, matrix.shape[1], matrix.shape[0], matrix.strides[0], QImage.Format.Format_RGBA8888
+            )
+
+            # image does not own the data
+            image.color_matrix = matrix
+
+            self._color_matrix_image = image
+
+        return self._color_matrix_image
+
+    def _invalidate_color_matrix(self) -> None:
+        self._color_matrix = None
+        self._color_matrix_image = None
+
     @abstractmethod
-    def get_color(self, position_value1: int, position_value2: int) -> QColor: ...
+    def _calculate_color_matrix(self) -> np.ndarray: ...
+
+    def get_color(self, position_value1: int, position_value2: int) -> QColor:
+        matrix = self.color_matrix
+
+        # positions above the number of classes get the last color
+        position_value1 = min(position_value1, matrix.shape[0] - 1)
+        position_value2 = min(position_value2, matrix.shape[1] - 1)
+
+        red, green, blue, alpha = matrix[position_value1, position_value2].tolist()
+
+        return QColor(red, green, blue, alpha)
 
     @abstractmethod
     def save(self, doc: QDomDocument) -> QDomElement: ...
@@ -77,16 +140,19 @@ class BivariateColorRampGradient(BivariateColorRamp):
 
     def set_number_of_classes(self, number_of_classes: int) -> None:
         self._number_of_classes = number_of_classes
+        self._invalidate_color_matrix()
 
     def set_color_ramp_1(self, color_ramp: QgsColorRamp) -> None:
         """Set color ramp 1 if it is a QgsGradientColorRamp."""
         if isinstance(color_ramp, QgsGradientColorRamp):
             self._color_ramp_1 = color_ramp
+            self._invalidate_color_matrix()
 
     def set_color_ramp_2(self, color_ramp: QgsColorRamp) -> None:
         """Set color ramp 2 if it is a QgsGradientColorRamp."""
         if isinstance(color_ramp, QgsGradientColorRamp):
             self._color_ramp_2 = color_ramp
+            self._invalidate_color_matrix()
 
     @property
     def color_mixing_method(self) -> ColorMixingMethod:
@@ -94,14 +160,21 @@ class BivariateColorRampGradient(BivariateColorRamp):
 
     def set_color_mixing_method(self, color_mixing_method: ColorMixingMethod) -> None:
         self._color_mixing_method = color_mixing_method
+        self._invalidate_color_matrix()
 
-    def get_color(self, position_value1: int, position_value2: int) -> QColor:
-        color1 = self.color_ramp_1.color(position_value1 / (self._number_of_classes - 1))
-        color2 = self.color_ramp_2.color(position_value2 / (self._number_of_classes - 1))
+    def _calculate_color_matrix(self) -> np.ndarray:
+        rgb1 = self._ramp_colors(self.color_ramp_1)
+        rgb2 = self._ramp_colors(self.color_ramp_2)
+
+        matrix = np.full((self._number_of_classes, self._number_of_classes, 4), 255, dtype=np.uint8)
+        matrix[..., :3] = self.color_mixing_method.mix_arrays(rgb1[:, np.newaxis, :], rgb2[np.newaxis, :, :])
 
-        result_color = self.color_mixing_method.mix_colors(color1, color2)
+        return matrix
 
-        return result_color
+    def _ramp_colors(self, color_ramp: QgsGradientColorRamp) -> np.ndarray:
+        colors = [color_ramp.color(i / (self._number_of_classes - 1)) for i in range(self._number_of_classes)]
+
+        return np.array([[color.red(), color.green(), color.blue()] for color in colors], dtype=np.uint8)
 
     def save(self, doc: QDomDocument) -> QDomElement:
         main_element = doc.createElement("BivariateColorRamp")
@@ -170,8 +243,8 @@ class BivariateColorRampManual(BivariateColorRamp):
             if not len(row_colors) == len(colors):
                 raise ValueError("Colors list do not create a square.")
 
-    def get_color(self, position_value1: int, position_value2: int) -> QColor:
-        return self._colors[position_value1][position_value2]
+    def _calculate_color_matrix(self) -> np.ndarray:
+        return np.array([[color.getRgb() for color in row_colors] for row_colors in self._colors], dtype=np.uint8)
 
     def save(self, doc: QDomDocument) -> QDomElement:
         main_element = doc.createElement("BivariateColorRamp")
@@ -185,7 +258,7 @@ class BivariateColorRampManual(BivariateColorRamp):
         for i in range(self.number_of_classes):
             for j in range(self.number_of_classes):
                 color_element = doc.createElement("color")
-                color_element.setAttribute("value", self._colors[i][j].name())
+                color_element.setAttribute("value", self.get_color(i, j).name())
                 colors_element.appendChild(color_element)
 
         main_element.appendChild(colors_element)
@@ -234,132 +307,144 @@ class BivariateColorRampManual(BivariateColorRamp):
 
 
 class BivariateColorRampCyanBrown(BivariateColorRampGradient):
+    ramp_name = "Cyan - Brown"
+    ramp_icon_file = "cp_cyan_brown.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Cyan - Brown"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#80b9b5"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#a86a25"))
-        self._icon = get_icon_path("cp_cyan_brown.png")
 
 
 class BivariateColorRampTurquoiseGold(BivariateColorRampGradient):
+    ramp_name = "Turquoise - Gold"
+    ramp_icon_file = "cp_turquoise_gold.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Turquoise - Gold"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#4e9ec2"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#f6b500"))
-        self._icon = get_icon_path("cp_turquoise_gold.png")
 
 
 class BivariateColorRampOrangeBlue(BivariateColorRampGradient):
+    ramp_name = "Orange - Blue"
+    ramp_icon_file = "cp_orange_blue.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Orange - Blue"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#f6742e"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#17afe7"))
-        self._icon = get_icon_path("cp_orange_blue.png")
 
 
 class BivariateColorRampYellowBlue(BivariateColorRampGradient):
+    ramp_name = "Yellow - Blue"
+    ramp_icon_file = "cp_yellow_blue.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Yellow - Blue"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#f1d301"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#0097f1"))
-        self._icon = get_icon_path("cp_yellow_blue.png")
 
 
 class BivariateColorRampLigthYellowPurple(BivariateColorRampGradient):
+    ramp_name = "Ligth Yellow - Purple"
+    ramp_icon_file = "cp_ligth_yellow_purple.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Ligth Yellow - Purple"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#cab55a"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#9a73af"))
-        self._icon = get_icon_path("cp_ligth_yellow_purple.png")
 
 
 class BivariateColorRampCyanViolet(BivariateColorRampGradient):
+    ramp_name = "Cyan - Violet"
+    ramp_icon_file = "cp_cyan_violet.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Cyan - Violet"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#5bcaca"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#bf64ad"))
-        self._icon = get_icon_path("cp_cyan_violet.png")
 
 
 class BivariateColorRampBlueGreen(BivariateColorRampGradient):
+    ramp_name = "Blue - Green"
+    ramp_icon_file = "cp_blue_green.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Blue - Green"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#6c84b7"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#73af7f"))
-        self._icon = get_icon_path("cp_blue_green.png")
 
 
 class BivariateColorRampVioletBlue(BivariateColorRampGradient):
+    ramp_name = "Violet - Blue"
+    ramp_icon_file = "cp_violet_blue.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Violet - Blue"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#ae3a4c"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#4886c2"))
-        self._icon = get_icon_path("cp_violet_blue.png")
 
 
 class BivariateColorRampPinkBlue(BivariateColorRampGradient):
+    ramp_name = "Pink - Blue"
+    ramp_icon_file = "cp_pink_blue.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Pink - Blue"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#cb5b5b"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#66adc0"))
-        self._icon = get_icon_path("cp_pink_blue.png")
 
 
 class BivariateColorRampGreenPink(BivariateColorRampGradient):
+    ramp_name = "Green - Pink"
+    ramp_icon_file = "cp_green_pink.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Green - Pink"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#4cac26"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#d0258c"))
-        self._icon = get_icon_path("cp_green_pink.png")
 
 
 class BivariateColorRampGreenPurple(BivariateColorRampGradient):
+    ramp_name = "Green - Purple"
+    ramp_icon_file = "cp_green_purple.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Green - Purple"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#028834"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#7a3293"))
-        self._icon = get_icon_path("cp_green_purple.png")
 
 
 class BivariateColorRampOrangePurple(BivariateColorRampGradient):
+    ramp_name = "Orange - Purple"
+    ramp_icon_file = "cp_orange_purple.png"
+
     def __init__(
         self, number_classes: int = 3, color_mixing_method: ColorMixingMethod = ColorMixingMethodMultiply()
     ) -> None:
         super().__init__(number_classes, color_mixing_method)
-        self._name = "Orange - Purple"
         self._color_ramp_1 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#e95f00"))
         self._color_ramp_2 = QgsGradientColorRamp(QColor("#d3d3d3"), QColor("#5e3c96"))
-        self._icon = get_icon_path("cp_orange_purple.png")
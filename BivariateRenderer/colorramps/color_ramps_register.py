@@ -21,36 +21,44 @@ from .bivariate_color_ramp import (
 
 
 class BivariateColorRampsRegister(metaclass=Singleton):
+    """Register of prepared color ramps, ramps are created only when requested by name."""
 
-    color_ramps = [
-        BivariateColorRampBlueGreen(),
-        BivariateColorRampCyanBrown(),
-        BivariateColorRampCyanViolet(),
-        BivariateColorRampGreenPink(),
-        BivariateColorRampOrangeBlue(),
-        BivariateColorRampGreenPurple(),
-        BivariateColorRampLigthYellowPurple(),
-        BivariateColorRampOrangePurple(),
-        BivariateColorRampPinkBlue(),
-        BivariateColorRampTurquoiseGold(),
-        BivariateColorRampVioletBlue(),
-        BivariateColorRampYellowBlue(),
+    descriptors = [
+        ramp.register_descriptor()
+        for ramp in (
+            BivariateColorRampBlueGreen,
+            BivariateColorRampCyanBrown,
+            BivariateColorRampCyanViolet,
+            BivariateColorRampGreenPink,
+            BivariateColorRampOrangeBlue,
+            BivariateColorRampGreenPurple,
+            BivariateColorRampLigthYellowPurple,
+            BivariateColorRampOrangePurple,
+            BivariateColorRampPinkBlue,
+            BivariateColorRampTurquoiseGold,
+            BivariateColorRampVioletBlue,
+            BivariateColorRampYellowBlue,
+        )
     ]
 
+    @property
+    def color_ramps(self) -> List[BivariateColorRamp]:
+        """New instances of all color ramps."""
+        return [x.factory() for x in self.descriptors]
+
     @property
     def names(self) -> List[str]:
-        return [x.name for x in self.color_ramps]
+        return [x.name for x in self.descriptors]
 
     @property
     def icons(self) -> List[QIcon]:
-        return [x.icon for x in self.color_ramps]
+        return [x.icon for x in self.descriptors]
 
     def get_by_name(self, name: str) -> Optional[BivariateColorRamp]:
+        """New instance of the color ramp, `None` if there is no ramp with the name."""
 
-        found = None
-
-        for color_ramp in self.color_ramps:
-            if color_ramp.name == name:
-                found = color_ramp
+        for descriptor in self.descriptors:
+            if descriptor.name == name:
+                return descriptor.factory()
 
-        return found
+        return None
@@ -1,27 +1,33 @@
-from typing import Optional
+import hashlib
+import math
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
 
 from qgis.core import (
     Qgis,
+    QgsApplication,
     QgsFillSymbol,
     QgsLayout,
     QgsLayoutItem,
-    QgsLayoutItemAbstractMetadata,
     QgsLayoutItemRenderContext,
     QgsLineSymbol,
     QgsProject,
     QgsReadWriteContext,
+    QgsRenderContext,
     QgsSymbol,
     QgsSymbolLayerUtils,
+    QgsTask,
     QgsTextFormat,
     QgsVectorLayer,
 )
-from qgis.PyQt.QtGui import QColor, QIcon
+from qgis.PyQt.QtCore import QRectF, Qt, QThread, QTimer, pyqtBoundSignal
+from qgis.PyQt.QtGui import QColor, QIcon, QImage, QPaintEngine, QPainter, QPicture
 from qgis.PyQt.QtXml import QDomDocument, QDomElement
 
 from ..legendrenderer.legend_renderer import LegendRenderer
 from ..renderer.bivariate_renderer import BivariateRenderer
-from ..text_constants import IDS, Texts
-from ..utils import default_line_symbol, default_missing_values_symbol, get_icon_path
+from ..renderer.layer_classification import PopulatedCellsTask
+from ..text_constants import IDS
+from ..utils import default_line_symbol, default_missing_values_symbol, get_icon_path, layer_data_fingerprint
 
 
 class BivariateRendererLayoutItem(QgsLayoutItem):
@@ -61,6 +67,35 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
 
     ticks_use_category_midpoints: bool
 
+    # rendered legends keyed by output type, `image` for preview and `picture` for vector export
+    _legend_cache: Dict[str, Tuple[Hashable, Union[QImage, QPicture]]]
+
+    # increased whenever settings or renderer of the item change, rendered legends are valid only for one revision
+    _revision: int
+
+    # delay in ms after which deleted or changed features trigger scan for populated cells
+    populated_cells_scan_delay = 500
+
+    # delay in ms in which repeated style changes of the layer cause only one reload of the renderer
+    renderer_reload_delay = 100
+
+    # signals of the linked layer connected to slots of the item
+    _layer_connections: List[Tuple[pyqtBoundSignal, Callable]]
+
+    _populated_cells_task: Optional[PopulatedCellsTask]
+
+    # cells of features added while the scan runs
+    _cells_added_during_scan: int
+
+    # populated cells are found on first draw after the renderer is loaded
+    _populated_cells_outdated: bool
+
+    # populated cells and fingerprint of layer data they were found for, as read from project
+    _stored_populated_cells: Optional[Tuple[int, str]]
+
+    # id of layer read from project, layer is linked once the layout is restored or the item is drawn
+    _pending_layer_id: Optional[str]
+
     def __init__(self, layout: QgsLayout):
 
         super().__init__(layout)
@@ -102,6 +137,36 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self.replace_rectangle_without_values = False
         self.use_rectangle_without_values_color_from_legend = False
 
+        self._legend_cache = {}
+        self._revision = 0
+
+        self._populated_cells_task = None
+        self._cells_added_during_scan = 0
+        self._populated_cells_outdated = False
+        self._stored_populated_cells = None
+        self._pending_layer_id = None
+
+        self._populated_cells_scan_timer = QTimer(self)
+        self._populated_cells_scan_timer.setSingleShot(True)
+        self._populated_cells_scan_timer.setInterval(self.populated_cells_scan_delay)
+        self._populated_cells_scan_timer.timeout.connect(self.start_populated_cells_scan)
+
+        self._layer_connections = []
+
+        self._renderer_reload_timer = QTimer(self)
+        self._renderer_reload_timer.setSingleShot(True)
+        self._renderer_reload_timer.setInterval(self.renderer_reload_delay)
+        self._renderer_reload_timer.timeout.connect(self.load_renderer_from_layer)
+
+    def invalidate_legend_cache(self) -> None:
+        """Start new revision of the item and drop rendered legends, so that they do not keep memory.
+
+        Has to be called whenever settings of the item or its renderer change, setters of the item call it, settings
+        assigned directly need to be followed by this call.
+        """
+        self._revision += 1
+        self._legend_cache.clear()
+
     def to_legend_renderer(self) -> LegendRenderer:
 
         legend_render = LegendRenderer()
@@ -147,28 +212,124 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         )
         legend_render.symbol_rectangle_without_values = self.symbol_rectangle_without_values.clone()
 
+        legend_render.color_matrix_image = self.renderer.bivariate_color_ramp.color_matrix_image()
+
         return legend_render
 
     def draw(self, context: QgsLayoutItemRenderContext) -> None:
 
+        self.link_pending_layer()
+
+        if not self.renderer:
+            return
+
         render_context = context.renderContext()
 
         item_size = self.layout().convertToLayoutUnits(self.sizeWithUnits())
 
+        painter = render_context.painter()
+
+        if self.layout().renderContext().isPreviewRender():
+            self.update_populated_cells()
+
+            self.draw_cached_image(render_context, item_size.width(), item_size.height())
+
+        else:
+            self.update_populated_cells(wait=True)
+
+            if painter.paintEngine() is not None and painter.paintEngine().type() != QPaintEngine.Type.Raster:
+                self.draw_cached_picture(render_context, item_size.width(), item_size.height())
+
+            else:
+                # raster exports are rendered directly, so that legend is aligned with output pixels
+                self.render_legend(render_context, item_size.width(), item_size.height())
+
+    def render_legend(self, render_context: QgsRenderContext, width: float, height: float) -> None:
+
         legend_render = self.to_legend_renderer()
 
-        if self.renderer:
+        legend_render.render_legend(
+            render_context,
+            width,
+            height,
+            self.renderer.generate_legend_polygons(),
+            self.renderer.field_1_classes,
+            self.renderer.field_2_classes,
+            self.renderer.field_1_labels,
+            self.renderer.field_2_labels,
+        )
+
+    def legend_cache_key(self, render_context: QgsRenderContext, width: float, height: float, *extra) -> Hashable:
+        return (self._revision, width, height, render_context.scaleFactor(), *extra)
+
+    def cached_legend(self, output: str, key: Hashable) -> Optional[Union[QImage, QPicture]]:
+
+        cached = self._legend_cache.get(output)
+
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        return None
+
+    def draw_cached_image(self, render_context: QgsRenderContext, width: float, height: float) -> None:
+
+        painter = render_context.painter()
 
-            legend_render.render_legend(
-                render_context,
-                item_size.width(),
-                item_size.height(),
-                self.renderer.generate_legend_polygons(),
-                self.renderer.field_1_classes,
-                self.renderer.field_2_classes,
-                self.renderer.field_1_labels,
-                self.renderer.field_2_labels,
-            )
+        transform = painter.worldTransform()
+        pixel_ratio = painter.device().devicePixelRatioF()
+
+        image_width = max(1, math.ceil(width * math.hypot(transform.m11(), transform.m12()) * pixel_ratio))
+        image_height = max(1, math.ceil(height * math.hypot(transform.m21(), transform.m22()) * pixel_ratio))
+
+        key = self.legend_cache_key(render_context, width, height, image_width, image_height)
+
+        image = self.cached_legend("image", key)
+
+        if image is None:
+
+            image = QImage(image_width, image_height, QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(Qt.GlobalColor.transparent)
+
+            image_painter = QPainter(image)
+            image_painter.setRenderHints(painter.renderHints())
+            image_painter.scale(image_width / width, image_height / height)
+
+            self.render_legend(self.render_context_for_painter(render_context, image_painter), width, height)
+
+            image_painter.end()
+
+            self._legend_cache["image"] = (key, image)
+
+        painter.drawImage(QRectF(0, 0, width, height), image)
+
+    def draw_cached_picture(self, render_context: QgsRenderContext, width: float, height: float) -> None:
+
+        painter = render_context.painter()
+
+        key = self.legend_cache_key(render_context, width, height)
+
+        picture = self.cached_legend("picture", key)
+
+        if picture is None:
+
+            picture = QPicture()
+
+            picture_painter = QPainter(picture)
+            picture_painter.setRenderHints(painter.renderHints())
+
+            self.render_legend(self.render_context_for_painter(render_context, picture_painter), width, height)
+
+            picture_painter.end()
+
+            self._legend_cache["picture"] = (key, picture)
+
+        painter.drawPicture(0, 0, picture)
+
+    @staticmethod
+    def render_context_for_painter(render_context: QgsRenderContext, painter: QPainter) -> QgsRenderContext:
+        context = QgsRenderContext(render_context)
+        context.setPainter(painter)
+        return context
 
     def writePropertiesToElement(
         self, bivariate_legend_element: QDomElement, doc: QDomDocument, context: QgsReadWriteContext
@@ -227,8 +388,15 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
 
         bivariate_legend_element.appendChild(empty_polygon_symbol_elem)
 
-        if self.layer:
-            bivariate_legend_element.setAttribute("vectorLayerId", self.layer.id())
+        if self.linked_layer_id:
+            bivariate_legend_element.setAttribute("vectorLayerId", self.linked_layer_id)
+
+        stored_populated_cells = self.populated_cells_to_store()
+
+        if stored_populated_cells is not None:
+            existing_cells, fingerprint = stored_populated_cells
+            bivariate_legend_element.setAttribute("populated_cells", format(existing_cells, "x"))
+            bivariate_legend_element.setAttribute("populated_cells_fingerprint", fingerprint)
 
         return True
 
@@ -236,20 +404,22 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self, element: QDomElement, document: QDomDocument, context: QgsReadWriteContext
     ) -> bool:
 
+        self.disconnect_layer()
         self.layer = None
 
-        if element.hasAttribute("vectorLayerId"):
-
-            layerId = element.attribute("vectorLayerId")
-
-            layer = QgsProject.instance().mapLayer(layerId)
-
-            if layer:
+        # layer is linked in finalizeRestoreFromXml, when all layers of the project are loaded
+        self._pending_layer_id = element.attribute("vectorLayerId") or None
 
-                if layer.type() == Qgis.LayerType.Vector:
+        self._stored_populated_cells = None
 
-                    if isinstance(layer.renderer(), BivariateRenderer):
-                        self.set_linked_layer(layer)
+        if element.hasAttribute("populated_cells_fingerprint"):
+            try:
+                self._stored_populated_cells = (
+                    int(element.attribute("populated_cells"), 16),
+                    element.attribute("populated_cells_fingerprint"),
+                )
+            except ValueError:
+                pass
 
         line_symbol_elem = element.firstChildElement("lineSymbol")
 
@@ -308,24 +478,267 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
             loaded_symbol if loaded_symbol is not None else default_missing_values_symbol()
         )
 
+        self.invalidate_legend_cache()
+
         return True
 
+    def finalizeRestoreFromXml(self) -> None:
+        super().finalizeRestoreFromXml()
+        self.link_pending_layer()
+
+    def link_pending_layer(self) -> None:
+        """Link layer read from project, populated cells are found only when the item is drawn."""
+        layer_id = self._pending_layer_id
+
+        if layer_id is None:
+            return
+
+        self._pending_layer_id = None
+
+        layer = QgsProject.instance().mapLayer(layer_id)
+
+        if layer:
+
+            if layer.type() == Qgis.LayerType.Vector:
+
+                if isinstance(layer.renderer(), BivariateRenderer):
+                    self.set_linked_layer(layer)
+
     def set_linked_layer(self, layer: QgsVectorLayer) -> None:
-        self.layer = layer
+        self._pending_layer_id = None
+
+        if layer is not self.layer or not self._layer_connections:
+            self.disconnect_layer()
+            self.layer = layer
+            self.connect_layer()
+
         self.load_renderer_from_layer()
-        self.layer.styleChanged.connect(self.load_renderer_from_layer)
+
+    def connect_layer(self) -> None:
+        """Connect signals of the linked layer, every slot is connected once."""
+        self._layer_connections = [
+            (self.layer.styleChanged, self.schedule_renderer_reload),
+            (self.layer.featureAdded, self.feature_added),
+            (self.layer.featureDeleted, self.schedule_populated_cells_scan),
+            (self.layer.attributeValueChanged, self.attribute_value_changed),
+            (self.layer.willBeDeleted, self.layer_will_be_deleted),
+        ]
+
+        for signal, slot in self._layer_connections:
+            signal.connect(slot)
+
+    def disconnect_layer(self) -> None:
+        """Disconnect signals of previously linked layer and stop work pending for it."""
+        for signal, slot in self._layer_connections:
+            try:
+                signal.disconnect(slot)
+            except (RuntimeError, TypeError):
+                # layer was already deleted or the signal is not connected
+                pass
+
+        self._layer_connections = []
+
+        self._renderer_reload_timer.stop()
+        self._populated_cells_scan_timer.stop()
+        self.cancel_populated_cells_scan()
+
+    def layer_will_be_deleted(self) -> None:
+        # renderer is kept so that the legend is still drawn
+        self.disconnect_layer()
+        self.layer = None
+
+    def schedule_renderer_reload(self) -> None:
+        self._renderer_reload_timer.start()
 
     def load_renderer_from_layer(self) -> None:
+        self._renderer_reload_timer.stop()
+
+        if self.layer is None:
+            return
+
         self.renderer = self.layer.renderer().clone()
 
-        if isinstance(self.renderer, BivariateRenderer):
-            self.renderer.populate_labels_existing_from_layer(self.layer)
+        # populated cells stored in the layer renderer are used until they are found on first draw
+        self.cancel_populated_cells_scan()
+        self._populated_cells_outdated = True
+
+        self.invalidate_legend_cache()
+        self.refresh()
+
+    def update_populated_cells(self, wait: bool = False) -> None:
+        """Find populated cells if the renderer was loaded since they were last found.
+
+        Cells stored in project are used if layer data did not change, otherwise the layer is scanned in background.
+        With `wait` the result of the scan is awaited.
+        """
+        if self._populated_cells_outdated:
+            self._populated_cells_outdated = False
+
+            if self.restore_stored_populated_cells():
+                return
+
+            self.start_populated_cells_scan()
+
+        if wait:
+            self.wait_for_populated_cells_scan()
+
+    def populated_cells_fingerprint(self) -> Optional[str]:
+        """Fingerprint of layer data and classes that populated cells depend on.
+
+        Returns `None` if changes of layer data cannot be detected, that is for layers not stored in files and layers
+        with unsaved edits.
+        """
+        if self.layer is None or not isinstance(self.renderer, BivariateRenderer):
+            return None
+
+        data_fingerprint = layer_data_fingerprint(self.layer)
+
+        if data_fingerprint is None:
+            return None
+
+        data = (data_fingerprint, self.renderer.classification_fingerprint())
+
+        return hashlib.sha1(repr(data).encode("utf-8")).hexdigest()
+
+    def restore_stored_populated_cells(self) -> bool:
+        """Use populated cells read from project if they were found for the current layer data and classes."""
+        if self._stored_populated_cells is None:
+            return False
+
+        existing_cells, fingerprint = self._stored_populated_cells
+
+        if fingerprint != self.populated_cells_fingerprint():
+            return False
+
+        self.renderer.existing_cells = existing_cells
+        self.invalidate_legend_cache()
+
+        return True
+
+    def populated_cells_to_store(self) -> Optional[Tuple[int, str]]:
+        if self._pending_layer_id is not None or self._populated_cells_outdated:
+            # populated cells were not found since project was read
+            return self._stored_populated_cells
+
+        if self.is_populated_cells_scan_pending():
+            return None
+
+        fingerprint = self.populated_cells_fingerprint()
+
+        if fingerprint is None:
+            return None
+
+        return (self.renderer.existing_cells, fingerprint)
+
+    def start_populated_cells_scan(self) -> None:
+        """Find populated cells of the linked layer in background task that supersedes any running one."""
+        self._populated_cells_scan_timer.stop()
+        self.cancel_populated_cells_scan()
+
+        if self.layer is None or not isinstance(self.renderer, BivariateRenderer):
+            return
+
+        self._cells_added_during_scan = 0
 
+        task = PopulatedCellsTask(self.layer, self.renderer)
+        task.populated_cells_found.connect(self.populated_cells_found)
+
+        self._populated_cells_task = task
+
+        QgsApplication.taskManager().addTask(task)
+
+    def schedule_populated_cells_scan(self, *args) -> None:
+        self._populated_cells_scan_timer.start()
+
+    def cancel_populated_cells_scan(self) -> None:
+        task = self._populated_cells_task
+
+        if task is None:
+            return
+
+        self._populated_cells_task = None
+
+        try:
+            task.cancel()
+        except RuntimeError:
+            # task was already deleted by task manager
+            pass
+
+    def is_populated_cells_scan_pending(self) -> bool:
+        return self._populated_cells_task is not None or self._populated_cells_scan_timer.isActive()
+
+    def wait_for_populated_cells_scan(self) -> None:
+        """Wait for pending scan, so that exported legend is exact. Layer is read by the task, not on this thread."""
+        if QThread.currentThread() != self.thread():
+            # tasks can only be started and their results taken over from main thread
+            return
+
+        if self._populated_cells_scan_timer.isActive():
+            self.start_populated_cells_scan()
+
+        task = self._populated_cells_task
+
+        if task is None:
+            return
+
+        if not task.waitForFinished():
+            # legend is exported with the cells found so far
+            return
+
+        if task.status() == QgsTask.TaskStatus.Complete:
+            # task manager calls `finished` only later from event loop
+            self.populated_cells_found(task)
+
+    def populated_cells_found(self, task: PopulatedCellsTask) -> None:
+        if task is not self._populated_cells_task:
+            return
+
+        self._populated_cells_task = None
+
+        if task.existing_cells is None:
+            return
+
+        # features added while the task was running are not in its feature source
+        self.set_existing_cells(task.existing_cells | self._cells_added_during_scan)
+
+    def feature_added(self, feature_id: int) -> None:
+        if not isinstance(self.renderer, BivariateRenderer):
+            return
+
+        cell = self.renderer.feature_cell(self.layer.getFeature(feature_id))
+
+        if self._populated_cells_task is not None:
+            self._cells_added_during_scan |= cell
+
+        self.set_existing_cells(self.renderer.existing_cells | cell)
+
+    def attribute_value_changed(self, feature_id: int, field_index: int, value) -> None:
+        if not isinstance(self.renderer, BivariateRenderer):
+            return
+
+        field_name = self.layer.fields().at(field_index).name()
+
+        if field_name not in (self.renderer.field_name_1, self.renderer.field_name_2):
+            return
+
+        # new cell of the feature is populated, the previous one might have become empty
+        self.feature_added(feature_id)
+        self.schedule_populated_cells_scan()
+
+    def set_existing_cells(self, existing_cells: int) -> None:
+        """Use populated cells for the renderer and redraw the legend if they changed."""
+        if existing_cells == self.renderer.existing_cells:
+            return
+
+        self.renderer.existing_cells = existing_cells
+
+        self.invalidate_legend_cache()
         self.refresh()
 
     def set_y_axis_rotation(self, rotation: float) -> None:
         self.y_axis_rotation = rotation
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     def set_axis_texts_settings(
@@ -336,11 +749,13 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self.text_axis_x = axis_x_text
         self.text_axis_y = axis_y_text
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     def set_legend_rotated(self, rotated: bool) -> None:
         self.legend_rotated = rotated
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     def are_labels_default(self) -> bool:
@@ -363,6 +778,7 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self.ticks_x_precision = axis_x_precision
         self.ticks_y_precision = axis_y_precision
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     def set_color_separator_settings(self, draw: bool, color: QColor, width: float) -> None:
@@ -370,6 +786,7 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self.color_separator_color = color
         self.color_separator_width = width
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     def set_arrows_settings(self, draw: bool, line_format: QgsLineSymbol, use_common_point: bool, width: float) -> None:
@@ -378,6 +795,7 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self.arrow_width = width
         self.line_format = line_format.clone()
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     def set_rectangle_without_values_settings(self, use: bool, symbol: QgsFillSymbol, color_from_legend: bool) -> None:
@@ -386,11 +804,14 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
         self.replace_rectangle_without_values = use
         self.use_rectangle_without_values_color_from_legend = color_from_legend
 
+        self.invalidate_legend_cache()
         self.refresh()
 
     @property
     def linked_layer(self) -> Optional[QgsVectorLayer]:
 
+        self.link_pending_layer()
+
         if self.layer is not None:
             return self.layer
 
@@ -399,6 +820,9 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
     @property
     def linked_layer_id(self) -> Optional[str]:
 
+        if self._pending_layer_id is not None:
+            return self._pending_layer_id
+
         if self.layer is not None:
             return self.layer.id()
 
@@ -410,12 +834,3 @@ class BivariateRendererLayoutItem(QgsLayoutItem):
     def icon(self) -> QIcon:
 
         return QIcon(get_icon_path("legend_icon.png"))
-
-
-class BivariateRendererLayoutItemMetadata(QgsLayoutItemAbstractMetadata):
-
-    def __init__(self):
-        super().__init__(IDS.plot_item_bivariate_renderer_legend, Texts.plot_item_bivariate_renderer)
-
-    def createItem(self, layout):
-        return BivariateRendererLayoutItem(layout)
@@ -0,0 +1,24 @@
+from qgis.core import QgsLayoutItem
+from qgis.gui import QgsLayoutItemAbstractGuiMetadata
+from qgis.PyQt.QtGui import QIcon
+
+from ..text_constants import IDS, Texts
+from ..utils import get_icon_path
+
+
+class BivariateRendererLayoutItemGuiMetadata(QgsLayoutItemAbstractGuiMetadata):
+    """
+    Metadata for plot item GUI classes
+    """
+
+    def __init__(self):
+        super().__init__(IDS.plot_item_bivariate_renderer_legend, Texts.plot_item_bivariate_renderer)
+
+    def createItemWidget(self, item: QgsLayoutItem):  # pylint: disable=missing-docstring, no-self-use
+        # widget module is loaded only when the widget is needed
+        from .layout_item_widget import BivariateRendererLayoutItemWidget
+
+        return BivariateRendererLayoutItemWidget(None, item)
+
+    def creationIcon(self) -> QIcon:
+        return QIcon(get_icon_path("add_legend_icon.png"))
@@ -0,0 +1,15 @@
+from qgis.core import QgsLayoutItemAbstractMetadata
+
+from ..text_constants import IDS, Texts
+
+
+class BivariateRendererLayoutItemMetadata(QgsLayoutItemAbstractMetadata):
+
+    def __init__(self):
+        super().__init__(IDS.plot_item_bivariate_renderer_legend, Texts.plot_item_bivariate_renderer)
+
+    def createItem(self, layout):
+        # layout item module is loaded only when the item is created
+        from .layout_item import BivariateRendererLayoutItem
+
+        return BivariateRendererLayoutItem(layout)
@@ -3,16 +3,13 @@ from qgis.gui import (
     QgsCollapsibleGroupBoxBasic,
     QgsColorButton,
     QgsFontButton,
-    QgsLayoutItemAbstractGuiMetadata,
     QgsLayoutItemBaseWidget,
     QgsSymbolButton,
 )
 from qgis.PyQt.QtCore import Qt
-from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QCheckBox, QComboBox, QDoubleSpinBox, QLabel, QPlainTextEdit, QSpinBox, QVBoxLayout
 
 from ..text_constants import IDS, Texts
-from ..utils import get_icon_path
 from .layout_item import BivariateRendererLayoutItem
 
 
@@ -436,18 +433,3 @@ class BivariateRendererLayoutItemWidget(QgsLayoutItemBaseWidget):
 
     def type(self):
         return IDS.plot_item_bivariate_renderer_legend
-
-
-class BivariateRendererLayoutItemGuiMetadata(QgsLayoutItemAbstractGuiMetadata):
-    """
-    Metadata for plot item GUI classes
-    """
-
-    def __init__(self):
-        super().__init__(IDS.plot_item_bivariate_renderer_legend, Texts.plot_item_bivariate_renderer)
-
-    def createItemWidget(self, item: QgsLayoutItem):  # pylint: disable=missing-docstring, no-self-use
-        return BivariateRendererLayoutItemWidget(None, item)
-
-    def creationIcon(self) -> QIcon:
-        return QIcon(get_icon_path("add_legend_icon.png"))
@@ -0,0 +1,36 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from qgis.PyQt.QtGui import QTransform
+
+
+@dataclass
+class LegendLayout:
+    """Geometry of the legend calculated once per render, all sizes are in painter units."""
+
+    width: float
+    height: float
+    margin: float
+
+    text_height_x: float
+    text_height_y: float
+    text_height_max: float
+    text_height_max_with_margin: float
+
+    axis_tick_text_height: float
+    axis_tick_text_height_with_margin: float
+    axis_tick_last_value_max_width: float
+
+    arrow_width: float
+    axis_text_tics_top: float
+    all_elements_top: float
+
+    cells_count: int
+    size_constant: float
+    polygon_start_pos_x: float
+    polygon_start_pos_y: float
+
+    transform: QTransform
+
+    ticks_x: List[List[str]] = field(default_factory=list)
+    ticks_y: List[List[str]] = field(default_factory=list)
@@ -1,5 +1,5 @@
 import math
-from typing import List
+from typing import Dict, List, Optional
 
 from qgis.core import (
     QgsBasicNumericFormat,
@@ -14,10 +14,11 @@ from qgis.core import (
     QgsTextRenderer,
 )
 from qgis.PyQt.QtCore import QPointF, QRectF, Qt
-from qgis.PyQt.QtGui import QColor, QPainter, QPen, QPolygonF, QTransform
+from qgis.PyQt.QtGui import QColor, QImage, QPaintEngine, QPainter, QPainterPath, QPen, QPolygonF, QTransform
 
 from ..renderer.bivariate_renderer_utils import LegendPolygon, classes_to_legend_midpoints
 from ..utils import default_line_symbol, default_missing_values_symbol, only_color_fill_symbol
+from .legend_layout import LegendLayout
 
 
 class LegendRenderer:
@@ -43,12 +44,12 @@ class LegendRenderer:
     context: QgsRenderContext
 
     _painter: QPainter
-    _polygons_count: int
+    _polygons_count: int = 0
 
     _text_axis_x: List[str]
     _text_axis_y: List[str]
 
-    _transform: QTransform = None
+    _layout: Optional[LegendLayout] = None
 
     texts_axis_x_ticks: List[float]
     texts_axis_y_ticks: List[float]
@@ -74,12 +75,11 @@ class LegendRenderer:
     replace_rectangle_without_values: bool
     use_rectangle_without_values_color_from_legend: bool
 
+    color_matrix_image: Optional[QImage]
+
     _text_height_x: float
     _text_height_y: float
 
-    _render_previous_height: float = -1
-    _render_previous_width: float = -1
-
     def __init__(self):
 
         self._painter = None
@@ -113,6 +113,8 @@ class LegendRenderer:
         self.use_rectangle_without_values_color_from_legend = True
         self.symbol_rectangle_without_values = default_missing_values_symbol().clone()
 
+        self.color_matrix_image = None
+
     def set_size_context(self, width: float, height: float) -> None:
 
         min_size = min(width, height)
@@ -152,39 +154,112 @@ class LegendRenderer:
             self._text_height_y = 0
 
     @property
-    def text_height_max_with_margin(self) -> float:
+    def layout(self) -> LegendLayout:
+        """Geometry of the legend from the last render, calculated from current settings if there was no render yet."""
+        if self._layout is None:
+            return self.calculate_layout(self._polygons_count)
 
-        if self.add_axes_texts:
+        return self._layout
 
-            return self.text_height_max + self.margin
+    def calculate_layout(self, cells_count: int) -> LegendLayout:
+        """Calculate geometry of the legend with `cells_count` cells, text sizes are measured only here."""
 
+        margin = self.height * self.margin_const_percent
+
+        if self.add_axes_texts:
+            text_height_max = max(self._text_height_x, self._text_height_y)
+            text_height_max_with_margin = text_height_max + margin
         else:
+            text_height_max = 0
+            text_height_max_with_margin = 0
 
-            return 0
+        ticks_x = []
+        ticks_y = []
 
-    @property
-    def margin(self) -> float:
+        axis_tick_text_height = 0
+        axis_tick_text_height_with_margin = 0
+        axis_tick_last_value_max_width = 0
 
-        return self.height * self.margin_const_percent
+        if self.add_axes_ticks_texts:
+            ticks_x = [self.format_tick_value(value, self.ticks_x_precision) for value in self.texts_axis_x_ticks]
+            ticks_y = [self.format_tick_value(value, self.ticks_y_precision) for value in self.texts_axis_y_ticks]
 
-    @property
-    def text_height_max(self) -> float:
+            axis_tick_text_height = QgsTextRenderer.textHeight(
+                self.context,
+                self.text_format_ticks,
+                textLines=self.format_tick_value(self.texts_axis_x_ticks[0], self.ticks_x_precision),
+            )
+            axis_tick_text_height_with_margin = axis_tick_text_height + self._space_above_ticks
+
+            if not self.use_category_midpoints:
+                axis_tick_last_value_max_width = max(
+                    QgsTextRenderer.textWidth(
+                        self.context,
+                        self.text_format_ticks,
+                        textLines=self.format_tick_value(max(self.texts_axis_x_ticks), self.ticks_x_precision),
+                    ),
+                    QgsTextRenderer.textWidth(
+                        self.context,
+                        self.text_format_ticks,
+                        textLines=self.format_tick_value(max(self.texts_axis_y_ticks), self.ticks_y_precision),
+                    ),
+                )
 
-        if self.add_axes_texts:
+        if self.add_axes_arrows:
+            arrow_width = self.width * (self.arrow_width_percent / 100)
+        else:
+            arrow_width = 0
 
-            return max(self.text_height_x, self.text_height_y)
+        axis_text_tics_top = text_height_max_with_margin + axis_tick_text_height_with_margin
+        all_elements_top = axis_text_tics_top + arrow_width
 
+        if cells_count:
+            size_constant = (self.width - all_elements_top) / math.sqrt(cells_count)
         else:
+            size_constant = 0
+
+        return LegendLayout(
+            width=self.width,
+            height=self.height,
+            margin=margin,
+            text_height_x=self._text_height_x,
+            text_height_y=self._text_height_y,
+            text_height_max=text_height_max,
+            text_height_max_with_margin=text_height_max_with_margin,
+            axis_tick_text_height=axis_tick_text_height,
+            axis_tick_text_height_with_margin=axis_tick_text_height_with_margin,
+            axis_tick_last_value_max_width=axis_tick_last_value_max_width,
+            arrow_width=arrow_width,
+            axis_text_tics_top=axis_text_tics_top,
+            all_elements_top=all_elements_top,
+            cells_count=cells_count,
+            size_constant=size_constant,
+            polygon_start_pos_x=all_elements_top,
+            polygon_start_pos_y=self.width - all_elements_top,
+            transform=self._calculate_transform(axis_tick_last_value_max_width),
+            ticks_x=ticks_x,
+            ticks_y=ticks_y,
+        )
 
-            return 0
+    @property
+    def text_height_max_with_margin(self) -> float:
+        return self.layout.text_height_max_with_margin
+
+    @property
+    def margin(self) -> float:
+        return self.layout.margin
+
+    @property
+    def text_height_max(self) -> float:
+        return self.layout.text_height_max
 
     @property
     def text_height_x(self) -> float:
-        return self._text_height_x
+        return self.layout.text_height_x
 
     @property
     def text_height_y(self) -> float:
-        return self._text_height_y
+        return self.layout.text_height_y
 
     @property
     def arrow_start_x(self) -> float:
@@ -210,22 +285,15 @@ class LegendRenderer:
 
     @property
     def arrow_width(self) -> float:
-
-        if self.add_axes_arrows:
-
-            return self.width * (self.arrow_width_percent / 100)
-
-        else:
-
-            return 0
+        return self.layout.arrow_width
 
     @property
     def axis_text_tics_top(self):
-        return self.text_height_max_with_margin + self.axis_tick_text_height_with_margin
+        return self.layout.axis_text_tics_top
 
     @property
     def all_elements_top(self) -> float:
-        return self.axis_text_tics_top + self.arrow_width
+        return self.layout.all_elements_top
 
     @property
     def text_position_x(self) -> QPointF:
@@ -269,15 +337,15 @@ class LegendRenderer:
 
     @property
     def size_constant(self) -> float:
-        return (self.width - self.all_elements_top) / math.sqrt(self._polygons_count)
+        return self.layout.size_constant
 
     @property
     def polygon_start_pos_x(self) -> float:
-        return self.all_elements_top
+        return self.layout.polygon_start_pos_x
 
     @property
     def polygon_start_pos_y(self) -> float:
-        return self.width - self.all_elements_top
+        return self.layout.polygon_start_pos_y
 
     @property
     def arrow_x_start_point(self) -> QPointF:
@@ -327,47 +395,44 @@ class LegendRenderer:
 
     @property
     def transform(self) -> QTransform:
+        return self.layout.transform
 
-        if self._transform is None:
-
-            self._transform = QTransform()
-
-            max_size = self.height
+    def _calculate_transform(self, axis_tick_last_value_max_width: float) -> QTransform:
 
-            if self.add_axes_ticks_texts:
-                if not self.use_category_midpoints:
-                    max_size = self.height + self.axis_tick_last_value_max_width / 2
+        transform = QTransform()
 
-            if self.legend_rotated:
+        max_size = self.height
 
-                size = self.height - max_size
-
-                scale_factor_orig = self.height / math.sqrt(math.pow(max_size, 2) + math.pow(max_size, 2))
-                scale_factor = (int(scale_factor_orig * 100) / 100) - 0.02
+        if self.add_axes_ticks_texts:
+            if not self.use_category_midpoints:
+                max_size = self.height + axis_tick_last_value_max_width / 2
 
-                self._transform.translate(self.width / 2, self.height / 2)
-                self._transform.rotate(-45)
-                self._transform.scale(scale_factor, scale_factor)
-                self._transform.translate(
-                    -(self.width / 2) - (size / 2) * scale_factor_orig,
-                    -(self.height / 2) + (size / 2) * scale_factor_orig,
-                )
+        if self.legend_rotated:
 
-            else:
-                scale_factor = self.height / max_size
-                self._transform.scale(scale_factor, scale_factor)
-                self._transform.translate(0, self.axis_tick_last_value_max_width / 2)
+            size = self.height - max_size
 
-        return self._transform
+            scale_factor_orig = self.height / math.sqrt(math.pow(max_size, 2) + math.pow(max_size, 2))
+            scale_factor = (int(scale_factor_orig * 100) / 100) - 0.02
 
-    def draw_polygons(self, polygons: List[LegendPolygon]) -> None:
+            transform.translate(self.width / 2, self.height / 2)
+            transform.rotate(-45)
+            transform.scale(scale_factor, scale_factor)
+            transform.translate(
+                -(self.width / 2) - (size / 2) * scale_factor_orig,
+                -(self.height / 2) + (size / 2) * scale_factor_orig,
+            )
 
-        symbol = only_color_fill_symbol()
+        else:
+            scale_factor = self.height / max_size
+            transform.scale(scale_factor, scale_factor)
+            transform.translate(0, axis_tick_last_value_max_width / 2)
 
-        for polygon in polygons:
+        return transform
 
-            # Create the polygon rectangle
-            polygon_draw = QPolygonF(
+    def polygon_cell(self, polygon: LegendPolygon) -> QPolygonF:
+        """Rectangle of the legend polygon in painter coordinates."""
+        return self.transform.map(
+            QPolygonF(
                 QRectF(
                     self.polygon_start_pos_x + polygon.x * self.size_constant,
                     self.polygon_start_pos_y - (polygon.y + 1) * self.size_constant,
@@ -375,26 +440,92 @@ class LegendRenderer:
                     self.size_constant,
                 )
             )
+        )
+
+    def is_replaced_polygon(self, polygon: LegendPolygon) -> bool:
+        return self.replace_rectangle_without_values and polygon.exist_in_map is False
 
-            polygon_draw = self.transform.map(polygon_draw)
+    def draw_polygons(self, polygons: List[LegendPolygon]) -> None:
+
+        if self.can_draw_polygons_image(polygons):
+            self.draw_polygons_image()
+            return
+
+        # one fill symbol is started for the whole grid and only its color changes between cells, missing value cells
+        # share one started replacement symbol per color
+        symbol = only_color_fill_symbol()
+        symbol.startRender(self.context)
 
-            if self.replace_rectangle_without_values and polygon.exist_in_map is False:
+        symbols_without_values: Dict[int, QgsFillSymbol] = {}
+
+        for polygon in polygons:
+
+            polygon_draw = self.polygon_cell(polygon)
+
+            if self.is_replaced_polygon(polygon):
 
                 if self.use_rectangle_without_values_color_from_legend:
                     self.symbol_rectangle_without_values.setColor(polygon.symbol.color())
 
-                symbol_without_values = self.symbol_rectangle_without_values.clone()
+                key = self.symbol_rectangle_without_values.color().rgba()
+
+                symbol_without_values = symbols_without_values.get(key)
+
+                if symbol_without_values is None:
+                    symbol_without_values = self.symbol_rectangle_without_values.clone()
+                    symbol_without_values.startRender(self.context)
+
+                    symbols_without_values[key] = symbol_without_values
 
-                symbol_without_values.startRender(self.context)
                 symbol_without_values.renderPolygon(polygon_draw, None, None, self.context)
-                symbol_without_values.stopRender(self.context)
 
             else:
 
                 symbol.setColor(polygon.symbol.color())
-                symbol.startRender(self.context)
                 symbol.renderPolygon(polygon_draw, None, None, self.context)
-                symbol.stopRender(self.context)
+
+        symbol.stopRender(self.context)
+
+        for symbol_without_values in symbols_without_values.values():
+            symbol_without_values.stopRender(self.context)
+
+    def can_draw_polygons_image(self, polygons: List[LegendPolygon]) -> bool:
+        """Check if the cells can be painted as scaled `color_matrix_image`.
+
+        That is possible on raster outputs for unrotated legends of a complete grid without replaced cells.
+        """
+
+        if self.color_matrix_image is None or self.legend_rotated:
+            return False
+
+        paint_engine = self.painter.paintEngine()
+
+        if paint_engine is None or paint_engine.type() != QPaintEngine.Type.Raster:
+            return False
+
+        size = self.color_matrix_image.width()
+
+        if self.color_matrix_image.height() != size or size * size != len(polygons):
+            return False
+
+        return not any(self.is_replaced_polygon(polygon) for polygon in polygons)
+
+    def draw_polygons_image(self) -> None:
+
+        # pixel (x, y) of the image is the cell with position values (y, x), legend has first value on horizontal axis
+        # and second value on vertical axis from the bottom
+        image_transform = QTransform(
+            0, -self.size_constant, self.size_constant, 0, self.polygon_start_pos_x, self.polygon_start_pos_y
+        )
+
+        self.painter.save()
+
+        # every cell has to stay one solid color when scaled
+        self.painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+        self.painter.setTransform(image_transform * self.transform, True)
+        self.painter.drawImage(QPointF(0, 0), self.color_matrix_image)
+
+        self.painter.restore()
 
     def draw_axes_arrows(self) -> None:
 
@@ -482,64 +613,15 @@ class LegendRenderer:
 
     @property
     def axis_tick_text_height(self) -> float:
-
-        if self.add_axes_ticks_texts:
-
-            return QgsTextRenderer.textHeight(
-                self.context,
-                self.text_format_ticks,
-                textLines=self.format_tick_value(self.texts_axis_x_ticks[0], self.ticks_x_precision),
-            )
-
-        else:
-
-            return 0
-
-    @property
-    def axis_tick_last_y_value_width(self) -> float:
-
-        if self.add_axes_ticks_texts and not self.use_category_midpoints:
-
-            return QgsTextRenderer.textWidth(
-                self.context,
-                self.text_format_ticks,
-                textLines=self.format_tick_value(max(self.texts_axis_y_ticks), self.ticks_y_precision),
-            )
-
-        else:
-
-            return 0
-
-    @property
-    def axis_tick_last_x_value_width(self) -> float:
-
-        if self.add_axes_ticks_texts and not self.use_category_midpoints:
-
-            return QgsTextRenderer.textWidth(
-                self.context,
-                self.text_format_ticks,
-                textLines=self.format_tick_value(max(self.texts_axis_x_ticks), self.ticks_x_precision),
-            )
-
-        else:
-
-            return 0
+        return self.layout.axis_tick_text_height
 
     @property
     def axis_tick_last_value_max_width(self) -> float:
-
-        return max(self.axis_tick_last_x_value_width, self.axis_tick_last_y_value_width)
+        return self.layout.axis_tick_last_value_max_width
 
     @property
     def axis_tick_text_height_with_margin(self) -> float:
-
-        if self.add_axes_ticks_texts:
-
-            return self.axis_tick_text_height + self._space_above_ticks
-
-        else:
-
-            return 0
+        return self.layout.axis_tick_text_height_with_margin
 
     def position_axis_tick_x(self, index: int) -> QPointF:
 
@@ -593,7 +675,7 @@ class LegendRenderer:
 
         if self.add_axes_ticks_texts:
 
-            for i, value in enumerate(self.texts_axis_x_ticks):
+            for i, tick_text in enumerate(self.layout.ticks_x):
 
                 text_position = self.position_axis_tick_x(i)
 
@@ -601,21 +683,21 @@ class LegendRenderer:
                     self.transform.map(text_position),
                     self.text_rotation_x,
                     QgsTextRenderer.AlignCenter,
-                    self.format_tick_value(value, self.ticks_x_precision),
+                    tick_text,
                     self.context,
                     self.text_format_ticks,
                     QgsTextRenderer.AlignBottom,
                 )
 
-            for i, value in enumerate(self.texts_axis_y_ticks):
+            for i, tick_text in enumerate(self.layout.ticks_y):
 
-                text_position = self.position_axis_tick_y(len(self.texts_axis_y_ticks) - i - 1)
+                text_position = self.position_axis_tick_y(len(self.layout.ticks_y) - i - 1)
 
                 QgsTextRenderer.drawText(
                     self.transform.map(text_position),
                     self.text_rotation_y,
                     QgsTextRenderer.AlignCenter,
-                    self.format_tick_value(value, self.ticks_y_precision),
+                    tick_text,
                     self.context,
                     self.text_format_ticks,
                     QgsTextRenderer.AlignBottom,
@@ -624,40 +706,56 @@ class LegendRenderer:
     def set_space_above_ticks(self, space: int) -> None:
         self._space_above_ticks = int(space)
 
-    def draw_spacers(self, polygons):
+    def spacers_path(self, polygons: List[LegendPolygon]) -> QPainterPath:
+        """Grid lines between the legend cells as one path in painter coordinates."""
 
-        self.painter.save()
+        path = QPainterPath()
 
-        spacer_size = int(self.size_constant * (self.color_separator_width_percent / 100))
+        if not polygons:
+            return path
 
-        if spacer_size % 2 == 0:
-            spacer_size += 1
+        columns = int(max(polygon.x for polygon in polygons)) + 1
+        rows = int(max(polygon.y for polygon in polygons)) + 1
 
-        pen = QPen(self.color_separator_color, spacer_size, Qt.PenStyle.SolidLine)
+        left = self.polygon_start_pos_x
+        right = left + columns * self.size_constant
+        bottom = self.polygon_start_pos_y
+        top = bottom - rows * self.size_constant
 
-        self.painter.setPen(pen)
+        for i in range(rows + 1):
+            y = bottom - i * self.size_constant
+            path.moveTo(left, y)
+            path.lineTo(right, y)
 
-        for polygon in polygons:
+        for i in range(columns + 1):
+            x = left + i * self.size_constant
+            path.moveTo(x, bottom)
+            path.lineTo(x, top)
 
-            polygon = QPolygonF(
-                QRectF(
-                    self.polygon_start_pos_x + polygon.x * self.size_constant,
-                    self.polygon_start_pos_y - (polygon.y + 1) * self.size_constant,
-                    self.size_constant,
-                    self.size_constant,
-                )
-            )
+        return self.transform.map(path)
+
+    def draw_spacers(self, polygons: List[LegendPolygon]) -> None:
+
+        self.painter.save()
 
-            polygon = self.transform.map(polygon)
+        spacer_size = int(self.size_constant * (self.color_separator_width_percent / 100))
 
-            points = []
-            for i in range(polygon.count()):
-                p = polygon.at(i)
-                points.append(QgsPoint(p.x(), p.y()))
+        if spacer_size % 2 == 0:
+            spacer_size += 1
 
-            line = QgsLineString(points)
+        # square caps close the outer corners of the grid, where the lines end
+        pen = QPen(
+            self.color_separator_color,
+            spacer_size,
+            Qt.PenStyle.SolidLine,
+            Qt.PenCapStyle.SquareCap,
+            Qt.PenJoinStyle.MiterJoin,
+        )
 
-            line.draw(self.painter)
+        self.painter.setPen(pen)
+        self.painter.setBrush(Qt.BrushStyle.NoBrush)
+
+        self.painter.drawPath(self.spacers_path(polygons))
 
         self.painter.restore()
 
@@ -722,10 +820,6 @@ class LegendRenderer:
 
     def render(self, context: QgsRenderContext, width: float, height: float, polygons: List[LegendPolygon]) -> None:
 
-        # invalidate transform if size changed to avoid rendering problems when resizing legend
-        if self._render_previous_height != height or self._render_previous_width != width:
-            self._transform = None
-
         self.context = context
 
         self._polygons_count = len(polygons)
@@ -740,6 +834,8 @@ class LegendRenderer:
 
         self.set_text_height(self.axis_title_x.split("\n"), self.axis_title_y.split("\n"))
 
+        self._layout = self.calculate_layout(self._polygons_count)
+
         self.draw_polygons(polygons)
 
         if self.add_colors_separators:
@@ -759,6 +855,3 @@ class LegendRenderer:
         # self.draw_debug_lines()
 
         self.painter.restore()
-
-        self._render_previous_height = height
-        self._render_previous_width = width
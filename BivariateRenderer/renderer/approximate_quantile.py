@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from qgis.core import (
+    QgsClassificationMethod,
+    QgsClassificationQuantile,
+    QgsClassificationRange,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsReadWriteContext,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtGui import QIcon
+from qgis.PyQt.QtXml import QDomDocument, QDomElement
+
+from ..utils import layer_data_fingerprint
+from .bivariate_renderer_utils import fields_values_chunks, to_float_array
+from .classification_cache import ClassificationCache
+
+# layer id, data source, subset string and field name
+SketchKey = Tuple[str, str, str, str]
+
+
+class KllSketch:
+    """Mergeable quantile sketch (Karnin, Lang, Liberty) using memory bounded by its relative rank error.
+
+    Items are kept in compactors, item in compactor on level `h` represents `2^h` original values. Compaction uses
+    fixed seed so that the same input gives the same quantiles.
+    """
+
+    _c = 2 / 3
+
+    def __init__(self, k: int = 200, seed: int = 0) -> None:
+        self._k = max(8, int(k))
+        self._random = random.Random(seed)
+
+        self._compactors: List[List[float]] = []
+        self._size = 0
+        self._max_size = 0
+
+        self._count = 0
+        self._min = math.inf
+        self._max = -math.inf
+
+        self._grow()
+
+    @staticmethod
+    def k_for_relative_error(relative_error: float) -> int:
+        """Size parameter `k` for which normalized rank error of a single quantile is about `relative_error`."""
+        return max(8, int(math.ceil((2.296 / relative_error) ** (1 / 0.9723))))
+
+    @property
+    def k(self) -> int:
+        return self._k
+
+    @property
+    def count(self) -> int:
+        """Number of values inserted into the sketch."""
+        return self._count
+
+    @property
+    def min(self) -> float:
+        return self._min
+
+    @property
+    def max(self) -> float:
+        return self._max
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self._compactors) - height - 1
+        return int(math.ceil(self._c**depth * self._k)) + 1
+
+    def _grow(self) -> None:
+        self._compactors.append([])
+        self._max_size = sum(self._capacity(height) for height in range(len(self._compactors)))
+
+    def _compact(self, height: int) -> None:
+        items = self._compactors[height]
+        items.sort()
+
+        # odd item stays on its level
+        leftover = items[: len(items) % 2]
+        paired = items[len(leftover) :]
+
+        if height + 1 >= len(self._compactors):
+            self._grow()
+
+        self._compactors[height + 1].extend(paired[self._random.randint(0, 1) :: 2])
+        self._compactors[height] = leftover
+
+    def _compress(self) -> None:
+        while self._size >= self._max_size:
+            for height in range(len(self._compactors)):
+                if len(self._compactors[height]) >= self._capacity(height):
+                    self._compact(height)
+                    self._size = sum(len(items) for items in self._compactors)
+
+                    if self._size < self._max_size:
+                        break
+
+    def update(self, value: float) -> None:
+        """Insert single value, None and NaN are ignored."""
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+
+        if math.isnan(value):
+            return
+
+        self._compactors[0].append(value)
+        self._size += 1
+        self._count += 1
+
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Insert values, None and NaN are ignored."""
+        values = to_float_array(values)
+        values = values[~np.isnan(values)]
+
+        if values.size == 0:
+            return
+
+        self._count += int(values.size)
+        self._min = min(self._min, float(values.min()))
+        self._max = max(self._max, float(values.max()))
+
+        for start in range(0, values.size, self._k):
+            part = values[start : start + self._k].tolist()
+
+            self._compactors[0].extend(part)
+            self._size += len(part)
+
+            if self._size >= self._max_size:
+                self._compress()
+
+    def merge(self, other: KllSketch) -> None:
+        """Add values summarized by other sketch into this one."""
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+
+        for height, items in enumerate(other._compactors):
+            self._compactors[height].extend(items)
+
+        self._size = sum(len(items) for items in self._compactors)
+        self._count += other._count
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+        self._compress()
+
+    def quantiles(self, fractions: List[float]) -> List[float]:
+        """Approximate values for fractions from interval [0, 1]."""
+        if self._count == 0:
+            return [math.nan for _ in fractions]
+
+        weighted_items: List[Tuple[float, int]] = []
+
+        for height, items in enumerate(self._compactors):
+            weight = 2**height
+            weighted_items.extend((item, weight) for item in items)
+
+        weighted_items.sort()
+
+        cumulative_weights = np.cumsum([weight for _, weight in weighted_items])
+        total_weight = cumulative_weights[-1]
+
+        values = []
+
+        for fraction in fractions:
+            if fraction <= 0:
+                values.append(self._min)
+            elif fraction >= 1:
+                values.append(self._max)
+            else:
+                index = int(np.searchsorted(cumulative_weights, fraction * total_weight, side="left"))
+                values.append(weighted_items[min(index, len(weighted_items) - 1)][0])
+
+        return values
+
+    def save(self, doc: QDomDocument) -> QDomElement:
+        element = doc.createElement("KllSketch")
+
+        element.setAttribute("k", str(self._k))
+        element.setAttribute("count", str(self._count))
+        element.setAttribute("min", repr(self._min))
+        element.setAttribute("max", repr(self._max))
+
+        for items in self._compactors:
+            level_element = doc.createElement("level")
+            level_element.appendChild(doc.createTextNode(" ".join(repr(item) for item in items)))
+            element.appendChild(level_element)
+
+        return element
+
+    @staticmethod
+    def load(element: QDomElement) -> KllSketch:
+        sketch = KllSketch(int(element.attribute("k")))
+
+        sketch._count = int(element.attribute("count"))
+        sketch._min = float(element.attribute("min"))
+        sketch._max = float(element.attribute("max"))
+
+        sketch._compactors = []
+
+        level_element = element.firstChildElement("level")
+
+        while not level_element.isNull():
+            text = level_element.text().strip()
+            sketch._compactors.append([float(x) for x in text.split()] if text else [])
+            level_element = level_element.nextSiblingElement("level")
+
+        if not sketch._compactors:
+            sketch._compactors.append([])
+
+        sketch._size = sum(len(items) for items in sketch._compactors)
+        sketch._max_size = sum(sketch._capacity(height) for height in range(len(sketch._compactors)))
+
+        return sketch
+
+
+class ClassificationApproximateQuantile(QgsClassificationMethod):
+    """Quantile classification computed from streaming sketch over features, so memory does not grow with layer size.
+
+    Sketches of classified fields are kept with the method and saved with it, so that classes for other number of
+    classes can be calculated without reading the layer again while its data are unchanged. Sketches are keyed by
+    layer, its data source and subset and field. Sketches built in this session are valid for the data revision of
+    the layer they were built for (see `ClassificationCache.revision`), sketches loaded from XML only if the data
+    fingerprint of the layer (see `layer_data_fingerprint`) did not change since they were saved.
+    """
+
+    method_id = "ApproximateQuantile"
+
+    def __init__(self, relative_error: float = 0.01) -> None:
+        super().__init__()
+
+        self._relative_error = relative_error
+        # data fingerprint and revision of the layer the sketch was built for, revision is `None` for loaded sketches
+        self._sketches: Dict[SketchKey, Tuple[Optional[str], Optional[int], KllSketch]] = {}
+
+    @property
+    def relative_error(self) -> float:
+        """Error bound of class breaks as a fraction of rank."""
+        return self._relative_error
+
+    def set_relative_error(self, relative_error: float) -> None:
+        if relative_error != self._relative_error:
+            self._sketches.clear()
+
+        self._relative_error = relative_error
+
+    def id(self) -> str:
+        return self.method_id
+
+    def name(self) -> str:
+        return "Approximate Quantile (streaming)"
+
+    def icon(self) -> QIcon:
+        return QgsClassificationQuantile().icon()
+
+    def clone(self) -> ClassificationApproximateQuantile:
+        method = ClassificationApproximateQuantile(self._relative_error)
+        self.copyBase(method)
+
+        # sketches are never changed once stored, so they can be shared
+        method._sketches = dict(self._sketches)
+
+        return method
+
+    def create_sketch(self) -> KllSketch:
+        return KllSketch(KllSketch.k_for_relative_error(self._relative_error))
+
+    @staticmethod
+    def sketch_key(layer: QgsVectorLayer, field_name: str) -> SketchKey:
+        return (layer.id(), layer.source(), layer.subsetString(), field_name)
+
+    def sketch(self, layer: QgsVectorLayer, field_name: str) -> Optional[KllSketch]:
+        """Sketch of the field stored for current data of the layer, `None` if there is no such sketch.
+
+        Stored sketch that does not match current data of the layer is dropped.
+        """
+        key = self.sketch_key(layer, field_name)
+
+        if key not in self._sketches:
+            return None
+
+        fingerprint, revision, sketch = self._sketches[key]
+
+        current_fingerprint = layer_data_fingerprint(layer)
+        current_revision = ClassificationCache().revision(layer)
+
+        if revision is None:
+            # loaded sketch, data could have changed between sessions
+            valid = fingerprint is not None and fingerprint == current_fingerprint
+        else:
+            valid = revision == current_revision and fingerprint == current_fingerprint
+
+        if not valid:
+            del self._sketches[key]
+            return None
+
+        self._sketches[key] = (fingerprint, current_revision, sketch)
+
+        return sketch
+
+    def set_sketch(self, layer: QgsVectorLayer, field_name: str, revision: int, sketch: KllSketch) -> None:
+        """Store sketch of the field built for the data revision of the layer."""
+        self._sketches[self.sketch_key(layer, field_name)] = (layer_data_fingerprint(layer), revision, sketch)
+
+    def sketch_for_source(
+        self, source: QgsFeatureSource, field_index: int, feedback: Optional[QgsFeedback] = None
+    ) -> KllSketch:
+        """Sketch of the field values, features are read in chunks without geometries."""
+        sketch = self.create_sketch()
+
+        for values, _ in fields_values_chunks(source, field_index, -1, feedback=feedback):
+            sketch.update_many(values)
+
+        return sketch
+
+    def classes_from_sketch(self, sketch: KllSketch, number_of_classes: int) -> List[QgsClassificationRange]:
+        if sketch.count == 0:
+            return []
+
+        number_of_classes = int(number_of_classes)
+
+        breaks = sketch.quantiles([i / number_of_classes for i in range(number_of_classes + 1)])
+
+        classes = []
+
+        for lower, upper in zip(breaks[:-1], breaks[1:]):
+            classes.append(QgsClassificationRange(self.labelForRange(lower, upper), lower, upper))
+
+        return classes
+
+    def classes(self, values: List[float], number_of_classes: int) -> List[QgsClassificationRange]:
+        sketch = self.create_sketch()
+        sketch.update_many(values)
+
+        return self.classes_from_sketch(sketch, number_of_classes)
+
+    def classesV2(
+        self, layer: QgsVectorLayer, field_name: str, number_of_classes: int
+    ) -> Tuple[List[QgsClassificationRange], str]:
+        field_index = layer.fields().lookupField(field_name)
+
+        if field_index < 0:
+            return ([], f"Field `{field_name}` does not exist.")
+
+        return (self.classes_from_sketch(self.sketch_for_source(layer, field_index), number_of_classes), "")
+
+    def writeXml(self, element: QDomElement, context: QgsReadWriteContext) -> None:
+        element.setAttribute("relative_error", str(self._relative_error))
+
+        doc = element.ownerDocument()
+
+        for (layer_id, source, subset, field_name), (fingerprint, _, sketch) in self._sketches.items():
+            if fingerprint is None:
+                # sketch could not be verified against layer data once loaded
+                continue
+
+            sketch_element = sketch.save(doc)
+            sketch_element.setAttribute("layer", layer_id)
+            sketch_element.setAttribute("source", source)
+            sketch_element.setAttribute("subset", subset)
+            sketch_element.setAttribute("field", field_name)
+            sketch_element.setAttribute("fingerprint", fingerprint)
+            element.appendChild(sketch_element)
+
+    def readXml(self, element: QDomElement, context: QgsReadWriteContext) -> None:
+        try:
+            self._relative_error = float(element.attribute("relative_error"))
+        except ValueError:
+            self._relative_error = 0.01
+
+        self._sketches.clear()
+
+        sketch_element = element.firstChildElement("KllSketch")
+
+        while not sketch_element.isNull():
+            if sketch_element.hasAttribute("fingerprint"):
+                key = (
+                    sketch_element.attribute("layer"),
+                    sketch_element.attribute("source"),
+                    sketch_element.attribute("subset"),
+                    sketch_element.attribute("field"),
+                )
+                self._sketches[key] = (sketch_element.attribute("fingerprint"), None, KllSketch.load(sketch_element))
+
+            sketch_element = sketch_element.nextSiblingElement("KllSketch")
+
+    @staticmethod
+    def load(element: QDomElement, context: QgsReadWriteContext) -> ClassificationApproximateQuantile:
+        method = ClassificationApproximateQuantile()
+        method.readXml(element, context)
+
+        return method
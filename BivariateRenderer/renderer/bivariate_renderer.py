@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from qgis.core import (
     QgsClassificationEqualInterval,
     QgsClassificationMethod,
     QgsClassificationRange,
     QgsFeature,
     QgsFeatureRenderer,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsFields,
     QgsFillSymbol,
     QgsImageLegendNode,
     QgsLayerTreeLayer,
@@ -29,11 +34,21 @@ from BivariateRenderer.colorramps.bivariate_color_ramp import (
 from ..legendrenderer.legend_renderer import LegendRenderer
 from ..text_constants import Texts
 from ..utils import default_fill_symbol
-from .bivariate_renderer_utils import LegendPolygon
+from .approximate_quantile import ClassificationApproximateQuantile
+from .bivariate_renderer_utils import ClassBreaks, LegendPolygon, fields_values_chunks
+from .classification_cache import ClassificationCache
+from .layer_classification import LayerClassification, classify_source, known_classes
 
 
 class BivariateRenderer(QgsFeatureRenderer):
 
+    # legend images keyed by legend fingerprint, shared by all renderers so that clones reuse them
+    _legend_images: "OrderedDict[Tuple, QImage]" = OrderedDict()
+    legend_images_max_size = 64
+
+    # smaller chunks allow scans for populated cells to stop sooner once all cells are found
+    existing_cells_chunk_size = 4096
+
     def __init__(self) -> None:
         super().__init__(Texts.bivariate_renderer_short_name)
 
@@ -44,11 +59,28 @@ class BivariateRenderer(QgsFeatureRenderer):
         self.field_name_1: str = ""
         self.field_name_2: str = ""
 
-        self.cached_symbols: Dict[str, QgsFillSymbol] = {}
-        self.labels_existing: List[str] = []
+        self._field_1_classes: List[QgsClassificationRange] = []
+        self._field_2_classes: List[QgsClassificationRange] = []
+
+        self._field_1_breaks = ClassBreaks([])
+        self._field_2_breaks = ClassBreaks([])
+
+        # symbols and existing cells are indexed by `value1 * self._grid_size + value2`
+        self._grid_size: int = 0
+        self._cell_symbols: List[Optional[QgsFillSymbol]] = []
+        self._existing_cells: int = 0
+
+        self._started_symbols: List[QgsFillSymbol] = []
 
-        self.field_1_classes: List[QgsClassificationRange] = []
-        self.field_2_classes: List[QgsClassificationRange] = []
+        # colors of legend cells and the color matrix they were taken from, kept until classes or symbols change
+        self._legend_colors: Optional[Tuple] = None
+        self._legend_colors_matrix: Optional[np.ndarray] = None
+
+        # attribute indices resolved for the current render, -1 means lookup by field name
+        self._field_index_1: int = -1
+        self._field_index_2: int = -1
+
+        self._reset_cache()
 
         self.polygon_symbol = default_fill_symbol()
 
@@ -70,13 +102,106 @@ class BivariateRenderer(QgsFeatureRenderer):
         )
 
     def _reset_cache(self):
-        self.cached_symbols = {}
-        self.labels_existing = []
+        self._grid_size = max(
+            len(self._field_1_classes), len(self._field_2_classes), self.bivariate_color_ramp.number_of_classes
+        )
+        self._cell_symbols = [None] * (self._grid_size * self._grid_size)
+        self._existing_cells = 0
+        self._legend_colors = None
+
+    def _cell_index(self, value1: int, value2: int) -> int:
+        return value1 * self._grid_size + value2
+
+    def _cell_values(self, cell_index: int) -> Tuple[int, int]:
+        return divmod(cell_index, self._grid_size)
+
+    def _cell_index_from_label(self, label: str) -> int:
+        """Cell index for label created by `getPositionValuesCombinationHash`, `-1` if the label is not valid."""
+        try:
+            value1, value2 = (int(x) - 1 for x in label.split("-"))
+        except ValueError:
+            return -1
+
+        if not (0 <= value1 < self._grid_size and 0 <= value2 < self._grid_size):
+            return -1
+
+        return self._cell_index(value1, value2)
+
+    @property
+    def cached_symbols(self) -> Dict[str, QgsFillSymbol]:
+        """Symbols created so far, keyed by labels of their cells."""
+        symbols = {}
+
+        for cell_index, symbol in enumerate(self._cell_symbols):
+            if symbol is not None:
+                symbols[self.getPositionValuesCombinationHash(*self._cell_values(cell_index))] = symbol
+
+        return symbols
+
+    @property
+    def labels_existing(self) -> List[str]:
+        """Labels of cells that contain at least one feature."""
+        labels = []
+
+        for cell_index in range(self._grid_size * self._grid_size):
+            if self._existing_cells >> cell_index & 1:
+                labels.append(self.getPositionValuesCombinationHash(*self._cell_values(cell_index)))
+
+        return labels
+
+    @labels_existing.setter
+    def labels_existing(self, labels: List[str]) -> None:
+        self._existing_cells = 0
+
+        for label in labels:
+            cell_index = self._cell_index_from_label(label)
+
+            if cell_index >= 0:
+                self._existing_cells |= 1 << cell_index
+
+    @property
+    def existing_cells(self) -> int:
+        """Populated cells as bits, bit `value1 * grid size + value2` is set if the cell contains a feature."""
+        return self._existing_cells
+
+    @existing_cells.setter
+    def existing_cells(self, existing_cells: int) -> None:
+        self._existing_cells = existing_cells
+
+    @property
+    def all_cells(self) -> int:
+        """Bits of all cells of the current classes."""
+        all_cells = 0
+
+        for x in range(len(self.field_1_classes)):
+            for y in range(len(self.field_2_classes)):
+                all_cells |= 1 << self._cell_index(x, y)
+
+        return all_cells
+
+    def cell_exists(self, value1: int, value2: int) -> bool:
+        return bool(self._existing_cells >> self._cell_index(value1, value2) & 1)
+
+    def feature_cell(self, feature: QgsFeature) -> int:
+        """Bit of the cell the feature belongs to, `0` if the feature is outside of classes."""
+        position_value1, position_value2 = self.position_values(feature)
+
+        if position_value1 < 0 or position_value2 < 0:
+            return 0
+
+        return 1 << self._cell_index(position_value1, position_value2)
 
     def set_bivariate_color_ramp(self, color_ramp: Optional[BivariateColorRamp]) -> None:
         if color_ramp:
             self.bivariate_color_ramp = color_ramp
-            self._reset_cache()
+            self.reset_symbols()
+
+    def reset_symbols(self) -> None:
+        """Drop symbols of cells so that they are created with current colors and base symbol, populated cells are
+        kept."""
+        labels_existing = self.labels_existing
+        self._reset_cache()
+        self.labels_existing = labels_existing
 
     def setClassificationMethod(self, method: QgsClassificationMethod) -> None:
         self.classification_method = method
@@ -84,10 +209,41 @@ class BivariateRenderer(QgsFeatureRenderer):
 
     def setFieldName1(self, field_name: str) -> None:
         self.field_name_1 = field_name
+        self._field_index_1 = -1
         self._reset_cache()
 
     def setFieldName2(self, field_name: str) -> None:
         self.field_name_2 = field_name
+        self._field_index_2 = -1
+        self._reset_cache()
+
+    def _resolve_field_indices(self, fields: QgsFields) -> None:
+        """Resolve indices of renderer fields once per render, features rendered until stopRender have `fields`."""
+        self._field_index_1 = fields.lookupField(self.field_name_1)
+        self._field_index_2 = fields.lookupField(self.field_name_2)
+
+    def _clear_field_indices(self) -> None:
+        self._field_index_1 = -1
+        self._field_index_2 = -1
+
+    @property
+    def field_1_classes(self) -> List[QgsClassificationRange]:
+        return self._field_1_classes
+
+    @field_1_classes.setter
+    def field_1_classes(self, classes: List[QgsClassificationRange]) -> None:
+        self._field_1_classes = classes
+        self._field_1_breaks = ClassBreaks(classes)
+        self._reset_cache()
+
+    @property
+    def field_2_classes(self) -> List[QgsClassificationRange]:
+        return self._field_2_classes
+
+    @field_2_classes.setter
+    def field_2_classes(self, classes: List[QgsClassificationRange]) -> None:
+        self._field_2_classes = classes
+        self._field_2_breaks = ClassBreaks(classes)
         self._reset_cache()
 
     @staticmethod
@@ -103,33 +259,111 @@ class BivariateRenderer(QgsFeatureRenderer):
         return values
 
     def setField1ClassificationData(self, layer: QgsVectorLayer, attribute: str) -> None:
-        self.field_1_classes, _ = self.classification_method.classesV2(
-            layer, attribute, self.bivariate_color_ramp.number_of_classes
+        self.field_1_classes = ClassificationCache().classes(
+            self.classification_method, layer, attribute, self.bivariate_color_ramp.number_of_classes
         )
 
-        self._reset_cache()
-
     def setField2ClassificationData(self, layer: QgsVectorLayer, attribute: str) -> None:
-        self.field_2_classes, _ = self.classification_method.classesV2(
-            layer, attribute, self.bivariate_color_ramp.number_of_classes
+        self.field_2_classes = ClassificationCache().classes(
+            self.classification_method, layer, attribute, self.bivariate_color_ramp.number_of_classes
         )
 
-        self._reset_cache()
+    @staticmethod
+    def from_layer(
+        layer: QgsVectorLayer,
+        field_name_1: str,
+        field_name_2: str,
+        color_ramp: Optional[BivariateColorRamp] = None,
+        classification_method: Optional[QgsClassificationMethod] = None,
+    ) -> BivariateRenderer:
+        """Renderer for the fields of the layer, with classes and populated cells from a single pass over it."""
+        r = BivariateRenderer()
 
-    def _positionValue(self, value: float, classes: List[QgsClassificationRange]) -> int:
-        class_value = -1
-        for i, range_class in enumerate(classes):
-            if range_class.lowerBound() <= value <= range_class.upperBound():
-                class_value = i
-                break
+        r.setFieldName1(field_name_1)
+        r.setFieldName2(field_name_2)
 
-        return class_value
+        if classification_method:
+            r.setClassificationMethod(classification_method)
+
+        r.set_bivariate_color_ramp(color_ramp)
+
+        r.classify_layer(layer)
+
+        return r
+
+    def classify_layer(self, layer: QgsVectorLayer) -> None:
+        """Calculate classes of both fields and populated cells reading only the two fields.
+
+        Classes found in classification cache are reused, then the layer is only searched for populated cells.
+        """
+        fields = layer.fields()
+        number_of_classes = self.bivariate_color_ramp.number_of_classes
+
+        classification = classify_source(
+            layer,
+            fields.lookupField(self.field_name_1),
+            fields.lookupField(self.field_name_2),
+            self.classification_method,
+            number_of_classes,
+            classes=known_classes(
+                layer, self.field_name_1, self.field_name_2, self.classification_method, number_of_classes
+            ),
+        )
+
+        self.apply_classification(layer, classification)
+
+    def apply_classification(self, layer: QgsVectorLayer, classification: LayerClassification) -> None:
+        """Use classes and populated cells calculated for the layer.
+
+        Classes are also stored in classification cache and sketches with approximate classification method.
+        """
+        self.field_1_classes = classification.field_1_classes
+        self.field_2_classes = classification.field_2_classes
+
+        number_of_classes = self.bivariate_color_ramp.number_of_classes
+
+        cache = ClassificationCache()
+        cache.store(self.classification_method, layer, self.field_name_1, number_of_classes, self.field_1_classes)
+        cache.store(self.classification_method, layer, self.field_name_2, number_of_classes, self.field_2_classes)
+
+        if classification.sketches is not None and isinstance(
+            self.classification_method, ClassificationApproximateQuantile
+        ):
+            revision = cache.revision(layer)
+            self.classification_method.set_sketch(layer, self.field_name_1, revision, classification.sketches[0])
+            self.classification_method.set_sketch(layer, self.field_name_2, revision, classification.sketches[1])
+
+        existing_cells = 0
+
+        for position1, position2 in classification.populated_cells:
+            existing_cells |= 1 << self._cell_index(position1, position2)
+
+        self._existing_cells = existing_cells
 
     def positionValueField1(self, value: float) -> int:
-        return self._positionValue(value, self.field_1_classes)
+        return self._field_1_breaks.position(value)
 
     def positionValueField2(self, value: float) -> int:
-        return self._positionValue(value, self.field_2_classes)
+        return self._field_2_breaks.position(value)
+
+    def classify_arrays(
+        self, values1: Union[np.ndarray, Sequence[Any]], values2: Union[np.ndarray, Sequence[Any]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Class indices for columns of values of field 1 and field 2, missing values and values outside of classes
+        get `-1`."""
+        return (self._field_1_breaks.positions(values1), self._field_2_breaks.positions(values2))
+
+    def _existing_cells_from_positions(self, positions1: np.ndarray, positions2: np.ndarray) -> int:
+        valid = (positions1 >= 0) & (positions2 >= 0)
+
+        cell_indices = np.unique(positions1[valid] * self._grid_size + positions2[valid])
+
+        existing_cells = 0
+
+        for cell_index in cell_indices.tolist():
+            existing_cells |= 1 << cell_index
+
+        return existing_cells
 
     def getPositionValuesCombinationHash(self, value1: int, value2: int) -> str:
         return f"{value1 + 1}-{value2 + 1}"
@@ -138,8 +372,30 @@ class BivariateRenderer(QgsFeatureRenderer):
         return self.bivariate_color_ramp.get_color(position_value1, position_value2)
 
     def position_values(self, feature: QgsFeature) -> Tuple[int, int]:
-        value1 = feature.attribute(self.field_name_1)
-        value2 = feature.attribute(self.field_name_2)
+        if self._field_index_1 < 0 or self._field_index_2 < 0:
+            return self._position_values_by_name(feature)
+
+        attributes = feature.attributes()
+
+        try:
+            value1 = attributes[self._field_index_1]
+            value2 = attributes[self._field_index_2]
+        except IndexError:
+            # feature does not have the fields resolved in startRender
+            return self._position_values_by_name(feature)
+
+        position_value1 = self.positionValueField1(value1)
+        position_value2 = self.positionValueField2(value2)
+
+        return (position_value1, position_value2)
+
+    def _position_values_by_name(self, feature: QgsFeature) -> Tuple[int, int]:
+        """Positions of the feature outside of render, when field indices are not resolved."""
+        try:
+            value1 = feature.attribute(self.field_name_1)
+            value2 = feature.attribute(self.field_name_2)
+        except KeyError:
+            return (-1, -1)
 
         position_value1 = self.positionValueField1(value1)
         position_value2 = self.positionValueField2(value2)
@@ -149,31 +405,45 @@ class BivariateRenderer(QgsFeatureRenderer):
     def symbolForFeature(self, feature: QgsFeature, context):
         position_value1, position_value2 = self.position_values(feature)
 
-        identifier = self.getPositionValuesCombinationHash(position_value1, position_value2)
+        if position_value1 < 0 or position_value2 < 0:
+            return None
 
-        if identifier not in self.cached_symbols:
-            feature_symbol = self.polygon_symbol.clone()
-            feature_symbol.setColor(self.getFeatureColor(position_value1, position_value2))
+        cell_index = self._cell_index(position_value1, position_value2)
+
+        symbol = self._cell_symbols[cell_index]
+
+        if symbol is None:
+            symbol = self.symbol_for_values(position_value1, position_value2)
+
+        self._existing_cells |= 1 << cell_index
 
-            self.cached_symbols[identifier] = feature_symbol.clone()
+        return symbol
 
-        if identifier not in self.labels_existing:
-            self.labels_existing.append(identifier)
+    def startRender(self, context, fields):
+        super().startRender(context, fields)
 
-        self.cached_symbols[identifier].startRender(context)
+        self._resolve_field_indices(fields)
 
-        return self.cached_symbols[identifier]
+        self._started_symbols = []
+
+        for x in range(len(self.field_1_classes)):
+            for y in range(len(self.field_2_classes)):
+                symbol = self.symbol_for_values(x, y)
+                symbol.startRender(context, fields)
+                self._started_symbols.append(symbol)
 
     def stopRender(self, context):
-        for s in list(self.cached_symbols.values()):
+        for s in self._started_symbols:
             s.stopRender(context)
+        self._started_symbols = []
+        self._clear_field_indices()
         super().stopRender(context)
 
     def usedAttributes(self, context):
         return [self.field_name_1, self.field_name_2]
 
     def symbols(self, context):
-        return list(self.cached_symbols.values())
+        return [symbol for symbol in self._cell_symbols if symbol is not None]
 
     def clone(self) -> QgsFeatureRenderer:
         r = BivariateRenderer()
@@ -181,18 +451,17 @@ class BivariateRenderer(QgsFeatureRenderer):
         r.setFieldName2(self.field_name_2)
         r.classification_method = self.classification_method.clone()
 
-        for field_1_class in self.field_1_classes:
-            r.field_1_classes.append(
-                QgsClassificationRange(field_1_class.label(), field_1_class.lowerBound(), field_1_class.upperBound())
-            )
-        for field_2_class in self.field_2_classes:
-            r.field_2_classes.append(
-                QgsClassificationRange(field_2_class.label(), field_2_class.lowerBound(), field_2_class.upperBound())
-            )
-
-        r.cached_symbols = {}
-        r.labels_existing = self.labels_existing.copy()
-        r.bivariate_color_ramp = self.bivariate_color_ramp.clone()
+        r.field_1_classes = [
+            QgsClassificationRange(field_1_class.label(), field_1_class.lowerBound(), field_1_class.upperBound())
+            for field_1_class in self.field_1_classes
+        ]
+        r.field_2_classes = [
+            QgsClassificationRange(field_2_class.label(), field_2_class.lowerBound(), field_2_class.upperBound())
+            for field_2_class in self.field_2_classes
+        ]
+
+        r.set_bivariate_color_ramp(self.bivariate_color_ramp.clone())
+        r.labels_existing = self.labels_existing
         r.polygon_symbol = self.polygon_symbol.clone()
 
         return r
@@ -249,10 +518,10 @@ class BivariateRenderer(QgsFeatureRenderer):
 
         symbols_elem = doc.createElement("symbols")
 
-        for symbol in self.cached_symbols.keys():
+        for label, symbol in self.cached_symbols.items():
             symbol_elem = doc.createElement("symbol")
-            symbol_elem.setAttribute("color", self.cached_symbols[symbol].color().name())
-            symbol_elem.setAttribute("label", symbol)
+            symbol_elem.setAttribute("color", symbol.color().name())
+            symbol_elem.setAttribute("label", label)
             symbols_elem.appendChild(symbol_elem)
 
         renderer_elem.appendChild(symbols_elem)
@@ -276,7 +545,10 @@ class BivariateRenderer(QgsFeatureRenderer):
         r.setFieldName2(element.firstChildElement("field_name_2").attribute("name"))
 
         method_elem = element.firstChildElement("classificationMethod")
-        r.setClassificationMethod(QgsClassificationMethod.create(method_elem, context))
+        if method_elem.attribute("id") == ClassificationApproximateQuantile.method_id:
+            r.setClassificationMethod(ClassificationApproximateQuantile.load(method_elem, context))
+        else:
+            r.setClassificationMethod(QgsClassificationMethod.create(method_elem, context))
 
         polygon_symbol_elem = element.firstChildElement("polygonSymbol")
         polygon_symbol = polygon_symbol_elem.firstChildElement("symbol")
@@ -321,6 +593,17 @@ class BivariateRenderer(QgsFeatureRenderer):
         r.field_1_classes = field_1_classes
         r.field_2_classes = field_2_classes
 
+        bivariate_ramp_elem = element.firstChildElement("BivariateColorRamp")
+        bivariate_ramp = None
+        if not bivariate_ramp_elem.isNull():
+            bivariate_ramp_type = bivariate_ramp_elem.attribute("type")
+            if bivariate_ramp_type == "Gradient":
+                bivariate_ramp = BivariateColorRampGradient.load(bivariate_ramp_elem)
+            elif bivariate_ramp_type == "Manual":
+                bivariate_ramp = BivariateColorRampManual.load(bivariate_ramp_elem)
+
+        r.set_bivariate_color_ramp(bivariate_ramp)
+
         symbols_elem = element.firstChildElement("symbols")
 
         symbol_elem = symbols_elem.firstChildElement()
@@ -330,31 +613,24 @@ class BivariateRenderer(QgsFeatureRenderer):
                 color = QColor(symbol_elem.attribute("color"))
                 label = symbol_elem.attribute("label")
 
-                symbol = r.polygon_symbol.clone()
-                symbol.setColor(color)
+                cell_index = r._cell_index_from_label(label)
 
-                r.cached_symbols[label] = symbol
+                if cell_index >= 0:
+                    symbol = r.polygon_symbol.clone()
+                    symbol.setColor(color)
+
+                    r.set_symbol_for_values(*r._cell_values(cell_index), symbol)
 
             symbol_elem = symbol_elem.nextSiblingElement()
 
         labels_existing_elem = element.firstChildElement("labels_existing")
         if not labels_existing_elem.isNull():
+            labels_existing = []
             label_elem = labels_existing_elem.firstChildElement("label")
             while not label_elem.isNull():
-                r.labels_existing.append(label_elem.attribute("id"))
+                labels_existing.append(label_elem.attribute("id"))
                 label_elem = label_elem.nextSiblingElement()
-
-        bivariate_ramp_elem = element.firstChildElement("BivariateColorRamp")
-        bivariate_ramp = None
-        if not bivariate_ramp_elem.isNull():
-            bivariate_ramp_type = bivariate_ramp_elem.attribute("type")
-            if bivariate_ramp_type == "Gradient":
-                bivariate_ramp = BivariateColorRampGradient.load(bivariate_ramp_elem)
-            elif bivariate_ramp_type == "Manual":
-                bivariate_ramp = BivariateColorRampManual.load(bivariate_ramp_elem)
-
-        if bivariate_ramp:
-            r.bivariate_color_ramp = bivariate_ramp
+            r.labels_existing = labels_existing
 
         return r
 
@@ -362,50 +638,113 @@ class BivariateRenderer(QgsFeatureRenderer):
         return self.create_render_from_element(symbology_elem, context)
 
     def symbol_for_values(self, value1: int, value2: int) -> QgsFillSymbol:
-        identifier = self.getPositionValuesCombinationHash(value1, value2)
+        if value1 >= self._grid_size or value2 >= self._grid_size:
+            # number of classes of the color ramp was changed in place
+            self.reset_symbols()
 
-        if identifier not in self.cached_symbols:
+        cell_index = self._cell_index(value1, value2)
+
+        if self._cell_symbols[cell_index] is None:
             feature_symbol = self.polygon_symbol.clone()
             feature_symbol.setColor(self.getFeatureColor(value1, value2))
 
-            self.cached_symbols[identifier] = feature_symbol.clone()
+            self._cell_symbols[cell_index] = feature_symbol
+
+        return self._cell_symbols[cell_index]
+
+    def set_symbol_for_values(self, value1: int, value2: int, symbol: QgsFillSymbol) -> None:
+        """Replace symbol of the cell, e.g. by symbol loaded from project."""
+        self._cell_symbols[self._cell_index(value1, value2)] = symbol
+        self._legend_colors = None
 
-        return self.cached_symbols[identifier]
+    def classification_fingerprint(self) -> Tuple:
+        """Fields and classes, renderers with equal fingerprints place features into the same cells."""
+        return (
+            self.field_name_1,
+            self.field_name_2,
+            tuple((x.label(), x.lowerBound(), x.upperBound()) for x in self.field_1_classes),
+            tuple((x.label(), x.lowerBound(), x.upperBound()) for x in self.field_2_classes),
+            self._grid_size,
+        )
+
+    def legend_fingerprint(self) -> Tuple:
+        """Everything the legend depends on, renderers with equal fingerprints have the same legend.
+
+        Colors of cells are collected only after classes, color ramp or symbols change, symbols are not created.
+        """
+        color_matrix = self.bivariate_color_ramp.color_matrix
+
+        if self._legend_colors is None or self._legend_colors_matrix is not color_matrix:
+            self._legend_colors = tuple(
+                self._legend_cell_color(x, y)
+                for x in range(len(self.field_1_classes))
+                for y in range(len(self.field_2_classes))
+            )
+            self._legend_colors_matrix = color_matrix
+
+        return (*self.classification_fingerprint(), self._legend_colors, self._existing_cells)
+
+    def _legend_cell_color(self, value1: int, value2: int) -> int:
+        if value1 < self._grid_size and value2 < self._grid_size:
+            symbol = self._cell_symbols[self._cell_index(value1, value2)]
+
+            if symbol is not None:
+                return symbol.color().rgba()
+
+        return self.getFeatureColor(value1, value2).rgba()
 
     def generate_legend_polygons(self) -> List[LegendPolygon]:
         polygons = []
 
         for x in range(len(self.field_1_classes)):
             for y in range(len(self.field_2_classes)):
-                exist = True
-
-                if self.getPositionValuesCombinationHash(x, y) not in self.labels_existing:
-                    exist = False
+                symbol = self.symbol_for_values(x, y)
 
-                polygons.append(LegendPolygon(x=x, y=y, symbol=self.symbol_for_values(x, y), exist_in_map=exist))
+                polygons.append(LegendPolygon(x=x, y=y, symbol=symbol, exist_in_map=self.cell_exists(x, y)))
 
         return polygons
 
     def populate_labels_existing_from_layer(self, layer: QgsVectorLayer) -> None:
-        labels_existing: List[str] = []
-        seen_labels = set()
+        fields = layer.fields()
 
-        for feature in layer.getFeatures():
-            try:
-                value1, value2 = self.position_values(feature)
-            except (TypeError, ValueError):
-                continue
+        existing_cells = self.existing_cells_from_source(
+            layer, fields.lookupField(self.field_name_1), fields.lookupField(self.field_name_2)
+        )
 
-            if value1 < 0 or value2 < 0:
-                continue
+        self._existing_cells = existing_cells if existing_cells is not None else 0
 
-            identifier = self.getPositionValuesCombinationHash(value1, value2)
+    def existing_cells_from_source(
+        self,
+        source: QgsFeatureSource,
+        field_index_1: int,
+        field_index_2: int,
+        feedback: Optional[QgsFeedback] = None,
+    ) -> Optional[int]:
+        """Populated cells of the source as bits, `None` if `feedback` was canceled.
 
-            if identifier not in seen_labels:
-                seen_labels.add(identifier)
-                labels_existing.append(identifier)
+        Reading stops as soon as all cells are found.
+        """
+        if field_index_1 < 0 or field_index_2 < 0:
+            return 0
 
-        self.labels_existing = labels_existing
+        all_cells = self.all_cells
+
+        existing_cells = 0
+
+        for values1, values2 in fields_values_chunks(
+            source, field_index_1, field_index_2, chunk_size=self.existing_cells_chunk_size, feedback=feedback
+        ):
+            positions1, positions2 = self.classify_arrays(values1, values2)
+
+            existing_cells |= self._existing_cells_from_positions(positions1, positions2)
+
+            if existing_cells == all_cells:
+                break
+
+        if feedback is not None and feedback.isCanceled():
+            return None
+
+        return existing_cells
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, BivariateRenderer):
@@ -463,10 +802,28 @@ class BivariateRenderer(QgsFeatureRenderer):
     def generateCategories(self):
         for x in range(self.bivariate_color_ramp.number_of_classes):
             for y in range(self.bivariate_color_ramp.number_of_classes):
-                identifier = self.getPositionValuesCombinationHash(x, y)
-                self.cached_symbols[identifier] = self.symbol_for_values(x, y)
+                self.symbol_for_values(x, y)
 
     def legend_image(self) -> QImage:
+        """Legend image for the layer tree, rendered only if renderer with the same legend did not render it."""
+        key = self.legend_fingerprint()
+
+        image = self._legend_images.get(key)
+
+        if image is None:
+            image = self.render_legend_image()
+
+            self._legend_images[key] = image
+
+            while len(self._legend_images) > self.legend_images_max_size:
+                self._legend_images.popitem(last=False)
+
+        else:
+            self._legend_images.move_to_end(key)
+
+        return image
+
+    def render_legend_image(self) -> QImage:
 
         size = 200
 
@@ -484,6 +841,7 @@ class BivariateRenderer(QgsFeatureRenderer):
         legend_renderer.text_format.setSize(50)
         legend_renderer.add_axes_texts = True
         legend_renderer.add_axes_arrows = True
+        legend_renderer.color_matrix_image = self.bivariate_color_ramp.color_matrix_image()
         legend_renderer.render(context, size, size, self.generate_legend_polygons())
 
         painter.end()
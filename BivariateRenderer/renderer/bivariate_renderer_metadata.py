@@ -4,8 +4,6 @@ from qgis.PyQt.QtXml import QDomElement
 
 from ..text_constants import Texts
 from ..utils import get_icon_path
-from .bivariate_renderer import BivariateRenderer
-from .bivariate_renderer_widget import BivariateRendererWidget
 
 
 class BivariateRendererMetadata(QgsRendererAbstractMetadata):
@@ -22,9 +20,15 @@ class BivariateRendererMetadata(QgsRendererAbstractMetadata):
         return Texts.bivariate_renderer_full_name
 
     def createRenderer(self, element: QDomElement, context):
+        # renderer module and numpy are loaded only when the renderer is needed
+        from .bivariate_renderer import BivariateRenderer
+
         return BivariateRenderer.create_render_from_element(element, context)
 
     def createRendererWidget(self, layer, style, renderer):
+        # widget module is loaded only when the widget is needed
+        from .bivariate_renderer_widget import BivariateRendererWidget
+
         return BivariateRendererWidget(layer, style, renderer)
 
     def compatibleLayerTypes(self):
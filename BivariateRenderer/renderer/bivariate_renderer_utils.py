@@ -1,7 +1,16 @@
+from bisect import bisect_left
 from dataclasses import dataclass
-from typing import List
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Union
 
-from qgis.core import QgsClassificationRange, QgsFillSymbol
+import numpy as np
+from qgis.core import (
+    QgsClassificationMethod,
+    QgsClassificationRange,
+    QgsFeatureRequest,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsFillSymbol,
+)
 
 
 def classes_to_legend_midpoints(classes: List[QgsClassificationRange]) -> List[float]:
@@ -13,9 +22,189 @@ def classes_to_legend_midpoints(classes: List[QgsClassificationRange]) -> List[f
     return values
 
 
+def to_float_array(values: Union[np.ndarray, Sequence[Any]]) -> np.ndarray:
+    """Convert values to float array, values that cannot be converted (None, NULL) become NaN."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+
+    array = np.full(len(values), np.nan)
+
+    for i, value in enumerate(values):
+        try:
+            array[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+
+    return array
+
+
+def fields_values_chunks(
+    source: QgsFeatureSource,
+    field_index_1: int,
+    field_index_2: int,
+    chunk_size: int = 65536,
+    feedback: Optional[QgsFeedback] = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Values of two fields read in chunks in a single pass over the source without geometries.
+
+    Field with index `-1` is not read and gets empty arrays, missing values are NaN. Iteration stops when
+    `feedback` is canceled.
+    """
+    indices = [index for index in (field_index_1, field_index_2) if index >= 0]
+
+    if not indices:
+        return
+
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.Flag.NoGeometry)
+    request.setSubsetOfAttributes(indices)
+
+    if feedback is not None:
+        request.setFeedback(feedback)
+
+    values1 = []
+    values2 = []
+
+    for feature in source.getFeatures(request):
+        if feedback is not None and feedback.isCanceled():
+            return
+
+        attributes = feature.attributes()
+
+        if field_index_1 >= 0:
+            values1.append(attributes[field_index_1])
+        if field_index_2 >= 0:
+            values2.append(attributes[field_index_2])
+
+        if len(values1) >= chunk_size or len(values2) >= chunk_size:
+            yield (to_float_array(values1), to_float_array(values2))
+            values1 = []
+            values2 = []
+
+    if values1 or values2:
+        yield (to_float_array(values1), to_float_array(values2))
+
+
+def scan_fields_values(
+    source: QgsFeatureSource, field_index_1: int, field_index_2: int, feedback: Optional[QgsFeedback] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Values of two fields read in a single pass over the source without geometries.
+
+    Field with index `-1` is not read and gets an empty array, missing values are NaN.
+    """
+    chunks = list(fields_values_chunks(source, field_index_1, field_index_2, feedback=feedback))
+
+    if not chunks:
+        return (np.empty(0), np.empty(0))
+
+    return (np.concatenate([chunk[0] for chunk in chunks]), np.concatenate([chunk[1] for chunk in chunks]))
+
+
+def classes_from_values(
+    method: QgsClassificationMethod, values: np.ndarray, number_of_classes: int
+) -> List[QgsClassificationRange]:
+    """Classes calculated by the method from already read values, NaN values are ignored."""
+    values = values[~np.isnan(values)]
+
+    if values.size == 0:
+        return []
+
+    if method.valuesRequired():
+        return method.classes(values.tolist(), int(number_of_classes))
+
+    return method.classes(float(values.min()), float(values.max()), int(number_of_classes))
+
+
 @dataclass
 class LegendPolygon:
     x: float
     y: float
     symbol: QgsFillSymbol
     exist_in_map: bool = True
+
+
+class ClassBreaks:
+    """Sorted bounds of classification ranges with fast lookup of class index for a value.
+
+    Value belongs to the first class for which `lower <= value <= upper`, so value on a shared break
+    belongs to the lower class. Values outside of all classes get index `-1`.
+    """
+
+    def __init__(self, classes: List[QgsClassificationRange]) -> None:
+        self.lowers: List[float] = [range_class.lowerBound() for range_class in classes]
+        self.uppers: List[float] = [range_class.upperBound() for range_class in classes]
+
+        self._count = len(self.uppers)
+
+        self._equal_interval = False
+        self._start = 0.0
+        self._width = 0.0
+
+        if 0 < self._count:
+            self._start = self.lowers[0]
+            self._width = (self.uppers[-1] - self.lowers[0]) / self._count
+            self._equal_interval = 0 < self._width and self._is_equal_interval()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _is_equal_interval(self) -> bool:
+        tolerance = self._width * 1e-9
+
+        for i in range(self._count):
+            if abs(self.lowers[i] - (self._start + i * self._width)) > tolerance:
+                return False
+            if abs(self.uppers[i] - (self._start + (i + 1) * self._width)) > tolerance:
+                return False
+
+        return True
+
+    def position(self, value: float) -> int:
+        """Index of class containing the value, `-1` if the value is not in any class or is not comparable."""
+        try:
+            if self._equal_interval:
+                index = int((value - self._start) / self._width)
+
+                if index < 0:
+                    index = 0
+                elif index >= self._count:
+                    index = self._count - 1
+
+                # correct floating point errors on breaks, bounds are authoritative
+                if value > self.uppers[index] and index + 1 < self._count:
+                    index += 1
+                elif 0 < index and value <= self.uppers[index - 1]:
+                    index -= 1
+
+            else:
+                index = bisect_left(self.uppers, value)
+
+                if index == self._count:
+                    return -1
+
+            if self.lowers[index] <= value <= self.uppers[index]:
+                return index
+
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+        return -1
+
+    def positions(self, values: Union[np.ndarray, Sequence[Any]]) -> np.ndarray:
+        """Class indices for all values at once, same rules as `position`, NaN and None get `-1`."""
+        values = to_float_array(values)
+
+        if self._count == 0:
+            return np.full(values.shape, -1, dtype=np.int64)
+
+        lowers = np.asarray(self.lowers, dtype=float)
+        uppers = np.asarray(self.uppers, dtype=float)
+
+        indices = np.searchsorted(uppers, values, side="left")
+
+        inside = indices < self._count
+        inside &= lowers[np.minimum(indices, self._count - 1)] <= values
+
+        return np.where(inside, indices, -1).astype(np.int64)
@@ -1,7 +1,11 @@
+from typing import Optional
+
 from qgis.core import (
+    QgsApplication,
     QgsClassificationEqualInterval,
     QgsClassificationJenks,
     QgsClassificationLogarithmic,
+    QgsClassificationMethod,
     QgsClassificationPrettyBreaks,
     QgsClassificationQuantile,
     QgsFieldProxyModel,
@@ -9,7 +13,7 @@ from qgis.core import (
     QgsSymbol,
 )
 from qgis.gui import QgsColorRampButton, QgsDoubleSpinBox, QgsFieldComboBox, QgsRendererWidget, QgsSymbolButton
-from qgis.PyQt.QtCore import Qt, pyqtSignal
+from qgis.PyQt.QtCore import Qt, QTimer, pyqtSignal
 from qgis.PyQt.QtGui import QColor, QImage, QPainter, QPixmap
 from qgis.PyQt.QtWidgets import QComboBox, QFormLayout, QLabel, QMessageBox
 
@@ -19,7 +23,9 @@ from ..colorramps.color_ramps_register import BivariateColorRampsRegister
 from ..legendrenderer.legend_renderer import LegendRenderer
 from ..text_constants import Texts
 from ..utils import default_fill_symbol, log
+from .approximate_quantile import ClassificationApproximateQuantile
 from .bivariate_renderer import BivariateRenderer
+from .layer_classification import ClassificationTask
 
 
 class BivariateRendererWidget(QgsRendererWidget):
@@ -32,6 +38,12 @@ class BivariateRendererWidget(QgsRendererWidget):
         QgsClassificationLogarithmic().name(): QgsClassificationLogarithmic(),
     }
 
+    # layers with at least this number of features are classified in background task
+    background_classification_threshold = 50000
+
+    # delay in milliseconds used to collect bursts of edits into single update
+    update_delay = 150
+
     legend_changed = pyqtSignal()
 
     def __init__(self, layer, style, renderer: BivariateRenderer):
@@ -45,8 +57,9 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.register_color_ramps = BivariateColorRampsRegister()
 
-        self.default_color_ramp_1 = self.register_color_ramps.get_by_name("Violet - Blue").color_ramp_1
-        self.default_color_ramp_2 = self.register_color_ramps.get_by_name("Violet - Blue").color_ramp_2
+        default_color_ramp = self.register_color_ramps.get_by_name("Violet - Blue")
+        self.default_color_ramp_1 = default_color_ramp.color_ramp_1
+        self.default_color_ramp_2 = default_color_ramp.color_ramp_2
 
         self.bivariate_color_ramp = BivariateColorRampGradient(9)
         self.bivariate_color_ramp.set_color_ramp_1(self.default_color_ramp_1)
@@ -60,6 +73,15 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.base_symbol: QgsSymbol = default_fill_symbol()
 
+        self._classification_task: Optional[ClassificationTask] = None
+
+        self._reclassification_pending = False
+
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(self.update_delay)
+        self._update_timer.timeout.connect(self.apply_pending_updates)
+
         if renderer is None or renderer.type() != Texts.bivariate_renderer_short_name:
             self.bivariate_renderer = BivariateRenderer()
         else:
@@ -91,8 +113,8 @@ class BivariateRendererWidget(QgsRendererWidget):
             self.cb_field1.setField(self.bivariate_renderer.field_name_1)
             self.field_name_1 = self.bivariate_renderer.field_name_1
         else:
-            self.cb_field1.setCurrentIndex(1)
             self.cb_field1.setCurrentIndex(0)
+            self.setFieldName1()
 
         self.cb_field2 = QgsFieldComboBox(self)
         self.cb_field2.setFields(layer.fields())
@@ -103,8 +125,8 @@ class BivariateRendererWidget(QgsRendererWidget):
             self.cb_field2.setField(self.bivariate_renderer.field_name_2)
             self.field_name_2 = self.bivariate_renderer.field_name_2
         else:
-            self.cb_field2.setCurrentIndex(1)
             self.cb_field2.setCurrentIndex(0)
+            self.setFieldName2()
 
         self.sb_number_classes = QgsDoubleSpinBox(self)
         self.sb_number_classes.setDecimals(0)
@@ -113,26 +135,14 @@ class BivariateRendererWidget(QgsRendererWidget):
         self.sb_number_classes.setSingleStep(1)
         self.sb_number_classes.setValue(self.bivariate_renderer.bivariate_color_ramp.number_of_classes)
 
-        # self.cb_classification_methods = QComboBox(self)
-        # self.cb_classification_methods.addItems(list(self.classification_methods.keys()))
-
-        # if self.bivariate_renderer.classification_method:
+        self.cb_classification_methods = QComboBox(self)
 
-        #     if self.bivariate_renderer.classification_method.name() in list(self.classification_methods.keys()):
+        for method in (QgsClassificationEqualInterval(), ClassificationApproximateQuantile()):
+            self.cb_classification_methods.addItem(method.icon(), method.name(), method.id())
 
-        #         index = list(self.classification_methods.keys()).index(
-        #             self.bivariate_renderer.classification_method.name()
-        #         )
+        index = self.cb_classification_methods.findData(self.bivariate_renderer.classification_method.id())
 
-        #     else:
-
-        #         index = 0
-
-        #     self.cb_classification_methods.setCurrentIndex(index)
-
-        # else:
-        #     self.cb_classification_methods.setCurrentIndex(1)
-        #     self.cb_classification_methods.setCurrentIndex(0)
+        self.cb_classification_methods.setCurrentIndex(max(index, 0))
 
         self.cb_colormixing_methods = QComboBox(self)
 
@@ -151,10 +161,10 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.cb_color_ramps.setEditable(True)
 
-        for color_ramp in self.register_color_ramps.color_ramps:
+        for descriptor in self.register_color_ramps.descriptors:
             index = self.cb_color_ramps.count()
-            self.cb_color_ramps.addItem(color_ramp.name)
-            self.cb_color_ramps.setItemIcon(index, color_ramp.icon)
+            self.cb_color_ramps.addItem(descriptor.name)
+            self.cb_color_ramps.setItemIcon(index, descriptor.icon)
 
         self.cb_color_ramps.setEditable(False)
 
@@ -195,12 +205,11 @@ class BivariateRendererWidget(QgsRendererWidget):
         self.form_layout.addRow("Default Symbol", self.symbol_selector)
         self.form_layout.addRow("Color ramps", self.cb_color_ramps)
         self.form_layout.addRow("Number of classes", self.sb_number_classes)
-        self.form_layout.addRow(
-            QLabel(
-                "Data are categorized using Equal Interval classification\nmethod into provided number of categories for both fields."
-            )
-        )
-        # self.form_layout.addRow("Select classification method:", self.cb_classification_methods)
+        self.label_classification_method = QLabel()
+        self.update_classification_method_label()
+
+        self.form_layout.addRow("Classification method", self.cb_classification_methods)
+        self.form_layout.addRow(self.label_classification_method)
         self.form_layout.addRow("Color mixing method", self.cb_colormixing_methods)
         self.form_layout.addRow("Field 1", self.cb_field1)
         self.form_layout.addRow("Color Ramp 1", self.bt_color_ramp1)
@@ -210,12 +219,13 @@ class BivariateRendererWidget(QgsRendererWidget):
         self.form_layout.addRow("Legend", self.label_legend)
         self.setLayout(self.form_layout)
 
-        self.sb_number_classes.valueChanged.connect(self.update_bivariate_color_ramp)
-        # self.cb_classification_methods.currentIndexChanged.connect(self.update_bivariate_color_ramp)
-        self.bt_color_ramp1.colorRampChanged.connect(self.update_bivariate_color_ramp)
-        self.bt_color_ramp2.colorRampChanged.connect(self.update_bivariate_color_ramp)
-        self.cb_colormixing_methods.currentIndexChanged.connect(self.update_bivariate_color_ramp)
-        self.symbol_selector.changed.connect(self.update_bivariate_color_ramp)
+        self.sb_number_classes.valueChanged.connect(self.schedule_reclassification)
+        self.cb_classification_methods.currentIndexChanged.connect(self.update_classification_method_label)
+        self.cb_classification_methods.currentIndexChanged.connect(self.schedule_reclassification)
+        self.bt_color_ramp1.colorRampChanged.connect(self.schedule_color_update)
+        self.bt_color_ramp2.colorRampChanged.connect(self.schedule_color_update)
+        self.cb_colormixing_methods.currentIndexChanged.connect(self.schedule_color_update)
+        self.symbol_selector.changed.connect(self.schedule_color_update)
 
         self.update_bivariate_color_ramp()
 
@@ -263,6 +273,10 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.label_legend.clear()
 
+        if self._classification_task is not None:
+            self.label_legend.setText("Classifying data …")
+            return
+
         image = QImage(self.legend_size, self.legend_size, QImage.Format.Format_ARGB32)
         image.fill(QColor(0, 0, 0, 0))
 
@@ -282,6 +296,8 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.legend_renderer.set_space_above_ticks(self.text_ticks_size / 2)
 
+        self.legend_renderer.color_matrix_image = self.bivariate_renderer.bivariate_color_ramp.color_matrix_image()
+
         self.legend_renderer.render(
             context, self.legend_size, self.legend_size, self.bivariate_renderer.generate_legend_polygons()
         )
@@ -291,7 +307,29 @@ class BivariateRendererWidget(QgsRendererWidget):
         self.label_legend.setPixmap(QPixmap.fromImage(image))
 
     def update_bivariate_color_ramp(self) -> None:
-        self.bivariate_color_ramp.set_number_of_classes(int(self.sb_number_classes.value()))
+        """Update colors and classify data immediately."""
+        self._reclassification_pending = True
+        self.apply_pending_updates()
+
+    def schedule_color_update(self) -> None:
+        """Update colors after short delay, edits made in the meantime are applied together."""
+        self._update_timer.start()
+
+    def schedule_reclassification(self) -> None:
+        """Update colors and classify data after short delay, edits made in the meantime are applied together."""
+        self._reclassification_pending = True
+        self._update_timer.start()
+
+    def apply_pending_updates(self) -> None:
+        self._update_timer.stop()
+
+        reclassify = self._reclassification_pending
+        self._reclassification_pending = False
+
+        if reclassify:
+            self.bivariate_color_ramp.set_number_of_classes(int(self.sb_number_classes.value()))
+
+            self.bivariate_renderer.setClassificationMethod(self.classification_method())
 
         self.bivariate_color_ramp.set_color_mixing_method(
             self.register_color_mixing.get_by_name(self.cb_colormixing_methods.currentText())
@@ -300,20 +338,30 @@ class BivariateRendererWidget(QgsRendererWidget):
         self.bivariate_color_ramp.set_color_ramp_1(self.bt_color_ramp1.colorRamp())
         self.bivariate_color_ramp.set_color_ramp_2(self.bt_color_ramp2.colorRamp())
 
+        self.bivariate_renderer.polygon_symbol = self.base_symbol
+
         self.bivariate_renderer.set_bivariate_color_ramp(self.bivariate_color_ramp)
 
-        classification_method = self.classification_methods[
-            QgsClassificationEqualInterval().name()
-        ]  # self.classification_methods[self.cb_classification_methods.currentText()]
+        if reclassify:
+            self.classify()
+        else:
+            self.legend_changed.emit()
 
-        self.bivariate_renderer.setClassificationMethod(classification_method)
+    def classification_method(self) -> QgsClassificationMethod:
+        """Method selected in the combo box, approximate method of the renderer is kept with its sketches."""
+        if self.cb_classification_methods.currentData() == ClassificationApproximateQuantile.method_id:
+            if isinstance(self.bivariate_renderer.classification_method, ClassificationApproximateQuantile):
+                return self.bivariate_renderer.classification_method.clone()
 
-        self.setField1Classes()
-        self.setField2Classes()
+            return ClassificationApproximateQuantile()
 
-        self.bivariate_renderer.polygon_symbol = self.base_symbol
+        return self.classification_methods[QgsClassificationEqualInterval().name()].clone()
 
-        self.legend_changed.emit()
+    def update_classification_method_label(self) -> None:
+        self.label_classification_method.setText(
+            f"Data are categorized using {self.cb_classification_methods.currentText()} classification\n"
+            "method into provided number of categories for both fields."
+        )
 
     def setFieldName1(self) -> None:
 
@@ -321,9 +369,7 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.bivariate_renderer.setFieldName1(self.cb_field1.currentText())
 
-        self.setField1Classes()
-
-        self.legend_changed.emit()
+        self.schedule_reclassification()
 
     def setFieldName2(self) -> None:
 
@@ -331,10 +377,77 @@ class BivariateRendererWidget(QgsRendererWidget):
 
         self.bivariate_renderer.setFieldName2(self.cb_field2.currentText())
 
-        self.setField2Classes()
+        self.schedule_reclassification()
+
+    def classify(self) -> None:
+        """Classify the layer with current settings of the renderer, large layers are classified in background task
+        that supersedes any running one."""
+        self.cancel_classification()
+
+        layer = self.vectorLayer()
+
+        feature_count = layer.featureCount()
+
+        # negative count means that the provider does not know it, such layer can be large
+        if 0 <= feature_count < self.background_classification_threshold:
+            self.bivariate_renderer.classify_layer(layer)
+            self.legend_changed.emit()
+            return
+
+        task = ClassificationTask(
+            layer,
+            self.bivariate_renderer.field_name_1,
+            self.bivariate_renderer.field_name_2,
+            self.bivariate_renderer.classification_method.clone(),
+            self.bivariate_renderer.bivariate_color_ramp.number_of_classes,
+        )
+        task.classification_finished.connect(self.classification_finished)
+
+        self._classification_task = task
+
+        QgsApplication.taskManager().addTask(task)
 
         self.legend_changed.emit()
 
+    def cancel_classification(self) -> None:
+        task = self._classification_task
+
+        if task is None:
+            return
+
+        self._classification_task = None
+
+        try:
+            task.cancel()
+        except RuntimeError:
+            # task was already deleted by task manager
+            pass
+
+    def classification_finished(self, task: ClassificationTask) -> None:
+        if task is not self._classification_task:
+            # superseded by newer classification
+            return
+
+        self._classification_task = None
+
+        if task.result is not None and self._classification_is_current(task):
+            self.bivariate_renderer.apply_classification(self.vectorLayer(), task.result)
+
+        self.legend_changed.emit()
+
+    def _classification_is_current(self, task: ClassificationTask) -> bool:
+        renderer = self.bivariate_renderer
+
+        return (
+            task.layer_id == self.vectorLayer().id()
+            and task.field_name_1 == renderer.field_name_1
+            and task.field_name_2 == renderer.field_name_2
+            and task.method.id() == renderer.classification_method.id()
+            and getattr(task.method, "relative_error", None)
+            == getattr(renderer.classification_method, "relative_error", None)
+            and task.number_of_classes == renderer.bivariate_color_ramp.number_of_classes
+        )
+
     def setField1Classes(self) -> None:
 
         self.bivariate_renderer.setField1ClassificationData(self.vectorLayer(), self.field_name_1)
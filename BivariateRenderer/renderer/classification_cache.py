@@ -0,0 +1,218 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from qgis.core import QgsClassificationMethod, QgsClassificationRange, QgsVectorLayer
+from qgis.PyQt.QtCore import QCoreApplication, QThread
+
+from ..utils import Singleton
+
+ClassesData = Tuple[Tuple[str, float, float], ...]
+
+
+class ClassificationCache(metaclass=Singleton):
+    """Process wide cache of classification results shared by everything that classifies layer fields.
+
+    Results are keyed by layer, its data source and subset, field, classification method and its settings, number of
+    classes and data revision of the layer. Revision is increased whenever layer data change, the least recently used
+    results are evicted when the cache is full.
+
+    Layer signals that invalidate the results can only be connected from main thread. Worker threads (tasks,
+    processing algorithms) share results for layers that are already watched, for other layers the classes are
+    calculated without caching.
+    """
+
+    max_size = 128
+
+    def __init__(self) -> None:
+        self._results: "OrderedDict[Hashable, ClassesData]" = OrderedDict()
+        self._revisions: Dict[str, int] = {}
+        self._watched_layers: Set[str] = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def classes(
+        self, method: QgsClassificationMethod, layer: QgsVectorLayer, field_name: str, number_of_classes: int
+    ) -> List[QgsClassificationRange]:
+        """Classes for the field of the layer, calculated only if they are not cached."""
+
+        if self._is_main_thread():
+            self._watch_layer(layer)
+        elif not self._is_watched(layer):
+            # layer signals can only be watched from main thread, without them the results could get stale
+            return self._ranges(self._calculate(method, layer, field_name, number_of_classes))
+
+        classes = self.cached(method, layer, field_name, number_of_classes)
+
+        if classes is not None:
+            return classes
+
+        data = self._calculate(method, layer, field_name, number_of_classes)
+
+        self.insert(self._key(method, layer, field_name, number_of_classes), data)
+
+        return self._ranges(data)
+
+    def cached(
+        self, method: QgsClassificationMethod, layer: QgsVectorLayer, field_name: str, number_of_classes: int
+    ) -> Optional[List[QgsClassificationRange]]:
+        """Classes for the field of the layer if they are cached, `None` otherwise. Layer is never read."""
+
+        if not self._is_main_thread() and not self._is_watched(layer):
+            return None
+
+        key = self._key(method, layer, field_name, number_of_classes)
+
+        with self._lock:
+            data = self._results.get(key)
+
+            if data is None:
+                return None
+
+            self._results.move_to_end(key)
+
+        return self._ranges(data)
+
+    def store(
+        self,
+        method: QgsClassificationMethod,
+        layer: QgsVectorLayer,
+        field_name: str,
+        number_of_classes: int,
+        classes: List[QgsClassificationRange],
+    ) -> None:
+        """Store classes calculated elsewhere, so that following requests for them do not read the layer."""
+
+        if self._is_main_thread():
+            self._watch_layer(layer)
+        elif not self._is_watched(layer):
+            return
+
+        self.insert(
+            self._key(method, layer, field_name, number_of_classes),
+            tuple((x.label(), x.lowerBound(), x.upperBound()) for x in classes),
+        )
+
+    def revision(self, layer: QgsVectorLayer) -> int:
+        """Data revision of the layer, it is increased whenever layer data change."""
+        if self._is_main_thread():
+            self._watch_layer(layer)
+
+        with self._lock:
+            return self._revisions.get(layer.id(), 0)
+
+    def insert(self, key: Hashable, data: ClassesData) -> None:
+        with self._lock:
+            self._results[key] = data
+            self._results.move_to_end(key)
+
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    def invalidate_layer(self, layer_id: str) -> None:
+        """Drop results for the layer and increase its data revision."""
+        with self._lock:
+            self._revisions[layer_id] = self._revisions.get(layer_id, 0) + 1
+
+            for key in [key for key in self._results if key[0] == layer_id]:
+                del self._results[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def _forget_layer(self, layer_id: str) -> None:
+        self.invalidate_layer(layer_id)
+
+        with self._lock:
+            self._watched_layers.discard(layer_id)
+            self._revisions.pop(layer_id, None)
+
+    def _key(
+        self, method: QgsClassificationMethod, layer: QgsVectorLayer, field_name: str, number_of_classes: int
+    ) -> Hashable:
+        return (
+            layer.id(),
+            layer.source(),
+            layer.subsetString(),
+            field_name,
+            method.id(),
+            self._method_settings(method),
+            int(number_of_classes),
+            self._revisions.get(layer.id(), 0),
+        )
+
+    @staticmethod
+    def _method_settings(method: QgsClassificationMethod) -> Hashable:
+        """Settings of the method that change its classes or their labels."""
+        # approximate methods give different classes for different error bounds
+        settings = [getattr(method, "relative_error", None)]
+
+        if isinstance(method, QgsClassificationMethod):
+            settings.extend(
+                [
+                    tuple(sorted((name, repr(value)) for name, value in method.parameterValues().items())),
+                    method.labelFormat(),
+                    method.labelPrecision(),
+                    method.labelTrimTrailingZeroes(),
+                    method.symmetricModeEnabled(),
+                    method.symmetryPoint(),
+                    method.symmetryAstride(),
+                ]
+            )
+
+        return tuple(settings)
+
+    def _is_watched(self, layer: QgsVectorLayer) -> bool:
+        with self._lock:
+            return layer.id() in self._watched_layers
+
+    def _watch_layer(self, layer: QgsVectorLayer) -> None:
+        layer_id = layer.id()
+
+        with self._lock:
+            if layer_id in self._watched_layers:
+                return
+            self._watched_layers.add(layer_id)
+
+        invalidate = partial(self.invalidate_layer, layer_id)
+
+        layer.dataChanged.connect(invalidate)
+        layer.subsetStringChanged.connect(invalidate)
+        layer.afterCommitChanges.connect(invalidate)
+        layer.willBeDeleted.connect(partial(self._forget_layer, layer_id))
+
+    @staticmethod
+    def _is_main_thread() -> bool:
+        app = QCoreApplication.instance()
+        return app is not None and QThread.currentThread() == app.thread()
+
+    @staticmethod
+    def _calculate(
+        method: QgsClassificationMethod, layer: QgsVectorLayer, field_name: str, number_of_classes: int
+    ) -> ClassesData:
+        field_index = layer.fields().lookupField(field_name)
+
+        if field_index >= 0 and not method.valuesRequired():
+            # only bounds are needed, providers answer these from SQL aggregates or cached statistics
+            minimum, maximum = layer.minimumAndMaximumValue(field_index)
+
+            try:
+                minimum = float(minimum)
+                maximum = float(maximum)
+            except (TypeError, ValueError):
+                return tuple()
+
+            classes = method.classes(minimum, maximum, int(number_of_classes))
+
+        else:
+            classes, _ = method.classesV2(layer, field_name, int(number_of_classes))
+
+        return tuple((x.label(), x.lowerBound(), x.upperBound()) for x in classes)
+
+    @staticmethod
+    def _ranges(data: ClassesData) -> List[QgsClassificationRange]:
+        return [QgsClassificationRange(label, lower, upper) for label, lower, upper in data]
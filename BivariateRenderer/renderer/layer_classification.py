@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
+
+import numpy as np
+from qgis.core import (
+    QgsClassificationMethod,
+    QgsClassificationRange,
+    QgsFeatureSource,
+    QgsFeedback,
+    QgsTask,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+)
+from qgis.PyQt.QtCore import pyqtSignal
+
+from .approximate_quantile import ClassificationApproximateQuantile, KllSketch
+from .bivariate_renderer_utils import (
+    ClassBreaks,
+    classes_from_values,
+    fields_values_chunks,
+    scan_fields_values,
+)
+from .classification_cache import ClassificationCache
+
+if TYPE_CHECKING:
+    from .bivariate_renderer import BivariateRenderer
+
+
+FieldsClasses = Tuple[List[QgsClassificationRange], List[QgsClassificationRange]]
+
+
+@dataclass
+class LayerClassification:
+    field_1_classes: List[QgsClassificationRange]
+    field_2_classes: List[QgsClassificationRange]
+    populated_cells: Set[Tuple[int, int]] = field(default_factory=set)
+    sketches: Optional[Tuple[KllSketch, KllSketch]] = None
+
+
+def populated_cells(positions1: np.ndarray, positions2: np.ndarray) -> Set[Tuple[int, int]]:
+    """Pairs of class indices that occur in the data, values outside of classes are skipped."""
+    valid = (positions1 >= 0) & (positions2 >= 0)
+
+    pairs = np.unique(np.column_stack((positions1[valid], positions2[valid])), axis=0)
+
+    return {(int(position1), int(position2)) for position1, position2 in pairs.tolist()}
+
+
+def known_classes(
+    layer: QgsVectorLayer,
+    field_name_1: str,
+    field_name_2: str,
+    method: QgsClassificationMethod,
+    number_of_classes: int,
+) -> Optional[FieldsClasses]:
+    """Classes of both fields that are available without reading values of the layer, `None` otherwise.
+
+    Classes are either cached, calculated from field bounds provided by data provider for methods that do not need
+    the values, or from sketches stored with approximate method for current data of the layer.
+    """
+    cache = ClassificationCache()
+
+    if isinstance(method, ClassificationApproximateQuantile):
+        sketch1 = method.sketch(layer, field_name_1)
+        sketch2 = method.sketch(layer, field_name_2)
+
+        if sketch1 is not None and sketch2 is not None:
+            return (
+                method.classes_from_sketch(sketch1, number_of_classes),
+                method.classes_from_sketch(sketch2, number_of_classes),
+            )
+
+    if not method.valuesRequired():
+        return (
+            cache.classes(method, layer, field_name_1, number_of_classes),
+            cache.classes(method, layer, field_name_2, number_of_classes),
+        )
+
+    classes1 = cache.cached(method, layer, field_name_1, number_of_classes)
+    classes2 = cache.cached(method, layer, field_name_2, number_of_classes)
+
+    if classes1 is None or classes2 is None:
+        return None
+
+    return classes1, classes2
+
+
+def classify_source(
+    source: QgsFeatureSource,
+    field_index_1: int,
+    field_index_2: int,
+    method: QgsClassificationMethod,
+    number_of_classes: int,
+    feedback: Optional[QgsFeedback] = None,
+    classes: Optional[FieldsClasses] = None,
+) -> Optional[LayerClassification]:
+    """Classes of both fields and populated cells of the source, `None` if `feedback` was canceled.
+
+    Values are read once and kept in memory, methods using sketches only keep one chunk of values in memory but read
+    the source twice. If `classes` are already known, only populated cells are searched for, reading values in chunks
+    and stopping once all cells are found.
+    """
+    number_of_classes = int(number_of_classes)
+
+    sketches = None
+
+    if classes is not None:
+        classes1, classes2 = classes
+
+        chunks = None
+
+    elif isinstance(method, ClassificationApproximateQuantile):
+        sketch1 = method.create_sketch()
+        sketch2 = method.create_sketch()
+
+        for values1, values2 in fields_values_chunks(source, field_index_1, field_index_2, feedback=feedback):
+            sketch1.update_many(values1)
+            sketch2.update_many(values2)
+
+        classes1 = method.classes_from_sketch(sketch1, number_of_classes)
+        classes2 = method.classes_from_sketch(sketch2, number_of_classes)
+
+        sketches = (sketch1, sketch2)
+        chunks = None
+
+    else:
+        values1, values2 = scan_fields_values(source, field_index_1, field_index_2, feedback=feedback)
+
+        classes1 = classes_from_values(method, values1, number_of_classes)
+        classes2 = classes_from_values(method, values2, number_of_classes)
+
+        chunks = [(values1, values2)]
+
+    if feedback is not None and feedback.isCanceled():
+        return None
+
+    classification = LayerClassification(classes1, classes2, sketches=sketches)
+
+    if field_index_1 < 0 or field_index_2 < 0:
+        return classification
+
+    breaks1 = ClassBreaks(classes1)
+    breaks2 = ClassBreaks(classes2)
+
+    if chunks is None:
+        chunks = fields_values_chunks(source, field_index_1, field_index_2, feedback=feedback)
+
+    cells_count = len(classes1) * len(classes2)
+
+    for values1, values2 in chunks:
+        classification.populated_cells |= populated_cells(breaks1.positions(values1), breaks2.positions(values2))
+
+        if len(classification.populated_cells) == cells_count:
+            break
+
+    if feedback is not None and feedback.isCanceled():
+        return None
+
+    return classification
+
+
+class ClassificationTask(QgsTask):
+    """Classify fields of the layer and find populated cells in background.
+
+    Classes already known on construction are not calculated again. Layer data are read through feature source created
+    on construction. `classification_finished` is emitted with the
+    task itself on the main thread once the task ends, `result` is `None` if it failed or was canceled.
+    """
+
+    classification_finished = pyqtSignal(object)
+
+    def __init__(
+        self,
+        layer: QgsVectorLayer,
+        field_name_1: str,
+        field_name_2: str,
+        method: QgsClassificationMethod,
+        number_of_classes: int,
+    ) -> None:
+        super().__init__("Bivariate renderer classification", QgsTask.Flag.CanCancel)
+
+        self.layer_id = layer.id()
+        self.field_name_1 = field_name_1
+        self.field_name_2 = field_name_2
+        self.method = method
+        self.number_of_classes = int(number_of_classes)
+
+        self.result: Optional[LayerClassification] = None
+
+        self._field_index_1 = layer.fields().lookupField(field_name_1)
+        self._field_index_2 = layer.fields().lookupField(field_name_2)
+
+        self._classes = known_classes(layer, field_name_1, field_name_2, method, self.number_of_classes)
+
+        self._source = QgsVectorLayerFeatureSource(layer)
+
+        self._feedback = QgsFeedback()
+
+    def cancel(self) -> None:
+        self._feedback.cancel()
+        super().cancel()
+
+    def run(self) -> bool:
+        self.result = classify_source(
+            self._source,
+            self._field_index_1,
+            self._field_index_2,
+            self.method,
+            self.number_of_classes,
+            self._feedback,
+            self._classes,
+        )
+
+        return self.result is not None and not self.isCanceled()
+
+    def finished(self, result: bool) -> None:
+        if not result:
+            self.result = None
+
+        self.classification_finished.emit(self)
+
+
+class PopulatedCellsTask(QgsTask):
+    """Find populated cells of renderer classes in background.
+
+    Renderer is cloned on construction, so that it can be changed while the task runs. `populated_cells_found` is
+    emitted with the task itself on the main thread once the task ends, `existing_cells` is `None` if it failed or
+    was canceled.
+    """
+
+    populated_cells_found = pyqtSignal(object)
+
+    def __init__(self, layer: QgsVectorLayer, renderer: BivariateRenderer) -> None:
+        super().__init__("Bivariate renderer populated cells", QgsTask.Flag.CanCancel)
+
+        self.layer_id = layer.id()
+        self.renderer = renderer.clone()
+
+        self.existing_cells: Optional[int] = None
+
+        self._field_index_1 = layer.fields().lookupField(renderer.field_name_1)
+        self._field_index_2 = layer.fields().lookupField(renderer.field_name_2)
+
+        self._source = QgsVectorLayerFeatureSource(layer)
+
+        self._feedback = QgsFeedback()
+
+    def cancel(self) -> None:
+        self._feedback.cancel()
+        super().cancel()
+
+    def run(self) -> bool:
+        self.existing_cells = self.renderer.existing_cells_from_source(
+            self._source, self._field_index_1, self._field_index_2, self._feedback
+        )
+
+        return self.existing_cells is not None and not self.isCanceled()
+
+    def finished(self, result: bool) -> None:
+        if not result:
+            self.existing_cells = None
+
+        self.populated_cells_found.emit(self)
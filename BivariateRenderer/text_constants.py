@@ -11,6 +11,8 @@ class Texts:
 
     plot_item_bivariate_renderer = "Plot item Bivariate Renderer"
 
+    profiler_group = "Bivariate Renderer"
+
 
 class IDS:
 
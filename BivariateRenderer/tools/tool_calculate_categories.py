@@ -1,18 +1,31 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
 from qgis.core import (
     QgsClassificationEqualInterval,
+    QgsFeatureRequest,
     QgsField,
     QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingContext,
     QgsProcessingException,
     QgsProcessingFeedback,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterField,
     QgsProcessingParameterNumber,
     QgsProcessingParameterString,
     QgsProcessingParameterVectorLayer,
+    QgsProcessingUtils,
+    QgsVectorDataProvider,
 )
 from qgis.PyQt.QtCore import QVariant
 
+from ..renderer.classification_cache import ClassificationCache
+
+if TYPE_CHECKING:
+    from ..renderer.bivariate_renderer_utils import ClassBreaks
+
 
 class CalculateCategoriesAlgorithm(QgsProcessingAlgorithm):
 
@@ -22,6 +35,17 @@ class CalculateCategoriesAlgorithm(QgsProcessingAlgorithm):
     FIELD_2 = "Field2"
     RESULT_FIELD_NAME = "ResultFieldName"
 
+    DEFAULT_RESULT_FIELD_NAME = "Category"
+
+    # number of features whose categories are written to the data provider at once
+    chunk_size = 10000
+
+    def __init__(self):
+        super().__init__()
+
+        # id of the input layer, it is refreshed on main thread once the algorithm ends
+        self._layer_id: Optional[str] = None
+
     def initAlgorithm(self, config=None):
 
         self.addParameter(
@@ -30,38 +54,37 @@ class CalculateCategoriesAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
-        self.addParameter(
+        for parameter in self.categories_parameters(self.INPUT_LAYER):
+            self.addParameter(parameter)
+
+    @classmethod
+    def categories_parameters(cls, input_parameter_name: str) -> List[QgsProcessingParameterDefinition]:
+        """Parameters of fields, classes and result field shared by algorithms creating categories."""
+        return [
             QgsProcessingParameterField(
-                self.FIELD_1,
+                cls.FIELD_1,
                 "Select field 1",
-                parentLayerParameterName=self.INPUT_LAYER,
+                parentLayerParameterName=input_parameter_name,
                 type=QgsProcessingParameterField.Numeric,
-            )
-        )
-
-        self.addParameter(
+            ),
             QgsProcessingParameterField(
-                self.FIELD_2,
+                cls.FIELD_2,
                 "Select field 2",
-                parentLayerParameterName=self.INPUT_LAYER,
+                parentLayerParameterName=input_parameter_name,
                 type=QgsProcessingParameterField.Numeric,
-            )
-        )
-
-        self.addParameter(
+            ),
             QgsProcessingParameterNumber(
-                self.NUMBER_CLASSES,
+                cls.NUMBER_CLASSES,
                 "Number of classes for each field (total number of classes is this number times 2)",
                 type=QgsProcessingParameterNumber.Integer,
                 minValue=2,
                 maxValue=5,
                 defaultValue=3,
-            )
-        )
-
-        self.addParameter(
-            QgsProcessingParameterString(self.RESULT_FIELD_NAME, "Result field name", defaultValue="Category")
-        )
+            ),
+            QgsProcessingParameterString(
+                cls.RESULT_FIELD_NAME, "Result field name", defaultValue=cls.DEFAULT_RESULT_FIELD_NAME
+            ),
+        ]
 
     def processAlgorithm(self, parameters: dict, context: QgsProcessingContext, feedback: QgsProcessingFeedback):
 
@@ -69,56 +92,137 @@ class CalculateCategoriesAlgorithm(QgsProcessingAlgorithm):
         if layer is None:
             raise QgsProcessingException("Input layer is not valid.")
 
+        if layer.isEditable():
+            # provider is written directly, edit buffer would hide or override the written categories
+            raise QgsProcessingException("Input layer is in edit mode, save or discard the edits first.")
+
+        self._layer_id = layer.id()
+
         field1 = self.parameterAsString(parameters, self.FIELD_1, context)
         field2 = self.parameterAsString(parameters, self.FIELD_2, context)
         number_of_classes = self.parameterAsDouble(parameters, self.NUMBER_CLASSES, context)
         result_field = self.parameterAsString(parameters, self.RESULT_FIELD_NAME, context)
 
+        # values are written directly to the data provider, so that edit buffer does not hold all changes
+        provider = layer.dataProvider()
+
+        if not provider.capabilities() & QgsVectorDataProvider.Capability.ChangeAttributeValues:
+            raise QgsProcessingException("Input layer does not support changing attribute values.")
+
+        if provider.fields().indexOf(result_field) < 0:
+            if not provider.addAttributes([QgsField(result_field, QVariant.String)]):
+                raise QgsProcessingException(f"Field `{result_field}` could not be added to input layer.")
+
+            layer.updateFields()
+
         classification_alg = QgsClassificationEqualInterval()
 
-        layer.startEditing()
+        classes_1 = ClassificationCache().classes(classification_alg, layer, field1, int(number_of_classes))
+        classes_2 = ClassificationCache().classes(classification_alg, layer, field2, int(number_of_classes))
 
-        layer.addAttribute(QgsField(result_field, QVariant.String))
+        # numpy based module is loaded when the algorithm runs, not when the provider is registered
+        from ..renderer.bivariate_renderer_utils import ClassBreaks
 
-        classes_1 = classification_alg.classes(layer, field1, int(number_of_classes))
-        classes_2 = classification_alg.classes(layer, field2, int(number_of_classes))
+        breaks_1 = ClassBreaks(classes_1)
+        breaks_2 = ClassBreaks(classes_2)
 
-        field_index = layer.fields().indexOf(result_field)
+        fields = provider.fields()
 
-        feature_count = layer.dataProvider().featureCount()
+        field_index = fields.indexOf(result_field)
+        field_index_1 = fields.lookupField(field1)
+        field_index_2 = fields.lookupField(field2)
 
-        features_iterator = layer.getFeatures()
+        feature_ids = sorted(provider.allFeatureIds())
 
-        for number, feature in enumerate(features_iterator):
+        feature_count = max(len(feature_ids), 1)
+
+        # features are read in chunks by their ids and categories of each chunk are written once its iterator is
+        # closed, providers such as GeoPackage lock the data while an iterator is open
+        for start in range(0, len(feature_ids), self.chunk_size):
 
             if feedback.isCanceled():
                 break
 
-            field_1_value = feature.attribute(field1)
-            field_2_value = feature.attribute(field2)
+            request = QgsFeatureRequest()
+            request.setFilterFids(set(feature_ids[start : start + self.chunk_size]))
+            request.setFlags(QgsFeatureRequest.Flag.NoGeometry)
+            request.setSubsetOfAttributes([field_index_1, field_index_2])
+            request.setFeedback(feedback)
+
+            chunk_ids: List[int] = []
+            values_1: List[Any] = []
+            values_2: List[Any] = []
 
-            class_value_1 = None
-            class_value_2 = None
+            iterator = provider.getFeatures(request)
 
-            for i, range_class in enumerate(classes_1):
+            for feature in iterator:
 
-                if range_class.lowerBound() <= field_1_value <= range_class.upperBound():
-                    class_value_1 = i + 1
+                attributes = feature.attributes()
 
-            for i, range_class in enumerate(classes_2):
+                chunk_ids.append(feature.id())
+                values_1.append(attributes[field_index_1])
+                values_2.append(attributes[field_index_2])
 
-                if range_class.lowerBound() <= field_2_value <= range_class.upperBound():
-                    class_value_2 = i + 1
+            iterator.close()
 
-            if class_value_1 is not None and class_value_2 is not None:
-                layer.changeAttributeValue(feature.id(), field_index, "{}-{}".format(class_value_1, class_value_2))
+            if feedback.isCanceled():
+                break
+
+            self.write_categories(provider, field_index, chunk_ids, breaks_1, breaks_2, values_1, values_2)
+
+            feedback.setProgress((min(start + self.chunk_size, len(feature_ids)) / feature_count) * 100)
+
+        return {}
+
+    def postProcessAlgorithm(self, context: QgsProcessingContext, feedback: QgsProcessingFeedback):
+
+        if self._layer_id is None:
+            return {}
 
-            feedback.setProgress((number / feature_count) * 100)
+        # layer signals and cache are handled on main thread, where post processing runs
+        ClassificationCache().invalidate_layer(self._layer_id)
 
-        layer.commitChanges()
+        layer = QgsProcessingUtils.mapLayerFromString(self._layer_id, context)
+
+        if layer is not None:
+            # categories were written directly to the data provider, cached features of the layer are outdated
+            layer.reload()
+            layer.triggerRepaint()
 
         return {}
 
+    @staticmethod
+    def categories(
+        feature_ids: List[int], breaks_1: ClassBreaks, breaks_2: ClassBreaks, values_1: List[Any], values_2: List[Any]
+    ) -> Dict[int, str]:
+        """Categories of features in form `class1-class2` numbered from 1, features outside of classes are skipped."""
+        positions_1 = breaks_1.positions(values_1).tolist()
+        positions_2 = breaks_2.positions(values_2).tolist()
+
+        return {
+            feature_id: f"{position_1 + 1}-{position_2 + 1}"
+            for feature_id, position_1, position_2 in zip(feature_ids, positions_1, positions_2)
+            if position_1 >= 0 and position_2 >= 0
+        }
+
+    def write_categories(
+        self,
+        provider: QgsVectorDataProvider,
+        field_index: int,
+        feature_ids: List[int],
+        breaks_1: ClassBreaks,
+        breaks_2: ClassBreaks,
+        values_1: List[Any],
+        values_2: List[Any],
+    ) -> None:
+
+        categories = self.categories(feature_ids, breaks_1, breaks_2, values_1, values_2)
+
+        changes = {feature_id: {field_index: category} for feature_id, category in categories.items()}
+
+        if changes and not provider.changeAttributeValues(changes):
+            raise QgsProcessingException(f"Categories could not be written: {'; '.join(provider.errors())}")
+
     def name(self):
         return "createcategories"
 
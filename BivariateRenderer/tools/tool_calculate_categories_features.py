@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional
+
+from qgis.core import (
+    QgsClassificationEqualInterval,
+    QgsClassificationMethod,
+    QgsClassificationRange,
+    QgsFeature,
+    QgsFeatureSource,
+    QgsField,
+    QgsFields,
+    QgsMapLayer,
+    QgsProcessing,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeatureBasedAlgorithm,
+    QgsProcessingFeedback,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from .tool_calculate_categories import CalculateCategoriesAlgorithm
+
+if TYPE_CHECKING:
+    from ..renderer.bivariate_renderer_utils import ClassBreaks
+
+
+class CalculateCategoriesFeaturesAlgorithm(QgsProcessingFeatureBasedAlgorithm):
+    """Stream features of the source into a sink with added field of bivariate categories.
+
+    Unlike `CalculateCategoriesAlgorithm` it does not edit the input layer, so it works for any feature source and
+    in models. In-place editing is supported for layers that already have the result field.
+    """
+
+    NUMBER_CLASSES = CalculateCategoriesAlgorithm.NUMBER_CLASSES
+    FIELD_1 = CalculateCategoriesAlgorithm.FIELD_1
+    FIELD_2 = CalculateCategoriesAlgorithm.FIELD_2
+    RESULT_FIELD_NAME = CalculateCategoriesAlgorithm.RESULT_FIELD_NAME
+
+    def __init__(self):
+        super().__init__()
+
+        self._result_field = ""
+        self._result_field_index = -1
+
+        self._field_index_1 = -1
+        self._field_index_2 = -1
+
+        self._breaks_1: Optional[ClassBreaks] = None
+        self._breaks_2: Optional[ClassBreaks] = None
+
+    def inputLayerTypes(self) -> List[int]:
+        return [QgsProcessing.TypeVectorPolygon]
+
+    def supportInPlaceEdit(self, layer: QgsMapLayer) -> bool:
+        """In-place editing only changes values of existing fields, so the layer needs text field with default result
+        name."""
+        if not super().supportInPlaceEdit(layer) or not isinstance(layer, QgsVectorLayer):
+            return False
+
+        field_index = layer.fields().lookupField(CalculateCategoriesAlgorithm.DEFAULT_RESULT_FIELD_NAME)
+
+        return field_index >= 0 and layer.fields().at(field_index).type() == QVariant.String
+
+    def initParameters(self, config=None):
+
+        for parameter in CalculateCategoriesAlgorithm.categories_parameters("INPUT"):
+            self.addParameter(parameter)
+
+    def prepareAlgorithm(self, parameters: dict, context: QgsProcessingContext, feedback: QgsProcessingFeedback):
+
+        source = self.parameterAsSource(parameters, "INPUT", context)
+        if source is None:
+            raise QgsProcessingException("Input layer is not valid.")
+
+        field1 = self.parameterAsString(parameters, self.FIELD_1, context)
+        field2 = self.parameterAsString(parameters, self.FIELD_2, context)
+        number_of_classes = self.parameterAsInt(parameters, self.NUMBER_CLASSES, context)
+        self._result_field = self.parameterAsString(parameters, self.RESULT_FIELD_NAME, context)
+
+        fields = source.fields()
+
+        self._field_index_1 = fields.lookupField(field1)
+        self._field_index_2 = fields.lookupField(field2)
+
+        if self._field_index_1 < 0 or self._field_index_2 < 0:
+            raise QgsProcessingException("Selected fields are not in the input layer.")
+
+        self._result_field_index = fields.lookupField(self._result_field)
+
+        if self._result_field_index >= 0 and fields.at(self._result_field_index).type() != QVariant.String:
+            raise QgsProcessingException(f"Existing field `{self._result_field}` is not a text field.")
+
+        # equal interval only needs bounds, sources answer these without reading all features if they can
+        classification_alg = QgsClassificationEqualInterval()
+
+        # numpy based module is loaded when the algorithm runs, not when the provider is registered
+        from ..renderer.bivariate_renderer_utils import ClassBreaks
+
+        self._breaks_1 = ClassBreaks(self.classes(classification_alg, source, self._field_index_1, number_of_classes))
+        self._breaks_2 = ClassBreaks(self.classes(classification_alg, source, self._field_index_2, number_of_classes))
+
+        return True
+
+    @staticmethod
+    def classes(
+        method: QgsClassificationMethod, source: QgsFeatureSource, field_index: int, number_of_classes: int
+    ) -> List[QgsClassificationRange]:
+        minimum, maximum = source.minimumAndMaximumValue(field_index)
+
+        try:
+            minimum = float(minimum)
+            maximum = float(maximum)
+        except (TypeError, ValueError):
+            return []
+
+        return method.classes(minimum, maximum, number_of_classes)
+
+    def outputName(self) -> str:
+        return "Categorized"
+
+    def outputFields(self, inputFields: QgsFields) -> QgsFields:
+
+        fields = QgsFields(inputFields)
+
+        if fields.lookupField(self._result_field) < 0:
+            fields.append(QgsField(self._result_field, QVariant.String))
+
+        return fields
+
+    def processFeature(self, feature: QgsFeature, context: QgsProcessingContext, feedback: QgsProcessingFeedback):
+
+        attributes = feature.attributes()
+
+        position_1 = self._breaks_1.position(attributes[self._field_index_1])
+        position_2 = self._breaks_2.position(attributes[self._field_index_2])
+
+        category = None
+
+        if position_1 >= 0 and position_2 >= 0:
+            category = f"{position_1 + 1}-{position_2 + 1}"
+
+        if self._result_field_index >= 0:
+            attributes[self._result_field_index] = category
+        else:
+            attributes.append(category)
+
+        feature.setAttributes(attributes)
+
+        return [feature]
+
+    def name(self):
+        return "createcategoriesfeatures"
+
+    def displayName(self):
+        return "Create Bivariate Categories (New Layer)"
+
+    def group(self):
+        pass
+
+    def groupId(self):
+        pass
+
+    def createInstance(self):
+        return CalculateCategoriesFeaturesAlgorithm()
@@ -1,5 +1,7 @@
+import hashlib
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Optional
 
 from qgis.core import (
     Qgis,
@@ -8,11 +10,13 @@ from qgis.core import (
     QgsLinePatternFillSymbolLayer,
     QgsLineSymbol,
     QgsMessageLog,
+    QgsProviderRegistry,
     QgsRenderContext,
     QgsSimpleFillSymbolLayer,
     QgsVectorLayer,
 )
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import QFileInfo, Qt
+from qgis.PyQt.QtGui import QIcon
 
 from .text_constants import Texts
 
@@ -112,6 +116,37 @@ def symbol_layers_properties(layer: QgsVectorLayer) -> str:
     return str_repr
 
 
+def layer_data_fingerprint(layer: QgsVectorLayer) -> Optional[str]:
+    """Return fingerprint of data of the layer that persists across sessions.
+
+    It changes whenever the file of the layer is modified. `None` is returned if changes of layer data cannot be
+    detected, that is for layers not stored in files and layers with unsaved edits.
+    """
+
+    if layer.isModified():
+        return None
+
+    path = QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source()).get("path")
+
+    if not path:
+        return None
+
+    file_info = QFileInfo(path)
+
+    if not file_info.exists():
+        return None
+
+    data = (
+        layer.providerType(),
+        layer.source(),
+        layer.subsetString(),
+        file_info.size(),
+        file_info.lastModified().toMSecsSinceEpoch(),
+    )
+
+    return hashlib.sha1(repr(data).encode("utf-8")).hexdigest()
+
+
 def only_color_fill_symbol() -> QgsFillSymbol:
     """Return a fill symbol with only color set."""
 
@@ -170,3 +205,16 @@ class Singleton(type):
             cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
 
         return cls._instances[cls]
+
+
+@dataclass(frozen=True)
+class RegisterDescriptor:
+    """Item of a register that is only described until it is needed, `factory` creates the item."""
+
+    name: str
+    factory: Callable[[], Any]
+    icon_path: str = ""
+
+    @property
+    def icon(self) -> QIcon:
+        return QIcon(self.icon_path)
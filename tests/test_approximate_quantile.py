@@ -0,0 +1,183 @@
+import random
+
+import pytest
+from qgis.core import QgsClassificationMethod, QgsReadWriteContext, QgsVectorLayer
+from qgis.PyQt.QtXml import QDomDocument
+
+from BivariateRenderer.renderer import approximate_quantile
+from BivariateRenderer.renderer.approximate_quantile import ClassificationApproximateQuantile, KllSketch
+from BivariateRenderer.renderer.bivariate_renderer import BivariateRenderer
+from BivariateRenderer.renderer.classification_cache import ClassificationCache
+from BivariateRenderer.renderer.layer_classification import known_classes
+
+
+def rank(values, value) -> float:
+    return sum(1 for x in values if x < value) / len(values)
+
+
+def test_sketch_quantiles_within_error():
+    generator = random.Random(42)
+    values = [generator.expovariate(1) for _ in range(100000)]
+
+    method = ClassificationApproximateQuantile(relative_error=0.01)
+
+    sketch = method.create_sketch()
+    sketch.update_many(values)
+
+    assert sketch.count == len(values)
+    assert sketch.min == min(values)
+    assert sketch.max == max(values)
+
+    fractions = [0.2, 0.4, 0.6, 0.8]
+
+    for fraction, quantile in zip(fractions, sketch.quantiles(fractions)):
+        assert rank(values, quantile) == pytest.approx(fraction, abs=0.01)
+
+
+def test_sketch_ignores_missing_values():
+    sketch = KllSketch()
+
+    sketch.update(None)
+    sketch.update(float("nan"))
+    sketch.update_many([1, None, 2])
+
+    assert sketch.count == 2
+
+
+def test_sketch_merge():
+    generator = random.Random(7)
+    values1 = [generator.uniform(0, 100) for _ in range(50000)]
+    values2 = [generator.uniform(50, 150) for _ in range(50000)]
+
+    sketch1 = KllSketch(300)
+    sketch1.update_many(values1)
+
+    sketch2 = KllSketch(300)
+    sketch2.update_many(values2)
+
+    sketch1.merge(sketch2)
+
+    assert sketch1.count == 100000
+    assert sketch1.min == min(values1)
+    assert sketch1.max == max(values2)
+
+    median = sketch1.quantiles([0.5])[0]
+
+    assert rank(values1 + values2, median) == pytest.approx(0.5, abs=0.01)
+
+
+def test_sketch_save_load():
+    sketch = KllSketch(50)
+    sketch.update_many(range(10000))
+
+    doc = QDomDocument("doc")
+    loaded = KllSketch.load(sketch.save(doc))
+
+    assert loaded.count == sketch.count
+    assert loaded.k == sketch.k
+    assert loaded.quantiles([0.1, 0.5, 0.9]) == sketch.quantiles([0.1, 0.5, 0.9])
+
+
+def test_classification_from_layer(nc_layer: QgsVectorLayer):
+    method = ClassificationApproximateQuantile()
+
+    classes, error = method.classesV2(nc_layer, "AREA", 3)
+
+    assert error == ""
+    assert len(classes) == 3
+    assert classes[0].lowerBound() == pytest.approx(0.042)
+    assert classes[-1].upperBound() == pytest.approx(0.241)
+
+    for lower_class, upper_class in zip(classes[:-1], classes[1:]):
+        assert lower_class.upperBound() == upper_class.lowerBound()
+
+    classes, error = method.classesV2(nc_layer, "non_existing_field", 3)
+
+    assert classes == []
+    assert error
+
+
+def test_renderer_with_approximate_quantile(nc_layer: QgsVectorLayer):
+    renderer = BivariateRenderer.from_layer(
+        nc_layer, "AREA", "PERIMETER", classification_method=ClassificationApproximateQuantile(0.05)
+    )
+
+    assert len(renderer.field_1_classes) == 3
+    assert len(renderer.field_2_classes) == 3
+    assert renderer.labels_existing
+
+    doc = QDomDocument("doc")
+    context = QgsReadWriteContext()
+
+    loaded = BivariateRenderer.create_render_from_element(renderer.save(doc, context), context)
+
+    assert isinstance(loaded.classification_method, ClassificationApproximateQuantile)
+    assert loaded.classification_method.relative_error == pytest.approx(0.05)
+
+
+def test_sketches_stored_with_renderer(nc_layer: QgsVectorLayer):
+    renderer = BivariateRenderer.from_layer(
+        nc_layer, "AREA", "PERIMETER", classification_method=ClassificationApproximateQuantile(0.05)
+    )
+
+    method = renderer.classification_method
+
+    assert isinstance(method, QgsClassificationMethod)
+    assert method.sketch(nc_layer, "AREA") is not None
+    assert method.sketch(nc_layer, "PERIMETER") is not None
+
+    doc = QDomDocument("doc")
+    context = QgsReadWriteContext()
+
+    loaded = BivariateRenderer.create_render_from_element(renderer.save(doc, context), context)
+
+    sketch = loaded.classification_method.sketch(nc_layer, "AREA")
+
+    assert sketch is not None
+    assert sketch.count == method.sketch(nc_layer, "AREA").count
+
+    # classes for other number of classes are calculated from stored sketches
+    classes = known_classes(nc_layer, "AREA", "PERIMETER", loaded.classification_method, 4)
+
+    assert classes is not None
+    assert len(classes[0]) == 4
+    assert len(classes[1]) == 4
+
+    # sketches of other layer with the same fields are not used
+    other_layer = nc_layer.clone()
+
+    assert loaded.classification_method.sketch(other_layer, "AREA") is None
+    assert loaded.classification_method.clone().sketch(other_layer, "AREA") is None
+
+    other_layer.setSubsetString('"AREA" > 0.1')
+
+    assert method.sketch(other_layer, "AREA") is None
+
+    # sketches are not used once layer data change
+    ClassificationCache().invalidate_layer(nc_layer.id())
+
+    assert loaded.classification_method.sketch(nc_layer, "AREA") is None
+
+
+def test_loaded_sketches_dropped_for_changed_data(nc_layer: QgsVectorLayer, monkeypatch):
+    renderer = BivariateRenderer.from_layer(
+        nc_layer, "AREA", "PERIMETER", classification_method=ClassificationApproximateQuantile(0.05)
+    )
+
+    doc = QDomDocument("doc")
+    context = QgsReadWriteContext()
+
+    element = renderer.save(doc, context)
+
+    # file of the layer changed since the sketches were saved
+    monkeypatch.setattr(approximate_quantile, "layer_data_fingerprint", lambda layer: "changed")
+
+    loaded = BivariateRenderer.create_render_from_element(element, context)
+
+    assert len(loaded.classification_method._sketches) == 2
+
+    assert loaded.classification_method.sketch(nc_layer, "AREA") is None
+    assert loaded.classification_method.sketch(nc_layer, "PERIMETER") is None
+
+    # sketches that do not match the data are dropped
+    assert not loaded.classification_method._sketches
@@ -1,15 +1,20 @@
+from collections import OrderedDict
 from typing import Callable
 
+import numpy as np
 import pytest
 from qgis.core import (
     QgsClassificationRange,
     QgsFeature,
     QgsField,
+    QgsFields,
+    QgsFillSymbol,
     QgsReadWriteContext,
     QgsRenderContext,
     QgsVectorLayer,
 )
 from qgis.PyQt.QtCore import QVariant
+from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtXml import QDomDocument, QDomElement
 
 from BivariateRenderer.colorramps.bivariate_color_ramp import BivariateColorRampCyanViolet
@@ -334,3 +339,230 @@ def test_populate_labels_existing_skips_null_values():
 
     assert len(renderer.labels_existing) == 1
     assert renderer.labels_existing[0] == "1-1"
+
+
+def test_position_value_classes_not_equal_interval():
+    renderer = BivariateRenderer()
+    renderer.field_2_classes = [
+        QgsClassificationRange("Class-1", 0.0, 1.0),
+        QgsClassificationRange("Class-2", 2.0, 5.0),
+        QgsClassificationRange("Class-3", 5.0, 5.5),
+    ]
+
+    assert renderer.positionValueField2(0.5) == 0
+    assert renderer.positionValueField2(1.0) == 0
+    assert renderer.positionValueField2(5.0) == 1
+    assert renderer.positionValueField2(5.2) == 2
+
+    # gap between classes
+    assert renderer.positionValueField2(1.5) == -1
+
+    # outside of classes
+    assert renderer.positionValueField2(-1.0) == -1
+    assert renderer.positionValueField2(6.0) == -1
+
+
+def test_position_value_equal_interval_breaks(nc_layer: QgsVectorLayer):
+
+    renderer = prepare_bivariate_renderer(nc_layer, field1="AREA", field2="PERIMETER")
+
+    for i, range_class in enumerate(renderer.field_1_classes):
+        assert renderer.positionValueField1(range_class.lowerBound()) == max(i - 1, 0)
+        assert renderer.positionValueField1(range_class.upperBound()) == i
+
+    assert renderer.positionValueField1(None) == -1
+
+
+def test_symbol_for_feature_outside_of_classes():
+    mem_layer = QgsVectorLayer("NoGeometry", "test", "memory")
+    provider = mem_layer.dataProvider()
+    provider.addAttributes(
+        [
+            QgsField("field1", QVariant.Double),
+            QgsField("field2", QVariant.Double),
+        ]
+    )
+    mem_layer.updateFields()
+
+    f_outside = QgsFeature(mem_layer.fields())
+    f_outside.setAttribute("field1", 5.0)
+    f_outside.setAttribute("field2", 0.5)
+
+    f_valid = QgsFeature(mem_layer.fields())
+    f_valid.setAttribute("field1", 1.5)
+    f_valid.setAttribute("field2", 0.5)
+
+    renderer = BivariateRenderer()
+    renderer.setFieldName1("field1")
+    renderer.setFieldName2("field2")
+    renderer.field_1_classes = [
+        QgsClassificationRange("Field-1-Class-1", 0.0, 1.0),
+        QgsClassificationRange("Field-1-Class-2", 1.0, 2.0),
+    ]
+    renderer.field_2_classes = [
+        QgsClassificationRange("Field-2-Class-1", 0.0, 1.0),
+        QgsClassificationRange("Field-2-Class-2", 1.0, 2.0),
+    ]
+
+    assert renderer.symbolForFeature(f_outside, QgsRenderContext()) is None
+    assert renderer.labels_existing == []
+
+    symbol = renderer.symbolForFeature(f_valid, QgsRenderContext())
+
+    assert symbol is renderer.symbol_for_values(1, 0)
+    assert renderer.labels_existing == ["2-1"]
+    assert renderer.cell_exists(1, 0)
+    assert not renderer.cell_exists(0, 1)
+
+
+def test_start_render_called_once_per_symbol(nc_layer: QgsVectorLayer, monkeypatch):
+
+    renderer = prepare_bivariate_renderer(nc_layer, field1="AREA", field2="PERIMETER")
+
+    started_symbols = []
+
+    original_start_render = QgsFillSymbol.startRender
+
+    def counting_start_render(symbol, context, fields=QgsFields()):
+        started_symbols.append(symbol)
+        original_start_render(symbol, context, fields)
+
+    monkeypatch.setattr(QgsFillSymbol, "startRender", counting_start_render)
+
+    context = QgsRenderContext()
+
+    for _ in range(2):
+        started_symbols.clear()
+
+        renderer.startRender(context, nc_layer.fields())
+
+        for feature in nc_layer.getFeatures():
+            renderer.symbolForFeature(feature, context)
+
+        renderer.stopRender(context)
+
+        assert len(started_symbols) == len(renderer.field_1_classes) * len(renderer.field_2_classes)
+        assert len({id(symbol) for symbol in started_symbols}) == len(started_symbols)
+
+
+def test_position_values_uses_field_indices_from_start_render(nc_layer: QgsVectorLayer):
+
+    renderer = prepare_bivariate_renderer(nc_layer, field1="AREA", field2="PERIMETER")
+
+    features = list(nc_layer.getFeatures())
+
+    positions_by_name = [renderer.position_values(feature) for feature in features]
+
+    context = QgsRenderContext()
+    renderer.startRender(context, nc_layer.fields())
+
+    assert renderer._field_index_1 == nc_layer.fields().indexOf("AREA")
+    assert renderer._field_index_2 == nc_layer.fields().indexOf("PERIMETER")
+
+    positions_by_index = [renderer.position_values(feature) for feature in features]
+
+    assert positions_by_index == positions_by_name
+
+    # feature without the resolved fields falls back to lookup by field name
+    assert renderer.position_values(QgsFeature()) == (-1, -1)
+
+    renderer.stopRender(context)
+
+    assert renderer._field_index_1 == -1
+    assert renderer._field_index_2 == -1
+
+    # outside of render features of any schema are read by field name
+    mem_layer = QgsVectorLayer("NoGeometry", "test", "memory")
+    mem_layer.dataProvider().addAttributes(list(reversed(nc_layer.fields().toList())))
+    mem_layer.updateFields()
+
+    feature = QgsFeature(mem_layer.fields())
+    for field in mem_layer.fields():
+        feature.setAttribute(field.name(), features[0].attribute(field.name()))
+
+    assert renderer.position_values(feature) == positions_by_name[0]
+
+
+def test_classify_arrays(nc_layer: QgsVectorLayer):
+
+    renderer = prepare_bivariate_renderer(nc_layer, field1="AREA", field2="PERIMETER")
+
+    values1 = [feature.attribute("AREA") for feature in nc_layer.getFeatures()]
+    values2 = [feature.attribute("PERIMETER") for feature in nc_layer.getFeatures()]
+
+    positions1, positions2 = renderer.classify_arrays(np.array(values1), np.array(values2))
+
+    assert positions1.tolist() == [renderer.positionValueField1(value) for value in values1]
+    assert positions2.tolist() == [renderer.positionValueField2(value) for value in values2]
+
+    # missing values and values outside of classes
+    positions1, positions2 = renderer.classify_arrays(
+        np.array([np.nan, -1000.0, 1000.0]), [None, renderer.field_2_classes[0].lowerBound(), None]
+    )
+
+    assert positions1.tolist() == [-1, -1, -1]
+    assert positions2.tolist() == [-1, 0, -1]
+
+
+def test_from_layer(nc_layer: QgsVectorLayer):
+
+    color_ramp = BivariateColorRampGreenPink()
+
+    renderer_expected = prepare_bivariate_renderer(nc_layer, field1="AREA", field2="PERIMETER", color_ramp=color_ramp)
+    renderer_expected.populate_labels_existing_from_layer(nc_layer)
+
+    renderer = BivariateRenderer.from_layer(nc_layer, "AREA", "PERIMETER", color_ramp)
+
+    assert renderer == renderer_expected
+    assert renderer.bivariate_color_ramp.name == color_ramp.name
+
+    for expected, calculated in zip(renderer_expected.field_1_classes, renderer.field_1_classes):
+        assert expected.lowerBound() == pytest.approx(calculated.lowerBound())
+        assert expected.upperBound() == pytest.approx(calculated.upperBound())
+
+    for expected, calculated in zip(renderer_expected.field_2_classes, renderer.field_2_classes):
+        assert expected.lowerBound() == pytest.approx(calculated.lowerBound())
+        assert expected.upperBound() == pytest.approx(calculated.upperBound())
+
+    assert set(renderer.labels_existing) == set(renderer_expected.labels_existing)
+
+
+def test_legend_image_shared_by_clones(nc_layer: QgsVectorLayer, monkeypatch):
+
+    renderer = prepare_bivariate_renderer(nc_layer, field1="AREA", field2="PERIMETER")
+    renderer.populate_labels_existing_from_layer(nc_layer)
+
+    monkeypatch.setattr(BivariateRenderer, "_legend_images", OrderedDict())
+
+    rendered = []
+
+    original_render_legend_image = BivariateRenderer.render_legend_image
+
+    def counting_render_legend_image(self):
+        rendered.append(self)
+        return original_render_legend_image(self)
+
+    monkeypatch.setattr(BivariateRenderer, "render_legend_image", counting_render_legend_image)
+
+    image = renderer.legend_image()
+
+    assert renderer.clone().legend_image() is image
+    assert len(rendered) == 1
+
+    renderer.set_bivariate_color_ramp(BivariateColorRampGreenPink())
+
+    assert renderer.legend_image() is not image
+    assert len(rendered) == 2
+
+    image = renderer.legend_image()
+
+    # cell symbols, e.g. loaded from project, differ from the color ramp
+    symbol = renderer.polygon_symbol.clone()
+    symbol.setColor(QColor(1, 2, 3))
+    renderer.set_symbol_for_values(0, 0, symbol)
+
+    assert renderer.legend_image() is not image
+    assert len(rendered) == 3
+
+    # unchanged renderer does not collect colors again
+    assert renderer.legend_fingerprint()[-2] is renderer.legend_fingerprint()[-2]
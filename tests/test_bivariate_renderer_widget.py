@@ -4,6 +4,7 @@ from qgis.PyQt.QtWidgets import QComboBox, QFormLayout, QLabel
 
 from BivariateRenderer.colorramps.bivariate_color_ramp import BivariateColorRampGreenPink
 from BivariateRenderer.legendrenderer.legend_renderer import LegendRenderer
+from BivariateRenderer.renderer.approximate_quantile import ClassificationApproximateQuantile
 from BivariateRenderer.renderer.bivariate_renderer import BivariateRenderer
 from tests import assert_images_equal, prepare_bivariate_renderer_widget
 
@@ -35,7 +36,7 @@ def test_widget_values(nc_layer: QgsVectorLayer):
     assert widget.cb_field1.fields() == nc_layer.fields()
     assert widget.cb_field2.fields() == nc_layer.fields()
     assert len(widget.cb_color_ramps) == 13
-    assert len(widget.cb_colormixing_methods) == 3
+    assert len(widget.cb_colormixing_methods) == 6
 
     color_ramp = BivariateColorRampGreenPink()
 
@@ -54,3 +55,98 @@ def test_visual(nc_layer: QgsVectorLayer):
     pixmap.save("tests/images/image.png", "png")
 
     assert_images_equal("tests/images/correct/widget_renderer.png", "tests/images/image.png")
+
+
+def test_background_classification(nc_layer: QgsVectorLayer, qtbot):
+
+    widget = prepare_bivariate_renderer_widget(nc_layer)
+    widget.background_classification_threshold = 0
+
+    widget.sb_number_classes.setValue(4)
+    widget.apply_pending_updates()
+
+    first_task = widget._classification_task
+
+    assert first_task is not None
+    assert widget.label_legend.text() == "Classifying data …"
+
+    widget.sb_number_classes.setValue(5)
+    widget.apply_pending_updates()
+
+    task = widget._classification_task
+
+    assert task is not first_task
+
+    with qtbot.waitSignal(task.classification_finished, timeout=10000):
+        pass
+
+    assert widget._classification_task is None
+    assert len(widget.bivariate_renderer.field_1_classes) == 5
+    assert len(widget.bivariate_renderer.field_2_classes) == 5
+    assert widget.bivariate_renderer.labels_existing
+
+
+def test_updates_are_collected(nc_layer: QgsVectorLayer, qtbot, monkeypatch):
+
+    widget = prepare_bivariate_renderer_widget(nc_layer)
+
+    classifications = []
+    monkeypatch.setattr(widget.bivariate_renderer, "classify_layer", classifications.append)
+
+    # color only edit does not classify data
+    widget.cb_colormixing_methods.setCurrentIndex(1)
+    widget.apply_pending_updates()
+
+    assert classifications == []
+
+    # populated cells are kept
+    assert widget.bivariate_renderer.labels_existing
+
+    # burst of edits is classified once, after the delay
+    widget.sb_number_classes.setValue(4)
+    widget.sb_number_classes.setValue(5)
+    widget.sb_number_classes.setValue(3)
+
+    assert classifications == []
+
+    qtbot.waitUntil(lambda: len(classifications) == 1, timeout=1000)
+    qtbot.wait(2 * widget.update_delay)
+
+    assert len(classifications) == 1
+
+
+def test_approximate_quantile_selectable(nc_layer: QgsVectorLayer):
+
+    widget = prepare_bivariate_renderer_widget(nc_layer)
+
+    assert isinstance(widget.cb_classification_methods, QComboBox)
+
+    index = widget.cb_classification_methods.findData(ClassificationApproximateQuantile.method_id)
+
+    assert index >= 0
+
+    widget.cb_classification_methods.setCurrentIndex(index)
+    widget.apply_pending_updates()
+
+    assert isinstance(widget.bivariate_renderer.classification_method, ClassificationApproximateQuantile)
+    assert widget.bivariate_renderer.field_1_classes
+    assert widget.bivariate_renderer.classification_method.name() in widget.label_classification_method.text()
+
+
+def test_unknown_feature_count_classified_in_background(nc_layer: QgsVectorLayer, qtbot, monkeypatch):
+
+    widget = prepare_bivariate_renderer_widget(nc_layer)
+
+    monkeypatch.setattr(nc_layer, "featureCount", lambda: -1)
+
+    widget.sb_number_classes.setValue(4)
+    widget.apply_pending_updates()
+
+    task = widget._classification_task
+
+    assert task is not None
+
+    with qtbot.waitSignal(task.classification_finished, timeout=10000):
+        pass
+
+    assert len(widget.bivariate_renderer.field_1_classes) == 4
@@ -0,0 +1,149 @@
+from qgis.core import QgsClassificationEqualInterval, QgsClassificationQuantile, QgsFeature, QgsField, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+
+from BivariateRenderer.renderer.classification_cache import ClassificationCache
+
+
+def prepare_layer(values) -> QgsVectorLayer:
+    layer = QgsVectorLayer("NoGeometry", "test", "memory")
+    layer.dataProvider().addAttributes([QgsField("value", QVariant.Double)])
+    layer.updateFields()
+
+    features = []
+    for value in values:
+        feature = QgsFeature(layer.fields())
+        feature.setAttribute("value", value)
+        features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+
+    return layer
+
+
+def test_classification_cache_returns_cached_classes():
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    layer = prepare_layer([0, 1, 2, 3, 4, 5, 6])
+
+    method = QgsClassificationEqualInterval()
+
+    classes = cache.classes(method, layer, "value", 3)
+    expected, _ = method.classesV2(layer, "value", 3)
+
+    assert len(cache) == 1
+    assert [(x.lowerBound(), x.upperBound()) for x in classes] == [(x.lowerBound(), x.upperBound()) for x in expected]
+
+    classes_cached = cache.classes(method, layer, "value", 3)
+
+    assert len(cache) == 1
+    assert [(x.lowerBound(), x.upperBound()) for x in classes_cached] == [
+        (x.lowerBound(), x.upperBound()) for x in classes
+    ]
+
+    # cached ranges are independent copies
+    assert classes_cached[0] is not classes[0]
+
+    cache.classes(QgsClassificationQuantile(), layer, "value", 3)
+    cache.classes(method, layer, "value", 4)
+
+    assert len(cache) == 3
+
+
+def test_classification_cache_invalidated_by_data_change():
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    layer = prepare_layer([0, 1, 2, 3])
+
+    method = QgsClassificationEqualInterval()
+
+    classes = cache.classes(method, layer, "value", 2)
+
+    assert classes[-1].upperBound() == 3
+
+    layer.startEditing()
+    feature = QgsFeature(layer.fields())
+    feature.setAttribute("value", 9)
+    layer.addFeature(feature)
+    layer.commitChanges()
+
+    classes = cache.classes(method, layer, "value", 2)
+
+    assert classes[-1].upperBound() == 9
+
+    layer.setSubsetString('"value" < 3')
+
+    classes = cache.classes(method, layer, "value", 2)
+
+    assert classes[-1].upperBound() == 2
+
+
+def test_classification_cache_lru_eviction():
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    max_size = cache.max_size
+    cache.max_size = 2
+
+    try:
+        layer = prepare_layer([0, 1, 2, 3])
+
+        method = QgsClassificationEqualInterval()
+
+        cache.classes(method, layer, "value", 2)
+        cache.classes(method, layer, "value", 3)
+        # use first result so that the second one is the least recently used
+        cache.classes(method, layer, "value", 2)
+        cache.classes(method, layer, "value", 4)
+
+        assert len(cache) == 2
+        assert [key[6] for key in cache._results] == [2, 4]
+    finally:
+        cache.max_size = max_size
+
+
+def test_classification_cache_equal_interval_from_layer_bounds():
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    layer = prepare_layer([5, None, 1, 3])
+
+    classes = cache.classes(QgsClassificationEqualInterval(), layer, "value", 2)
+
+    assert [(x.lowerBound(), x.upperBound()) for x in classes] == [(1, 3), (3, 5)]
+
+    # layer without values
+    layer = prepare_layer([])
+
+    assert cache.classes(QgsClassificationEqualInterval(), layer, "value", 2) == []
+
+
+def test_classification_cache_keyed_by_method_settings():
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    layer = prepare_layer([0, 1, 2, 3])
+
+    method = QgsClassificationEqualInterval()
+    method.setLabelPrecision(1)
+
+    classes = cache.classes(method, layer, "value", 2)
+
+    method = QgsClassificationEqualInterval()
+    method.setLabelPrecision(3)
+
+    classes_precise = cache.classes(method, layer, "value", 2)
+
+    assert len(cache) == 2
+    assert classes[0].label() != classes_precise[0].label()
+
+    method.setLabelFormat("%1 to %2")
+
+    assert cache.classes(method, layer, "value", 2)[0].label().count(" to ") == 1
+    assert len(cache) == 3
@@ -1,10 +1,15 @@
+import numpy as np
+import pytest
 from qgis.core import QgsLayoutUtils
-from qgis.PyQt.QtGui import QPainter
+from qgis.PyQt.QtGui import QColor, QPainter
 
 from BivariateRenderer.colormixing.color_mixing_method import (
     ColorMixingMethod,
     ColorMixingMethodDarken,
     ColorMixingMethodDirect,
+    ColorMixingMethodLab,
+    ColorMixingMethodOverlay,
+    ColorMixingMethodScreen,
 )
 from BivariateRenderer.colormixing.color_mixing_methods_register import ColorMixingMethodsRegister
 from BivariateRenderer.legendrenderer.legend_renderer import LegendRenderer
@@ -26,6 +31,11 @@ def test_color_mixing_register():
     assert issubclass(type(register.get_by_name("Direct Mixing")), ColorMixingMethod)
     assert register.get_by_name("does not exist") is None
 
+    assert register.get_by_name("Blend Multiply") is register.get_by_name("Blend Multiply")
+
+    for descriptor in register.descriptors:
+        assert register.get_by_name(descriptor.name).name() == descriptor.name
+
 
 def test_color_mixing_direct_mixing(qgis_countries_layer, qgs_layout):
 
@@ -85,3 +95,35 @@ def test_color_mixing_darken(qgis_countries_layer, qgs_project, qgs_layout):
     image.save("./tests/images/image.png", "PNG")
 
     assert_images_equal("./tests/images/correct/legend_only_darken.png", "./tests/images/image.png")
+
+
+@pytest.mark.parametrize("method", ColorMixingMethodsRegister().methods)
+def test_color_mixing_mix_arrays(method: ColorMixingMethod):
+
+    rgb1 = np.array([[0, 0, 0], [255, 255, 255], [200, 100, 50], [13, 180, 255]])
+    rgb2 = np.array([[255, 128, 0], [10, 20, 30], [50, 100, 200], [255, 1, 77]])
+
+    result = method.mix_arrays(rgb1, rgb2)
+
+    assert result.shape == rgb1.shape
+    assert result.dtype == np.uint8
+
+    for color1, color2, mixed in zip(rgb1, rgb2, result):
+        color = method.mix_colors(QColor(*color1.tolist()), QColor(*color2.tolist()))
+
+        assert [color.red(), color.green(), color.blue()] == mixed.tolist()
+
+    # broadcasting
+    assert method.mix_arrays(rgb1[:, np.newaxis, :], rgb2[np.newaxis, :, :]).shape == (4, 4, 3)
+
+
+def test_color_mixing_new_methods():
+
+    assert ColorMixingMethodScreen().mix_colors(QColor(0, 0, 0), QColor(10, 20, 30)).name() == QColor(10, 20, 30).name()
+    assert ColorMixingMethodScreen().mix_colors(QColor(255, 255, 255), QColor(10, 20, 30)).name() == "#ffffff"
+
+    assert ColorMixingMethodOverlay().mix_colors(QColor(0, 0, 0), QColor(10, 20, 30)).name() == "#000000"
+    assert ColorMixingMethodOverlay().mix_colors(QColor(255, 255, 255), QColor(10, 20, 30)).name() == "#ffffff"
+
+    assert ColorMixingMethodLab().mix_colors(QColor(10, 20, 30), QColor(10, 20, 30)).name() == QColor(10, 20, 30).name()
+    assert ColorMixingMethodLab().mix_colors(QColor(255, 255, 255), QColor(0, 0, 0)).name() == "#777777"
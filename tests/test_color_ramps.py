@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from qgis.core import QgsGradientColorRamp
 from qgis.PyQt.QtGui import QColor, QIcon
@@ -152,3 +153,76 @@ def test_manual_ramp_requires_square_colors():
                 [QColor("#0000ff")],
             ]
         )
+
+
+def test_gradient_ramp_color_matrix():
+
+    ramp = BivariateColorRampGreenPink()
+    ramp.set_number_of_classes(4)
+
+    matrix = ramp.color_matrix
+
+    assert matrix.shape == (4, 4, 4)
+    assert matrix.dtype == np.uint8
+    assert ramp.color_matrix is matrix
+
+    for i in range(4):
+        for j in range(4):
+            color = ramp.color_mixing_method.mix_colors(ramp.color_ramp_1.color(i / 3), ramp.color_ramp_2.color(j / 3))
+
+            assert ramp.get_color(i, j).name() == color.name()
+            assert tuple(matrix[i, j]) == color.getRgb()
+
+    # positions above number of classes get last color
+    assert ramp.get_color(5, 5).name() == ramp.get_color(3, 3).name()
+
+    ramp.set_color_mixing_method(ColorMixingMethodDarken())
+    assert ramp.color_matrix is not matrix
+
+    matrix = ramp.color_matrix
+    ramp.set_color_ramp_1(QgsGradientColorRamp(QColor("#ff0000"), QColor("#0000ff")))
+    assert ramp.color_matrix is not matrix
+
+    matrix = ramp.color_matrix
+    ramp.set_color_ramp_2(QgsGradientColorRamp(QColor("#ff0000"), QColor("#0000ff")))
+    assert ramp.color_matrix is not matrix
+
+    ramp.set_number_of_classes(5)
+    assert ramp.color_matrix.shape == (5, 5, 4)
+
+
+def test_color_matrix_image():
+
+    colors = [
+        [QColor("#ff0000"), QColor("#00ff00")],
+        [QColor("#0000ff"), QColor("#ffff00")],
+    ]
+    ramp = BivariateColorRampManual(colors)
+
+    image = ramp.color_matrix_image()
+
+    assert image.width() == 2
+    assert image.height() == 2
+
+    for i in range(2):
+        for j in range(2):
+            assert image.pixelColor(j, i).name() == colors[i][j].name()
+
+    # image is kept with the matrix and shares its memory
+    assert ramp.color_matrix_image() is image
+    assert int(image.constBits()) == ramp.color_matrix.ctypes.data
+
+
+def test_color_ramp_register_descriptors():
+
+    register = BivariateColorRampsRegister()
+
+    for descriptor in register.descriptors:
+        color_ramp = register.get_by_name(descriptor.name)
+
+        assert color_ramp.name == descriptor.name
+        assert color_ramp._icon == descriptor.icon_path
+
+    # every request creates new instance
+    assert register.get_by_name("Violet - Blue") is not register.get_by_name("Violet - Blue")
+    assert register.get_by_name("does not exist") is None
@@ -0,0 +1,105 @@
+import numpy as np
+from qgis.core import (
+    QgsClassificationEqualInterval,
+    QgsClassificationQuantile,
+    QgsClassificationRange,
+    QgsFeedback,
+    QgsVectorLayer,
+)
+
+from BivariateRenderer.renderer.classification_cache import ClassificationCache
+from BivariateRenderer.renderer.layer_classification import classify_source, known_classes, populated_cells
+
+
+def test_populated_cells():
+
+    positions1 = np.array([0, 0, 1, -1, 2, 0])
+    positions2 = np.array([0, 0, 2, 1, -1, 1])
+
+    assert populated_cells(positions1, positions2) == {(0, 0), (1, 2), (0, 1)}
+
+
+def test_classify_source(nc_layer: QgsVectorLayer):
+
+    fields = nc_layer.fields()
+
+    classification = classify_source(
+        nc_layer, fields.lookupField("AREA"), fields.lookupField("PERIMETER"), QgsClassificationEqualInterval(), 3
+    )
+
+    assert len(classification.field_1_classes) == 3
+    assert len(classification.field_2_classes) == 3
+    assert classification.populated_cells
+    assert all(0 <= x < 3 and 0 <= y < 3 for x, y in classification.populated_cells)
+
+    classification = classify_source(nc_layer, fields.lookupField("AREA"), -1, QgsClassificationEqualInterval(), 3)
+
+    assert len(classification.field_1_classes) == 3
+    assert classification.field_2_classes == []
+    assert classification.populated_cells == set()
+
+
+def test_classify_source_canceled(nc_layer: QgsVectorLayer):
+
+    fields = nc_layer.fields()
+
+    feedback = QgsFeedback()
+    feedback.cancel()
+
+    classification = classify_source(
+        nc_layer,
+        fields.lookupField("AREA"),
+        fields.lookupField("PERIMETER"),
+        QgsClassificationEqualInterval(),
+        3,
+        feedback,
+    )
+
+    assert classification is None
+
+
+def test_classify_source_with_cached_classes(nc_layer: QgsVectorLayer):
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    method = QgsClassificationQuantile()
+
+    assert known_classes(nc_layer, "AREA", "PERIMETER", method, 2) is None
+
+    # classes that differ from the ones calculated from data, so that their use can be recognized
+    classes = [QgsClassificationRange("low", 0, 0.1), QgsClassificationRange("high", 0.1, 1)]
+
+    cache.store(method, nc_layer, "AREA", 2, classes)
+    cache.store(method, nc_layer, "PERIMETER", 2, [QgsClassificationRange("all", 0, 10)])
+
+    known = known_classes(nc_layer, "AREA", "PERIMETER", method, 2)
+
+    assert known is not None
+
+    fields = nc_layer.fields()
+
+    classification = classify_source(
+        nc_layer, fields.lookupField("AREA"), fields.lookupField("PERIMETER"), method, 2, classes=known
+    )
+
+    assert [x.label() for x in classification.field_1_classes] == ["low", "high"]
+    assert [x.label() for x in classification.field_2_classes] == ["all"]
+    assert classification.populated_cells == {(0, 0), (1, 0)}
+
+
+def test_known_classes_from_field_bounds(nc_layer: QgsVectorLayer):
+
+    cache = ClassificationCache()
+    cache.clear()
+
+    method = QgsClassificationEqualInterval()
+
+    classes1, classes2 = known_classes(nc_layer, "AREA", "PERIMETER", method, 3)
+
+    expected1, _ = method.classesV2(nc_layer, "AREA", 3)
+    expected2, _ = method.classesV2(nc_layer, "PERIMETER", 3)
+
+    assert [(x.lowerBound(), x.upperBound()) for x in classes1] == [(x.lowerBound(), x.upperBound()) for x in expected1]
+    assert [(x.lowerBound(), x.upperBound()) for x in classes2] == [(x.lowerBound(), x.upperBound()) for x in expected2]
+    assert len(cache) == 2
@@ -1,13 +1,22 @@
 from pathlib import Path
 from typing import Callable, Union
 
-from qgis.core import QgsLayout, QgsLayoutItemPage, QgsProject, QgsReadWriteContext, QgsVectorLayer
+from qgis.core import (
+    QgsFeature,
+    QgsLayout,
+    QgsLayoutItemPage,
+    QgsProject,
+    QgsReadWriteContext,
+    QgsTextFormat,
+    QgsVectorLayer,
+)
 from qgis.PyQt.QtCore import QRectF
-from qgis.PyQt.QtGui import QColor
+from qgis.PyQt.QtGui import QColor, QImage, QPainter
 from qgis.PyQt.QtXml import QDomDocument
 
 from BivariateRenderer.colorramps.bivariate_color_ramp import BivariateColorRampGreenPink
 from BivariateRenderer.layoutitems.layout_item import BivariateRendererLayoutItem
+from BivariateRenderer.renderer.bivariate_renderer import BivariateRenderer
 from tests import assert_images_equal, export_page_to_image, prepare_bivariate_renderer
 
 
@@ -102,3 +111,277 @@ def test_layout_item_xml_save_load(qgs_layout: QgsLayout):
         bivariate_legend_item_restored.use_rectangle_without_values_color_from_legend
         == bivariate_legend_item.use_rectangle_without_values_color_from_legend
     )
+
+
+def test_legend_preview_cache(
+    qgis_countries_layer: QgsVectorLayer,
+    qgs_layout: QgsLayout,
+    qgs_project: QgsProject,
+    layout_page_a4: QgsLayoutItemPage,
+    layout_space: QRectF,
+):
+
+    bivariate_renderer = prepare_bivariate_renderer(qgis_countries_layer, "fid", "fid", BivariateColorRampGreenPink())
+
+    qgis_countries_layer.setRenderer(bivariate_renderer)
+
+    qgs_project.addMapLayer(qgis_countries_layer)
+
+    layout_item = BivariateRendererLayoutItem(qgs_layout)
+    layout_item.set_linked_layer(qgis_countries_layer)
+    layout_item.attemptSetSceneRect(layout_space)
+
+    qgs_layout.addItem(layout_item)
+
+    qgs_layout.renderContext().setIsPreviewRender(True)
+
+    def render_preview() -> None:
+        image = QImage(200, 200, QImage.Format.Format_ARGB32)
+        painter = QPainter(image)
+        qgs_layout.render(painter, QRectF(0, 0, 200, 200), layout_space)
+        painter.end()
+
+    render_preview()
+
+    assert "image" in layout_item._legend_cache
+
+    key, image = layout_item._legend_cache["image"]
+
+    render_preview()
+
+    assert layout_item._legend_cache["image"][1] is image
+
+    layout_item.set_legend_rotated(True)
+
+    assert not layout_item._legend_cache
+
+    render_preview()
+
+    assert layout_item._legend_cache["image"][0] != key
+
+    key, image = layout_item._legend_cache["image"]
+
+    # settings assigned directly start new revision explicitly
+    text_format = QgsTextFormat(layout_item.text_format)
+    text_format.setSize(text_format.size() * 2)
+    layout_item.text_format = text_format
+    layout_item.invalidate_legend_cache()
+
+    render_preview()
+
+    assert layout_item._legend_cache["image"][0] != key
+    assert layout_item._legend_cache["image"][1] is not image
+
+    key, image = layout_item._legend_cache["image"]
+
+    # populated cells of the renderer changed by edit of the layer
+    layout_item.set_existing_cells(layout_item.renderer.existing_cells ^ 1)
+
+    render_preview()
+
+    assert layout_item._legend_cache["image"][0] != key
+
+    qgs_layout.renderContext().setIsPreviewRender(False)
+
+
+def test_populated_cells_found_in_background_and_updated_on_edits(qgs_layout: QgsLayout, qtbot):
+
+    layer = QgsVectorLayer("Point?field=a:double&field=b:double", "layer", "memory")
+
+    features = []
+
+    for i in range(10):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([float(i), float(i)])
+        features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+
+    layer.setRenderer(prepare_bivariate_renderer(layer, "a", "b"))
+
+    layout_item = BivariateRendererLayoutItem(qgs_layout)
+    layout_item.set_linked_layer(layer)
+    layout_item.update_populated_cells()
+
+    qtbot.waitUntil(lambda: not layout_item.is_populated_cells_scan_pending())
+
+    renderer = layout_item.renderer
+
+    expected = renderer.clone()
+    expected.populate_labels_existing_from_layer(layer)
+
+    assert renderer.existing_cells == expected.existing_cells
+
+    position_1 = renderer.positionValueField1(0)
+    position_2 = renderer.positionValueField2(9)
+
+    assert not renderer.cell_exists(position_1, position_2)
+
+    feature = QgsFeature(layer.fields())
+    feature.setAttributes([0.0, 9.0])
+
+    layer.startEditing()
+    layer.addFeature(feature)
+
+    # added features update populated cells without scan
+    assert renderer.cell_exists(position_1, position_2)
+    assert not layout_item.is_populated_cells_scan_pending()
+
+    # previous cell of changed or deleted feature might become empty, it is found by background scan
+    layer.changeAttributeValue(feature.id(), layer.fields().lookupField("b"), 0.0)
+
+    assert renderer.cell_exists(position_1, renderer.positionValueField2(0))
+    assert layout_item.is_populated_cells_scan_pending()
+
+    qtbot.waitUntil(lambda: not layout_item.is_populated_cells_scan_pending())
+
+    assert not renderer.cell_exists(position_1, position_2)
+
+    layer.deleteFeature(feature.id())
+
+    assert layout_item.is_populated_cells_scan_pending()
+
+    qtbot.waitUntil(lambda: not layout_item.is_populated_cells_scan_pending())
+
+    assert renderer.existing_cells == expected.existing_cells
+
+    layer.rollBack()
+
+
+def test_populated_cells_export_waits_for_scan(qgs_layout: QgsLayout, monkeypatch):
+
+    layer = QgsVectorLayer("Point?field=a:double&field=b:double", "layer", "memory")
+
+    features = []
+
+    for i in range(10):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([float(i), float(9 - i)])
+        features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+
+    layer.setRenderer(prepare_bivariate_renderer(layer, "a", "b"))
+
+    expected = layer.renderer().clone()
+    expected.populate_labels_existing_from_layer(layer)
+
+    layout_item = BivariateRendererLayoutItem(qgs_layout)
+    layout_item.set_linked_layer(layer)
+
+    # layer is not read on main thread
+    monkeypatch.setattr(BivariateRenderer, "populate_labels_existing_from_layer", lambda self, layer: None)
+
+    layout_item.update_populated_cells(wait=True)
+
+    assert not layout_item.is_populated_cells_scan_pending()
+    assert layout_item.renderer.existing_cells == expected.existing_cells
+
+
+def test_style_changes_coalesced_into_one_rescan(
+    qgis_countries_layer: QgsVectorLayer, qgs_layout: QgsLayout, qtbot, monkeypatch
+):
+
+    other_layer = qgis_countries_layer.clone()
+
+    for layer in (qgis_countries_layer, other_layer):
+        layer.setRenderer(prepare_bivariate_renderer(layer, "fid", "fid"))
+
+    reloads = []
+    scans = []
+
+    original_load_renderer_from_layer = BivariateRendererLayoutItem.load_renderer_from_layer
+    original_start_populated_cells_scan = BivariateRendererLayoutItem.start_populated_cells_scan
+
+    def counting_load_renderer_from_layer(self):
+        reloads.append(self.layer)
+        original_load_renderer_from_layer(self)
+
+    def counting_start_populated_cells_scan(self):
+        scans.append(self.layer)
+        original_start_populated_cells_scan(self)
+
+    monkeypatch.setattr(BivariateRendererLayoutItem, "load_renderer_from_layer", counting_load_renderer_from_layer)
+    monkeypatch.setattr(BivariateRendererLayoutItem, "start_populated_cells_scan", counting_start_populated_cells_scan)
+
+    layout_item = BivariateRendererLayoutItem(qgs_layout)
+
+    # relinking must not accumulate connections
+    layout_item.set_linked_layer(qgis_countries_layer)
+    layout_item.set_linked_layer(qgis_countries_layer)
+    layout_item.set_linked_layer(other_layer)
+    layout_item.set_linked_layer(qgis_countries_layer)
+
+    # cells are not scanned until the item needs them
+    assert scans == []
+
+    layout_item.update_populated_cells()
+
+    qtbot.waitUntil(lambda: not layout_item.is_populated_cells_scan_pending())
+
+    reloads.clear()
+    scans.clear()
+
+    for _ in range(3):
+        qgis_countries_layer.emitStyleChanged()
+
+    # previously linked layer is disconnected
+    other_layer.emitStyleChanged()
+
+    qtbot.waitUntil(lambda: len(reloads) > 0)
+    qtbot.wait(3 * BivariateRendererLayoutItem.renderer_reload_delay)
+
+    assert reloads == [qgis_countries_layer]
+
+    layout_item.update_populated_cells()
+    layout_item.update_populated_cells()
+
+    assert scans == [qgis_countries_layer]
+
+    qtbot.waitUntil(lambda: not layout_item.is_populated_cells_scan_pending())
+
+
+def test_populated_cells_stored_in_project(
+    nc_layer: QgsVectorLayer, qgs_layout: QgsLayout, qgs_project: QgsProject, monkeypatch
+):
+
+    nc_layer.setRenderer(prepare_bivariate_renderer(nc_layer, "AREA", "PERIMETER"))
+
+    qgs_project.addMapLayer(nc_layer)
+
+    layout_item = BivariateRendererLayoutItem(qgs_layout)
+    layout_item.set_linked_layer(nc_layer)
+    layout_item.update_populated_cells(wait=True)
+
+    existing_cells = layout_item.renderer.existing_cells
+
+    doc = QDomDocument("test")
+    elem = doc.createElement("BivariateRendererLayoutItem")
+    context = QgsReadWriteContext()
+
+    layout_item.writePropertiesToElement(elem, doc, context)
+
+    assert elem.attribute("populated_cells") == format(existing_cells, "x")
+    assert elem.attribute("populated_cells_fingerprint") == layout_item.populated_cells_fingerprint()
+
+    scans = []
+
+    monkeypatch.setattr(BivariateRendererLayoutItem, "wait_for_populated_cells_scan", lambda self: scans.append(self))
+    monkeypatch.setattr(BivariateRendererLayoutItem, "start_populated_cells_scan", lambda self: scans.append(self))
+
+    layout_item_restored = BivariateRendererLayoutItem(qgs_layout)
+    layout_item_restored.readPropertiesFromElement(elem, doc, context)
+
+    # layer is linked once the layout is restored
+    assert layout_item_restored.layer is None
+    assert layout_item_restored.linked_layer_id == nc_layer.id()
+
+    layout_item_restored.finalizeRestoreFromXml()
+
+    assert layout_item_restored.layer is nc_layer
+
+    layout_item_restored.renderer.existing_cells = 0
+    layout_item_restored.update_populated_cells(wait=True)
+
+    assert layout_item_restored.renderer.existing_cells == existing_cells
+    assert scans == []
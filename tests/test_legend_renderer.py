@@ -1,14 +1,19 @@
+import math
 from typing import Callable
 
+import pytest
 from qgis.core import QgsLayout, QgsLayoutUtils, QgsProject, QgsReadWriteContext, QgsRenderContext, QgsVectorLayer
+from qgis.PyQt.QtCore import QPointF, QRectF
 from qgis.PyQt.QtGui import QColor, QImage, QPainter
 from qgis.PyQt.QtXml import QDomDocument
 
 from BivariateRenderer.colormixing.color_mixing_method import ColorMixingMethodDirect
 from BivariateRenderer.colorramps.bivariate_color_ramp import BivariateColorRamp
+from BivariateRenderer.legendrenderer.legend_layout import LegendLayout
 from BivariateRenderer.legendrenderer.legend_renderer import LegendRenderer
 from BivariateRenderer.renderer.bivariate_renderer import BivariateRenderer
 from BivariateRenderer.renderer.bivariate_renderer_utils import classes_to_legend_midpoints
+from BivariateRenderer.utils import only_color_fill_symbol
 from tests import assert_images_equal, prepare_bivariate_renderer, prepare_painter, prepare_QImage
 
 
@@ -503,3 +508,235 @@ def test_legend_empty_squares_after_renderer_save_load(
     image.save("./tests/images/image.png", "PNG")
 
     assert_images_equal("tests/images/correct/legend_replaced_missing_values.png", "tests/images/image.png")
+
+
+def test_legend_layout_calculated_once_per_render(
+    qgis_countries_layer: QgsVectorLayer,
+    qgs_layout: QgsLayout,
+    monkeypatch,
+):
+
+    image = prepare_QImage()
+
+    painter = prepare_painter(image)
+
+    render_context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+
+    bivariate_renderer = prepare_bivariate_renderer(qgis_countries_layer, field1="fid", field2="fid")
+
+    legend_renderer = LegendRenderer()
+    legend_renderer.add_axes_arrows = True
+    legend_renderer.add_axes_texts = True
+    legend_renderer.add_axes_ticks_texts = True
+    legend_renderer.texts_axis_x_ticks = bivariate_renderer.field_1_labels
+    legend_renderer.texts_axis_y_ticks = bivariate_renderer.field_2_labels
+
+    calculate_layout = legend_renderer.calculate_layout
+    calls = []
+
+    def counting_calculate_layout(cells_count):
+        calls.append(cells_count)
+        return calculate_layout(cells_count)
+
+    monkeypatch.setattr(legend_renderer, "calculate_layout", counting_calculate_layout)
+
+    size = image.width() / render_context.scaleFactor()
+    polygons = bivariate_renderer.generate_legend_polygons()
+
+    legend_renderer.render(render_context, size, size, polygons)
+
+    painter.end()
+
+    assert calls == [len(polygons)]
+
+    layout = legend_renderer.layout
+
+    assert isinstance(layout, LegendLayout)
+    assert len(layout.ticks_x) == len(bivariate_renderer.field_1_labels)
+    assert len(layout.ticks_y) == len(bivariate_renderer.field_2_labels)
+    assert layout.all_elements_top == layout.axis_text_tics_top + layout.arrow_width
+    assert layout.size_constant * math.sqrt(len(polygons)) == pytest.approx(size - layout.all_elements_top)
+
+    first_transform = layout.transform
+
+    legend_renderer.legend_rotated = True
+
+    image = prepare_QImage()
+    painter = prepare_painter(image)
+    render_context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+
+    legend_renderer.render(render_context, size, size, polygons)
+
+    painter.end()
+
+    # transform follows settings even if size of the legend did not change
+    assert legend_renderer.layout.transform != first_transform
+
+
+def test_legend_layout_before_render(qgs_layout: QgsLayout):
+
+    image = prepare_QImage()
+
+    painter = prepare_painter(image)
+
+    legend_renderer = LegendRenderer()
+    legend_renderer.add_axes_arrows = True
+    legend_renderer.context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+    legend_renderer.set_size_context(100, 100)
+    legend_renderer.set_text_height(["Axis X"], ["Axis Y"])
+
+    assert legend_renderer.margin == pytest.approx(legend_renderer.height * legend_renderer.margin_const_percent)
+    assert legend_renderer.arrow_width == pytest.approx(legend_renderer.width * 0.05)
+    assert legend_renderer.size_constant == 0
+
+    # midpoints are used whenever there is tick for every category, regardless of ticks being drawn
+    legend_renderer._polygons_count = 9
+    legend_renderer.texts_axis_x_ticks = [1, 2, 3]
+
+    assert legend_renderer.categories_midpoint
+
+    legend_renderer.texts_axis_x_ticks = [0, 1, 2, 3]
+
+    assert not legend_renderer.categories_midpoint
+
+    painter.end()
+
+
+def test_legend_cells_drawn_as_symbols_per_cell(
+    qgis_countries_layer: QgsVectorLayer,
+    qgs_layout: QgsLayout,
+):
+
+    bivariate_renderer = prepare_bivariate_renderer(qgis_countries_layer, field1="fid", field2="fid")
+
+    polygons = bivariate_renderer.generate_legend_polygons()
+    polygons[0].exist_in_map = False
+
+    legend_renderer = LegendRenderer()
+    legend_renderer.replace_rectangle_without_values = True
+
+    image = prepare_QImage()
+    painter = prepare_painter(image)
+    render_context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+
+    size = image.width() / render_context.scaleFactor()
+
+    legend_renderer.render(render_context, size, size, polygons)
+
+    painter.end()
+
+    # every cell drawn with its own started symbol
+    expected_image = prepare_QImage()
+    painter = prepare_painter(expected_image)
+    legend_renderer.context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+
+    for polygon in polygons:
+
+        if legend_renderer.is_replaced_polygon(polygon):
+            legend_renderer.symbol_rectangle_without_values.setColor(polygon.symbol.color())
+            symbol = legend_renderer.symbol_rectangle_without_values.clone()
+        else:
+            symbol = only_color_fill_symbol()
+            symbol.setColor(polygon.symbol.color())
+
+        symbol.startRender(legend_renderer.context)
+        symbol.renderPolygon(legend_renderer.polygon_cell(polygon), None, None, legend_renderer.context)
+        symbol.stopRender(legend_renderer.context)
+
+    painter.end()
+
+    assert image == expected_image
+
+
+def test_legend_cells_drawn_as_image(
+    qgis_countries_layer: QgsVectorLayer,
+    qgs_layout: QgsLayout,
+):
+
+    bivariate_renderer = prepare_bivariate_renderer(qgis_countries_layer, field1="fid", field2="fid")
+
+    polygons = bivariate_renderer.generate_legend_polygons()
+
+    legend_renderer = LegendRenderer()
+    legend_renderer.color_matrix_image = bivariate_renderer.bivariate_color_ramp.color_matrix_image()
+
+    image = prepare_QImage()
+    painter = prepare_painter(image)
+    render_context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+
+    size = image.width() / render_context.scaleFactor()
+
+    legend_renderer.render(render_context, size, size, polygons)
+
+    assert legend_renderer.can_draw_polygons_image(polygons)
+
+    for polygon in polygons:
+        center = legend_renderer.transform.map(
+            QPointF(
+                legend_renderer.polygon_start_pos_x + (polygon.x + 0.5) * legend_renderer.size_constant,
+                legend_renderer.polygon_start_pos_y - (polygon.y + 0.5) * legend_renderer.size_constant,
+            )
+        )
+
+        assert image.pixelColor(int(center.x()), int(center.y())) == polygon.symbol.color()
+
+    # replaced cells and rotated legends are drawn with symbols
+    legend_renderer.replace_rectangle_without_values = True
+    polygons[0].exist_in_map = False
+
+    assert not legend_renderer.can_draw_polygons_image(polygons)
+
+    polygons[0].exist_in_map = True
+    legend_renderer.legend_rotated = True
+
+    assert not legend_renderer.can_draw_polygons_image(polygons)
+
+    painter.end()
+
+
+def test_legend_spacers_single_path(
+    qgis_countries_layer: QgsVectorLayer,
+    qgs_layout: QgsLayout,
+):
+
+    bivariate_renderer = prepare_bivariate_renderer(qgis_countries_layer, field1="fid", field2="fid")
+
+    polygons = bivariate_renderer.generate_legend_polygons()
+
+    legend_renderer = LegendRenderer()
+    legend_renderer.add_colors_separators = True
+
+    image = prepare_QImage()
+    painter = prepare_painter(image)
+    render_context = QgsLayoutUtils.createRenderContextForLayout(qgs_layout, painter)
+
+    size = image.width() / render_context.scaleFactor()
+
+    legend_renderer.render(render_context, size, size, polygons)
+
+    painter.end()
+
+    path = legend_renderer.spacers_path(polygons)
+
+    number_of_classes = math.isqrt(len(polygons))
+
+    # every line is one move and one line element
+    assert path.elementCount() == 2 * 2 * (number_of_classes + 1)
+    assert path.boundingRect() == legend_renderer.transform.mapRect(
+        QRectF(
+            legend_renderer.polygon_start_pos_x,
+            legend_renderer.polygon_start_pos_y - number_of_classes * legend_renderer.size_constant,
+            number_of_classes * legend_renderer.size_constant,
+            number_of_classes * legend_renderer.size_constant,
+        )
+    )
+
+    # shared edge of the first two cells is covered by the separator
+    edge = legend_renderer.transform.map(
+        QPointF(
+            legend_renderer.polygon_start_pos_x + legend_renderer.size_constant,
+            legend_renderer.polygon_start_pos_y - legend_renderer.size_constant / 2,
+        )
+    )
+
+    assert image.pixelColor(int(edge.x()), int(edge.y())) == legend_renderer.color_separator_color
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+
+from qgis.core import QgsStyle
+
+from BivariateRenderer.layoutitems.layout_item import BivariateRendererLayoutItem
+from BivariateRenderer.layoutitems.layout_item_gui_metadata import BivariateRendererLayoutItemGuiMetadata
+from BivariateRenderer.layoutitems.layout_item_metadata import BivariateRendererLayoutItemMetadata
+from BivariateRenderer.layoutitems.layout_item_widget import BivariateRendererLayoutItemWidget
+from BivariateRenderer.renderer.bivariate_renderer_metadata import BivariateRendererMetadata
+from BivariateRenderer.renderer.bivariate_renderer_widget import BivariateRendererWidget
+
+
+def test_plugin_import_does_not_load_widgets():
+
+    code = (
+        "import sys\n"
+        "import BivariateRenderer.bivariate_renderer_plugin\n"
+        "print(sorted(name for name in sys.modules if name.startswith('BivariateRenderer') and 'widget' in name))\n"
+    )
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_plugin_import_does_not_load_gui_and_renderer():
+
+    code = (
+        "import sys\n"
+        "import BivariateRenderer.bivariate_renderer_plugin\n"
+        "modules = ['qgis.gui', 'BivariateRenderer.renderer.bivariate_renderer_utils', "
+        "'BivariateRenderer.renderer.bivariate_renderer', "
+        "'BivariateRenderer.layoutitems.layout_item']\n"
+        "print(sorted(name for name in modules if name in sys.modules))\n"
+    )
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_layout_item_metadata_creates_item(qgs_layout):
+
+    item = BivariateRendererLayoutItemMetadata().createItem(qgs_layout)
+
+    assert isinstance(item, BivariateRendererLayoutItem)
+
+
+def test_metadata_creates_widgets(nc_layer, qgs_layout):
+
+    widget = BivariateRendererMetadata().createRendererWidget(nc_layer, QgsStyle(), None)
+
+    assert isinstance(widget, BivariateRendererWidget)
+
+    widget = BivariateRendererLayoutItemGuiMetadata().createItemWidget(BivariateRendererLayoutItem(qgs_layout))
+
+    assert isinstance(widget, BivariateRendererLayoutItemWidget)
@@ -0,0 +1,183 @@
+from qgis.core import (
+    NULL,
+    QgsClassificationRange,
+    QgsFeature,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingUtils,
+    QgsVectorLayer,
+)
+
+from BivariateRenderer.renderer.bivariate_renderer_utils import ClassBreaks
+from BivariateRenderer.renderer.classification_cache import ClassificationCache
+from BivariateRenderer.tools.tool_calculate_categories import CalculateCategoriesAlgorithm
+from BivariateRenderer.tools.tool_calculate_categories_features import CalculateCategoriesFeaturesAlgorithm
+
+
+def memory_layer(values) -> QgsVectorLayer:
+    layer = QgsVectorLayer("Polygon?field=a:double&field=b:double", "layer", "memory")
+
+    features = []
+
+    for value_a, value_b in values:
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([value_a, value_b])
+        features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+
+    return layer
+
+
+def test_categories():
+
+    breaks = ClassBreaks([QgsClassificationRange("", 0, 1), QgsClassificationRange("", 1, 2)])
+
+    categories = CalculateCategoriesAlgorithm.categories(
+        [1, 2, 3, 4], breaks, breaks, [0.5, 1, 2, None], [1.5, 1, 5, 1]
+    )
+
+    # value on shared break belongs to the lower class, values outside of classes are skipped
+    assert categories == {1: "1-2", 2: "1-1"}
+
+
+def test_calculate_categories_written_in_chunks(monkeypatch):
+
+    layer = memory_layer([(float(i), float(9 - i)) for i in range(10)] + [(None, 1.0)])
+
+    monkeypatch.setattr(CalculateCategoriesAlgorithm, "chunk_size", 3)
+
+    written_chunks = []
+
+    original_write_categories = CalculateCategoriesAlgorithm.write_categories
+
+    def counting_write_categories(self, provider, field_index, feature_ids, *args):
+        written_chunks.append(feature_ids)
+        original_write_categories(self, provider, field_index, feature_ids, *args)
+
+    monkeypatch.setattr(CalculateCategoriesAlgorithm, "write_categories", counting_write_categories)
+
+    alg = CalculateCategoriesAlgorithm()
+    alg.initAlgorithm()
+
+    parameters = {
+        CalculateCategoriesAlgorithm.INPUT_LAYER: layer,
+        CalculateCategoriesAlgorithm.FIELD_1: "a",
+        CalculateCategoriesAlgorithm.FIELD_2: "b",
+        CalculateCategoriesAlgorithm.NUMBER_CLASSES: 3,
+        CalculateCategoriesAlgorithm.RESULT_FIELD_NAME: "Category",
+    }
+
+    _, ok = alg.run(parameters, QgsProcessingContext(), QgsProcessingFeedback())
+
+    assert ok
+    assert not layer.isEditable()
+    assert layer.fields().indexOf("Category") >= 0
+
+    categories = [feature.attribute("Category") for feature in layer.getFeatures()]
+
+    # classes 0-3, 3-6 and 6-9
+    assert categories[:10] == ["1-3", "1-3", "1-3", "1-2", "2-2", "2-2", "2-1", "3-1", "3-1", "3-1"]
+    assert categories[10] == NULL
+
+    # every chunk is read by its own iterator and written once
+    assert [len(chunk) for chunk in written_chunks] == [3, 3, 3, 2]
+
+
+def test_calculate_categories_refuses_editable_layer():
+
+    layer = memory_layer([(float(i), float(9 - i)) for i in range(10)])
+
+    alg = CalculateCategoriesAlgorithm()
+    alg.initAlgorithm()
+
+    parameters = {
+        CalculateCategoriesAlgorithm.INPUT_LAYER: layer,
+        CalculateCategoriesAlgorithm.FIELD_1: "a",
+        CalculateCategoriesAlgorithm.FIELD_2: "b",
+        CalculateCategoriesAlgorithm.NUMBER_CLASSES: 3,
+        CalculateCategoriesAlgorithm.RESULT_FIELD_NAME: "Category",
+    }
+
+    layer.startEditing()
+
+    _, ok = alg.run(parameters, QgsProcessingContext(), QgsProcessingFeedback())
+
+    assert not ok
+    assert layer.fields().indexOf("Category") < 0
+
+    layer.rollBack()
+
+    revision = ClassificationCache().revision(layer)
+
+    _, ok = alg.run(parameters, QgsProcessingContext(), QgsProcessingFeedback())
+
+    assert ok
+
+    # cached classes of the layer are invalidated once the algorithm ends
+    assert ClassificationCache().revision(layer) > revision
+
+
+def test_calculate_categories_to_sink():
+
+    layer = memory_layer([(float(i), float(9 - i)) for i in range(10)] + [(None, 1.0)])
+
+    alg = CalculateCategoriesFeaturesAlgorithm()
+    alg.initAlgorithm()
+
+    parameters = {
+        "INPUT": layer,
+        CalculateCategoriesFeaturesAlgorithm.FIELD_1: "a",
+        CalculateCategoriesFeaturesAlgorithm.FIELD_2: "b",
+        CalculateCategoriesFeaturesAlgorithm.NUMBER_CLASSES: 3,
+        CalculateCategoriesFeaturesAlgorithm.RESULT_FIELD_NAME: "Category",
+        "OUTPUT": "memory:",
+    }
+
+    context = QgsProcessingContext()
+
+    results, ok = alg.run(parameters, context, QgsProcessingFeedback())
+
+    assert ok
+
+    # input layer is not changed
+    assert layer.fields().indexOf("Category") < 0
+
+    output = QgsProcessingUtils.mapLayerFromString(results["OUTPUT"], context)
+
+    assert output.fields().names() == ["a", "b", "Category"]
+
+    categories = [feature.attribute("Category") for feature in output.getFeatures()]
+
+    assert categories[:10] == ["1-3", "1-3", "1-3", "1-2", "2-2", "2-2", "2-1", "3-1", "3-1", "3-1"]
+    assert categories[10] == NULL
+
+
+def test_calculate_categories_to_sink_requires_text_result_field():
+
+    layer = memory_layer([(float(i), float(9 - i)) for i in range(10)])
+
+    alg = CalculateCategoriesFeaturesAlgorithm()
+    alg.initAlgorithm()
+
+    # in-place editing needs existing text result field
+    assert not alg.supportInPlaceEdit(layer)
+
+    layer_with_result_field = QgsVectorLayer(
+        "Polygon?field=a:double&field=b:double&field=Category:string", "layer", "memory"
+    )
+
+    assert alg.supportInPlaceEdit(layer_with_result_field)
+
+    parameters = {
+        "INPUT": layer,
+        CalculateCategoriesFeaturesAlgorithm.FIELD_1: "a",
+        CalculateCategoriesFeaturesAlgorithm.FIELD_2: "b",
+        CalculateCategoriesFeaturesAlgorithm.NUMBER_CLASSES: 3,
+        CalculateCategoriesFeaturesAlgorithm.RESULT_FIELD_NAME: "b",
+        "OUTPUT": "memory:",
+    }
+
+    _, ok = alg.run(parameters, QgsProcessingContext(), QgsProcessingFeedback())
+
+    assert not ok